@@ -0,0 +1,65 @@
+"""
+Moteur de prédiction de matchs, utilisable sans l'interface Streamlit.
+
+L'import du paquet n'a aucun effet de bord : les clients (API, cache,
+OpenAI, Supabase) sont construits à leur première utilisation et peuvent
+être injectés. football.py n'est qu'une interface au-dessus de ce paquet.
+"""
+
+from .cache import ResponseCache, ttl_for
+from .shared import SingleFlight
+from .client import HIGH, LOW, QuotaExceeded, TokenBucket, get_client
+from .metrics import render_prometheus, snapshot, span, start_metrics_server, timed
+from .factors import (
+    collect_match_factors, geocode_city, get_h2h_score, get_injury_factor,
+    get_team_form,
+)
+from .odds import OddsBook, get_odds_book, get_odds_score
+from .injuries import InjuryBook, get_injury_book
+from .weather import get_weather_factor
+from .model import DEFAULT_WEIGHTS, FACTOR_NAMES, predict_match, predict_proba
+from .batch import predict_day
+from .predictions import (
+    SQLitePredictionStore, SupabasePredictionStore, get_prediction_store, read_through,
+    read_through_many, set_prediction_store, stored_predictions,
+)
+from .analysis import generate_ai_analysis, pregenerate_analyses, set_openai_client, stream_ai_analysis
+from .auth import AuthError, authenticate_user, check_subscription, set_supabase
+from .entitlement import current_entitlement, entitlement_from_login, verify_entitlement
+from .catalogue import LeagueCatalogue, get_catalogue
+from .fixtures import DayFixtures, FixtureBoard, get_fixture_board
+from .history import FixtureHistory, get_history
+from .features import FeatureEngine, LeagueFeatures, get_feature_engine
+from .dataset import MatchDataset
+from .backtest import run_backtest
+from .weights import WeightsFile, get_weights_file, weights_for
+from .weather_store import WeatherStore
+from .geocode import Gazetteer, get_gazetteer
+from .service import PredictionService
+
+__all__ = [
+    "ResponseCache", "ttl_for",
+    "SingleFlight",
+    "HIGH", "LOW", "QuotaExceeded", "TokenBucket", "get_client",
+    "render_prometheus", "snapshot", "span", "start_metrics_server", "timed",
+    "collect_match_factors", "geocode_city", "get_h2h_score", "get_injury_factor",
+    "get_odds_score", "get_team_form", "get_weather_factor",
+    "DEFAULT_WEIGHTS", "FACTOR_NAMES", "predict_match", "predict_proba",
+    "predict_day",
+    "SQLitePredictionStore", "SupabasePredictionStore", "get_prediction_store", "read_through",
+    "set_prediction_store", "read_through_many", "stored_predictions",
+    "PredictionService",
+    "generate_ai_analysis", "pregenerate_analyses", "set_openai_client", "stream_ai_analysis",
+    "AuthError", "authenticate_user", "check_subscription", "set_supabase",
+    "current_entitlement", "entitlement_from_login", "verify_entitlement",
+    "LeagueCatalogue", "get_catalogue",
+    "DayFixtures", "FixtureBoard", "get_fixture_board",
+    "FixtureHistory", "get_history",
+    "FeatureEngine", "LeagueFeatures", "get_feature_engine",
+    "OddsBook", "get_odds_book",
+    "InjuryBook", "get_injury_book",
+    "MatchDataset", "WeatherStore",
+    "run_backtest",
+    "WeightsFile", "get_weights_file", "weights_for",
+    "Gazetteer", "get_gazetteer",
+]
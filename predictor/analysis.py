@@ -0,0 +1,212 @@
+# predictor/analysis.py
+"""
+Texte de synthèse IA d'un match (OpenAI).
+
+Les analyses sont mises en cache par contenu : la clé est l'empreinte du
+prompt (qui ne contient que des valeurs arrondies), du modèle et de la
+version du prompt. Un même match aux mêmes entrées n'est donc facturé
+qu'une fois. stream_ai_analysis diffuse le texte au fil des jetons et
+pregenerate_analyses remplit le cache pour toute une journée à l'avance.
+
+Le client OpenAI est construit à la première utilisation ; il peut aussi être
+injecté (paramètre `client`, set_openai_client, ou OPENAI_BASE_URL) pour
+viser un serveur local.
+"""
+
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .api import get_response_cache
+from .cache import cache_key
+from .client import HIGH, LOW, build_openai_client, get_client, stub_url
+from .config import get_secret
+from .metrics import span, upstream_call
+
+logger = logging.getLogger(__name__)
+
+AI_MODEL = "gpt-3.5-turbo"
+# À incrémenter à chaque modification du prompt ou des paramètres de génération
+PROMPT_VERSION = 1
+ANALYSIS_ENDPOINT = "openai/analysis"
+OPENAI_DEFAULT_BASE_URL = "https://api.openai.com/v1"
+
+_openai_client = None
+_openai_lock = threading.Lock()
+
+
+def get_openai_client():
+    """Client OpenAI partagé par le processus (créé à la première utilisation)."""
+    global _openai_client
+    if _openai_client is None:
+        with _openai_lock:
+            if _openai_client is None:
+                base_url = get_secret("OPENAI_BASE_URL") or stub_url(OPENAI_DEFAULT_BASE_URL)
+                _openai_client = build_openai_client(get_secret("OPENAI_API_KEY"), base_url=base_url)
+    return _openai_client
+
+
+def set_openai_client(client):
+    """Remplace le client OpenAI du processus (serveur de test, proxy...)."""
+    global _openai_client
+    _openai_client = client
+
+
+def build_prompt(
+    home_team_name, away_team_name,
+    home_prob, draw_prob, away_prob,
+    home_form_score, away_form_score,
+    home_h2h_score, away_h2h_score
+):
+    return f"""
+Écris un court commentaire en français sur le match suivant :
+- Équipe à domicile : {home_team_name} (probabilité de gagner : {home_prob*100:.1f}%)
+- Équipe à l'extérieur : {away_team_name} (probabilité de gagner : {away_prob*100:.1f}%)
+- Probabilité de match nul : {draw_prob*100:.1f}%
+- Forme récente de {home_team_name} : {home_form_score:.2f} (sur 1 max)
+- Forme récente de {away_team_name} : {away_form_score:.2f} (sur 1 max)
+- Historique des confrontations directes (H2H) : 
+    * {home_team_name} : {home_h2h_score:.2f}
+    * {away_team_name} : {away_h2h_score:.2f}
+
+Donne un petit paragraphe expliquant brièvement la situation et ce à quoi on peut s'attendre.
+Ne dépasse pas 80 mots environ.
+N'invente pas de statistiques supplémentaires.
+    """
+
+
+def analysis_key(prompt):
+    """Empreinte d'un prompt : identifie une analyse dans le cache."""
+    raw = f"{PROMPT_VERSION}\x00{AI_MODEL}\x00{prompt}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _cached(prompt):
+    payload = get_response_cache().get(ANALYSIS_ENDPOINT, {'key': analysis_key(prompt)})
+    return payload['text'] if payload else None
+
+
+def _payload(text):
+    return {'text': text, 'model': AI_MODEL, 'prompt_version': PROMPT_VERSION}
+
+
+def _store(prompt, text):
+    get_response_cache().set(ANALYSIS_ENDPOINT, {'key': analysis_key(prompt)}, _payload(text))
+
+
+def _completion(client, prompt, priority, stream=False):
+    get_client("openai").throttle(priority)
+    # En mode flux, la durée mesurée est celle de l'arrivée du premier octet
+    with upstream_call("openai", "chat/completions"):
+        return (client or get_openai_client()).chat.completions.create(
+            model=AI_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=150,
+            temperature=0.7,
+            top_p=1,
+            frequency_penalty=0,
+            presence_penalty=0,
+            stream=stream
+        )
+
+
+def generate_ai_analysis(
+    home_team_name, away_team_name,
+    home_prob, draw_prob, away_prob,
+    home_form_score, away_form_score,
+    home_h2h_score, away_h2h_score,
+    client=None, priority=HIGH
+):
+    """
+    Génère un court texte de synthèse via l’API OpenAI (ChatGPT).
+    Servi depuis le cache si les mêmes entrées ont déjà été analysées.
+    Retourne None en cas d'erreur.
+    """
+    prompt = build_prompt(
+        home_team_name, away_team_name,
+        home_prob, draw_prob, away_prob,
+        home_form_score, away_form_score,
+        home_h2h_score, away_h2h_score
+    )
+
+    def fetch():
+        try:
+            completion = _completion(client, prompt, priority)
+        except Exception as e:
+            logger.warning("Erreur lors de la génération du texte IA : %s", e)
+            return None
+        return _payload(completion.choices[0].message.content.strip())
+
+    # Un seul appel OpenAI par prompt, même si plusieurs sessions le demandent en même temps
+    payload = get_response_cache().get_or_fetch(ANALYSIS_ENDPOINT, {'key': analysis_key(prompt)}, fetch)
+    return payload['text'] if payload else None
+
+
+def stream_ai_analysis(
+    home_team_name, away_team_name,
+    home_prob, draw_prob, away_prob,
+    home_form_score, away_form_score,
+    home_h2h_score, away_h2h_score,
+    client=None, priority=HIGH
+):
+    """
+    Générateur de fragments de texte (pour st.write_stream).
+    Une analyse en cache est renvoyée d'un bloc ; sinon les jetons sont
+    transmis dès leur réception et le texte complet est mis en cache.
+    N'émet rien en cas d'erreur.
+    """
+    prompt = build_prompt(
+        home_team_name, away_team_name,
+        home_prob, draw_prob, away_prob,
+        home_form_score, away_form_score,
+        home_h2h_score, away_h2h_score
+    )
+    cached = _cached(prompt)
+    if cached is not None:
+        yield cached
+        return
+
+    # Une seule génération en cours par prompt (threads et processus) : les
+    # sessions suivantes attendent la fin du flux et lisent le texte en cache.
+    cache, params = get_response_cache(), {'key': analysis_key(prompt)}
+    with cache.flights.lock(cache_key(ANALYSIS_ENDPOINT, params)):
+        payload = cache.peek(ANALYSIS_ENDPOINT, params)
+        if payload is not None:
+            yield payload['text']
+            return
+        parts = []
+        try:
+            with span("openai.stream"):
+                for chunk in _completion(client, prompt, priority, stream=True):
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+        except Exception as e:
+            logger.warning("Erreur lors de la génération du texte IA : %s", e)
+            return
+        text = "".join(parts).strip()
+        if text:
+            _store(prompt, text)
+
+
+def pregenerate_analyses(predictions, client=None, max_workers=4):
+    """
+    Remplit le cache pour chaque ligne d'un DataFrame de predictor.batch
+    (noms d'équipes, facteurs et probabilités). Retourne la liste des textes
+    (None pour les échecs), dans l'ordre des lignes.
+    """
+    def one(row):
+        return generate_ai_analysis(
+            row.home_team, row.away_team,
+            row.home_prob, row.draw_prob, row.away_prob,
+            row.home_form, row.away_form,
+            row.home_h2h, row.away_h2h,
+            client=client, priority=LOW
+        )
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis") as pool:
+        return list(pool.map(one, predictions.itertuples(index=False)))
@@ -0,0 +1,84 @@
+# predictor/api.py
+"""
+Accès API-Football : URLs, en-têtes et lecture à travers le cache persistant.
+"""
+
+import logging
+import threading
+
+import requests
+
+from .cache import ResponseCache, endpoint_of
+from .client import HIGH, get_client
+from .config import get_secret
+
+API_HOST = 'v3.football.api-sports.io'
+API_URL_LEAGUES = 'https://v3.football.api-sports.io/leagues'
+API_URL_FIXTURES = 'https://v3.football.api-sports.io/fixtures'
+API_URL_FIXTURES_H2H = 'https://v3.football.api-sports.io/fixtures/headtohead'
+API_URL_TEAMS = 'https://v3.football.api-sports.io/teams'
+API_URL_STANDINGS = 'https://v3.football.api-sports.io/standings'
+API_URL_ODDS = 'https://v3.football.api-sports.io/odds'
+API_URL_INJURIES = 'https://v3.football.api-sports.io/injuries'
+
+logger = logging.getLogger(__name__)
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Cache disque des réponses, partagé par tout le processus."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache()
+    return _cache
+
+
+def api_headers():
+    return {
+        'x-apisports-key': get_secret("API_KEY"),
+        'x-apisports-host': API_HOST
+    }
+
+
+def api_football_get(url, params=None, priority=HIGH, max_age=None):
+    """
+    Appel API-Football à travers le cache persistant.
+    Retourne le JSON de la réponse, ou None si l'appel a échoué. Les erreurs
+    de quota ou de débit arrivent en HTTP 200 avec un objet `errors` non
+    vide : elles comptent comme un échec et ne sont pas mises en cache.
+    `max_age` : âge maximal (secondes) d'une réponse en cache ; 0 force l'appel.
+    """
+    def fetch():
+        try:
+            resp = get_client("api-football").get(
+                url, params=params, headers=api_headers(), priority=priority
+            )
+        except requests.exceptions.RequestException:
+            return None
+        if resp.status_code != 200:
+            return None
+        try:
+            payload = resp.json()
+        except ValueError:  # corps vide ou page HTML d'erreur
+            logger.warning("Réponse API-Football illisible sur %s.", endpoint_of(url))
+            return None
+        if payload.get('errors'):
+            logger.warning("Erreur API-Football sur %s : %s", endpoint_of(url), payload['errors'])
+            return None
+        return payload
+
+    return get_response_cache().get_or_fetch(endpoint_of(url), params, fetch, max_age)
+
+
+def api_football_stored_at(url, params=None):
+    """Date d'obtention (timestamp) de la réponse en cache pour cet appel, ou None."""
+    return get_response_cache().stored_at(endpoint_of(url), params)
+
+
+def season_for(match_date):
+    """Saison API-Football d'une date (les saisons européennes démarrent en août)."""
+    return match_date.year - 1 if match_date.month < 8 else match_date.year
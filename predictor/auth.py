@@ -0,0 +1,166 @@
+# predictor/auth.py
+"""
+Authentification et abonnements (Supabase).
+
+Le client Supabase est créé à la première utilisation ; chaque fonction
+accepte aussi un `client` explicite.
+"""
+
+import logging
+import threading
+from datetime import datetime, timedelta
+
+import pytz
+
+from .client import stub_url
+from .config import get_secret
+from .metrics import upstream_call
+
+logger = logging.getLogger(__name__)
+
+TRIAL_DAYS = 7
+PLAN_DURATIONS = {
+    'mensuel': timedelta(days=30),
+    'trimestriel': timedelta(days=90),
+    'annuel': timedelta(days=365),
+}
+DEFAULT_PLAN_DURATION = timedelta(days=30)
+ACTIVE_STATUSES = ['active', 'cancel_pending']
+
+_supabase = None
+_supabase_lock = threading.Lock()
+
+
+class AuthError(Exception):
+    """Échec d'authentification ; le message est destiné à l'utilisateur."""
+
+
+def get_supabase():
+    """Client Supabase partagé par le processus (créé à la première utilisation)."""
+    global _supabase
+    if _supabase is None:
+        with _supabase_lock:
+            if _supabase is None:
+                from supabase import create_client
+                _supabase = create_client(
+                    stub_url(get_secret("SUPABASE_URL")), get_secret("SUPABASE_ANON_KEY")
+                )
+    return _supabase
+
+
+def set_supabase(client):
+    """Remplace le client Supabase du processus."""
+    global _supabase
+    _supabase = client
+
+
+def authenticate_user(email, password, client=None):
+    """
+    Authentifie l'utilisateur via Supabase.
+    Retourne l'objet utilisateur, ou lève AuthError.
+    """
+    try:
+        credentials = {
+            "email": email,
+            "password": password
+        }
+        with upstream_call("supabase", "auth/v1/token"):
+            response = (client or get_supabase()).auth.sign_in_with_password(credentials)
+        user = response.user
+    except Exception as e:
+        raise AuthError(f"Erreur lors de la connexion : {e}") from e
+    if not user:
+        raise AuthError("Email ou mot de passe invalide.")
+    return user
+
+
+def is_admin(email):
+    """Vrai si l'email figure dans ADMIN_EMAILS (liste séparée par des virgules)."""
+    admins = {a.strip().lower() for a in (get_secret("ADMIN_EMAILS") or "").split(",") if a.strip()}
+    return bool(email) and email.strip().lower() in admins
+
+
+def get_user_creation_date(user):
+    """
+    Récupère la date de création du compte utilisateur.
+    Retourne un objet datetime en UTC.
+    """
+    try:
+        created_at = user.created_at  # Déjà un objet datetime.datetime
+        if created_at.tzinfo is None:
+            # Si l'objet datetime n'a pas de timezone, on le définit sur UTC
+            created_at = created_at.replace(tzinfo=pytz.UTC)
+        else:
+            # Sinon, on convertit l'heure en UTC
+            created_at = created_at.astimezone(pytz.UTC)
+        return created_at
+    except Exception as e:
+        logger.warning("Erreur lors de la récupération de la date de création : %s", e)
+        return None
+
+
+def trial_days_remaining(created_at, now=None):
+    """Jours d'essai restants (0 si la période d'essai est terminée)."""
+    now = now or datetime.utcnow().replace(tzinfo=pytz.UTC)
+    diff_days = (now - created_at).days
+    return TRIAL_DAYS - diff_days if diff_days < TRIAL_DAYS else 0
+
+
+def check_subscription(user_id, client=None):
+    """
+    Vérifie dans la table "subscriptions" s'il existe une ligne pour user_id = userId
+    ET un status dans ['active', 'cancel_pending'].
+    Retourne les données de l'abonnement si trouvé, sinon False.
+    """
+    try:
+        with upstream_call("supabase", "rest/v1/subscriptions"):
+            response = (client or get_supabase()).table('subscriptions')\
+                .select('*')\
+                .eq('user_id', user_id)\
+                .in_('status', ACTIVE_STATUSES)\
+                .single()\
+                .execute()
+        data = response.data
+        if data:
+            return data
+        else:
+            return False
+    except Exception as e:
+        logger.warning("Erreur lors de la vérification de l'abonnement : %s", e)
+        return False
+
+
+def subscription_end_date(plan, updated_at):
+    """
+    Date de fin de l'abonnement (updated_at au format ISO, avec ou sans
+    fraction de seconde) ; None si la date est absente ou illisible.
+    """
+    try:
+        start_date = datetime.fromisoformat(updated_at)
+    except (TypeError, ValueError):
+        return None
+    if start_date.tzinfo is None:
+        start_date = start_date.replace(tzinfo=pytz.UTC)
+    return start_date + PLAN_DURATIONS.get(plan, DEFAULT_PLAN_DURATION)
+
+
+def calculate_time_remaining(plan, updated_at):
+    """
+    Calcule le temps restant de l'abonnement en fonction du plan et de la date de mise à jour.
+    Retourne une chaîne de caractères indiquant le temps restant.
+    """
+    try:
+        end_date = subscription_end_date(plan, updated_at)
+        if end_date is None:
+            return "Date de fin de l'abonnement inconnue."
+        now = datetime.utcnow().replace(tzinfo=pytz.UTC)
+        diff = end_date - now
+
+        if diff <= timedelta(0):
+            return 'Votre abonnement est expiré.'
+        else:
+            days = diff.days
+            return f"Temps restant : {days} jour(s)"
+    except Exception as e:
+        logger.warning("Erreur lors du calcul du temps restant : %s", e)
+        return "Erreur de calcul."
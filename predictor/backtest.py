@@ -0,0 +1,276 @@
+# predictor/backtest.py
+"""
+Backtest vectorisé du modèle de pondération sur l'historique stocké.
+
+Les facteurs de chaque match sont reconstruits « au moment du match », sans
+fuite : la forme ne compte que les matchs de l'équipe strictement antérieurs
+au coup d'envoi, le H2H que les confrontations antérieures. Tout est calculé
+par tris et sommes cumulées NumPy sur l'ensemble du jeu de données (aucune
+boucle par match, aucun appel API), puis le modèle est évalué en une seule
+multiplication matricielle : log-loss, score de Brier, précision et courbes
+de calibration, par ligue et par saison.
+
+Les cotes et les blessures ne sont pas historisées : leurs facteurs prennent
+les valeurs neutres de l'application (HISTORICAL_DEFAULTS). La météo vient
+de WeatherStore quand le match y figure.
+
+Usage :
+    python -m predictor.backtest
+    python -m predictor.backtest --start 2024-08-01 --calibration calibration.csv
+"""
+
+import argparse
+import sys
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from .dataset import MatchDataset
+from .history import PLAYED_STATUSES
+from .injuries import DEFAULT_INJURY_FACTOR
+from .model import FACTOR_NAMES, OUTCOMES, predict_proba
+from .odds import DEFAULT_ODDS_PROBS
+from .weather import FALLBACK_FACTOR, MATCH_WINDOW
+
+FORM_WINDOW = 5         # comme get_team_form(n=5)
+NO_HISTORY = 0.33       # forme / H2H sans match antérieur (comme l'application)
+CALIBRATION_BINS = 10
+EPSILON = 1e-15
+
+# Facteurs sans historique : valeurs servies par l'application sans donnée
+HISTORICAL_DEFAULTS = {
+    "home_odds": DEFAULT_ODDS_PROBS[0], "draw_odds": DEFAULT_ODDS_PROBS[1], "away_odds": DEFAULT_ODDS_PROBS[2],
+    "home_injury": DEFAULT_INJURY_FACTOR, "away_injury": DEFAULT_INJURY_FACTOR,
+}
+
+COLUMNS = (
+    'fixture.id', 'fixture.timestamp', 'fixture.status.short',
+    'league.id', 'league.season',
+    'teams.home.id', 'teams.away.id',
+    'goals.home', 'goals.away',
+    'score.fulltime.home', 'score.fulltime.away',
+)
+
+
+# ---------------------------------------------------------------- données
+def load_matches(dataset=None, start=None, end=None):
+    """Matchs joués du jeu de données, triés par coup d'envoi : {colonne: ndarray}."""
+    arrays = (dataset or MatchDataset()).load_arrays(COLUMNS, start, end)
+    played = np.isin(arrays['fixture.status.short'], [s.encode() for s in PLAYED_STATUSES])
+    # Résultat du temps réglementaire (score.fulltime), sinon score final
+    home_goals = np.where(np.isnan(arrays['score.fulltime.home']), arrays['goals.home'], arrays['score.fulltime.home'])
+    away_goals = np.where(np.isnan(arrays['score.fulltime.away']), arrays['goals.away'], arrays['score.fulltime.away'])
+    keep = played & ~np.isnan(home_goals) & ~np.isnan(away_goals)
+    order = np.argsort(arrays['fixture.timestamp'][keep], kind='stable')
+    matches = {name: array[keep][order] for name, array in arrays.items()}
+    matches['home_goals'] = home_goals[keep][order]
+    matches['away_goals'] = away_goals[keep][order]
+    return matches
+
+
+def outcomes(matches):
+    """Issue de chaque match : 0 domicile, 1 nul, 2 extérieur."""
+    diff = matches['home_goals'] - matches['away_goals']
+    return np.where(diff > 0, 0, np.where(diff == 0, 1, 2))
+
+
+def _exclusive_cumsum(values, groups):
+    """
+    Somme des valeurs précédentes du même groupe, pour des lignes déjà triées
+    par (groupe, temps) ; retourne aussi la position de chaque ligne dans son groupe.
+    """
+    csum = np.cumsum(values, axis=0)
+    starts = np.r_[True, groups[1:] != groups[:-1]]
+    start_idx = np.maximum.accumulate(np.where(starts, np.arange(len(groups)), 0))
+    before_group = np.where(start_idx[:, None] > 0, csum[start_idx - 1], 0) if values.ndim > 1 \
+        else np.where(start_idx > 0, csum[start_idx - 1], 0)
+    return csum - values - before_group, np.arange(len(groups)) - start_idx
+
+
+# --------------------------------------------------------------- facteurs
+def form_factors(matches, window=FORM_WINDOW):
+    """
+    Proportion de victoires sur les `window` derniers matchs antérieurs,
+    pour l'équipe à domicile et à l'extérieur : deux tableaux (n,).
+    """
+    n = len(matches['fixture.id'])
+    teams = np.concatenate([matches['teams.home.id'], matches['teams.away.id']])
+    wins = np.concatenate([
+        matches['home_goals'] > matches['away_goals'],
+        matches['away_goals'] > matches['home_goals'],
+    ]).astype(float)
+    times = np.tile(matches['fixture.timestamp'], 2)
+    order = np.lexsort((times, teams))
+    sorted_teams = teams[order]
+    before, position = _exclusive_cumsum(wins[order], sorted_teams)
+    # Fenêtre glissante : retrancher ce qui précède les `window` derniers matchs
+    lagged = np.zeros_like(before)
+    deep = position >= window
+    lagged[deep] = before[np.flatnonzero(deep) - window]
+    count = np.minimum(position, window)
+    rate = np.divide(before - lagged, count, out=np.full(len(order), NO_HISTORY), where=count > 0)
+    form = np.empty(2 * n)
+    form[order] = rate
+    return form[:n], form[n:]
+
+
+def h2h_factors(matches):
+    """
+    (victoires domicile, victoires extérieur) / confrontations antérieures,
+    du point de vue de l'équipe qui reçoit : deux tableaux (n,).
+    """
+    home, away = matches['teams.home.id'], matches['teams.away.id']
+    lo, hi = np.minimum(home, away), np.maximum(home, away)
+    hg, ag = matches['home_goals'], matches['away_goals']
+    winner = np.where(hg > ag, home, np.where(ag > hg, away, -1))
+    won = np.stack([winner == lo, winner == hi], axis=1).astype(float)
+    pair = lo * (hi.max() + 1 if len(hi) else 1) + hi
+    order = np.lexsort((matches['fixture.timestamp'], pair))
+    before, position = _exclusive_cumsum(won[order], pair[order])
+    lo_wins, hi_wins = np.empty(len(pair)), np.empty(len(pair))
+    lo_wins[order], hi_wins[order] = before[:, 0], before[:, 1]
+    total = np.empty(len(pair))
+    total[order] = position
+    home_is_lo = home == lo
+    home_wins = np.where(home_is_lo, lo_wins, hi_wins)
+    away_wins = np.where(home_is_lo, hi_wins, lo_wins)
+    no_h2h = total == 0
+    safe = np.maximum(total, 1)
+    return (
+        np.where(no_h2h, NO_HISTORY, home_wins / safe),
+        np.where(no_h2h, NO_HISTORY, away_wins / safe),
+    )
+
+
+def weather_factors(matches, store=None):
+    """Facteur météo au coup d'envoi (pluie sur MATCH_WINDOW), FALLBACK_FACTOR sans série."""
+    n = len(matches['fixture.id'])
+    if store is None:
+        try:
+            from .weather_store import WeatherStore
+            store = WeatherStore()
+        except FileNotFoundError:
+            return np.full(n, FALLBACK_FACTOR)
+    rain = store.window(
+        matches['fixture.id'], matches['fixture.timestamp'], ("precipitation",),
+        before=-MATCH_WINDOW[0], after=MATCH_WINDOW[1],
+    )["precipitation"]
+    known = ~np.isnan(rain).all(axis=1)
+    factor = np.maximum(0, 1 - np.nansum(rain, axis=1) * 0.1)
+    return np.where(known, factor, FALLBACK_FACTOR)
+
+
+def factor_matrix(matches, weather_store=None, form_window=FORM_WINDOW):
+    """Matrice (n x 10) des facteurs reconstruits, dans l'ordre de FACTOR_NAMES."""
+    n = len(matches['fixture.id'])
+    columns = dict(HISTORICAL_DEFAULTS)
+    columns["home_form"], columns["away_form"] = form_factors(matches, form_window)
+    columns["home_h2h"], columns["away_h2h"] = h2h_factors(matches)
+    columns["weather"] = weather_factors(matches, weather_store)
+    return np.column_stack([np.broadcast_to(columns[name], n) for name in FACTOR_NAMES]).astype(float)
+
+
+# ---------------------------------------------------------------- mesures
+def _groups(matches):
+    """Indice de groupe (ligue, saison) de chaque match et clés des groupes."""
+    keys = np.stack([matches['league.id'], matches['league.season']], axis=1)
+    unique, inverse = np.unique(keys, axis=0, return_inverse=True)
+    return inverse.ravel(), unique
+
+
+def scores(probs, y, groups, n_groups):
+    """Log-loss, Brier (multi-classe) et précision moyens par groupe."""
+    rows = np.arange(len(y))
+    log_loss = -np.log(np.clip(probs[rows, y], EPSILON, 1))
+    onehot = np.eye(3)[y]
+    brier = ((probs - onehot) ** 2).sum(axis=1)
+    correct = (probs.argmax(axis=1) == y).astype(float)
+    count = np.bincount(groups, minlength=n_groups)
+    safe = np.maximum(count, 1)
+    return {
+        "matches": count,
+        "log_loss": np.bincount(groups, log_loss, n_groups) / safe,
+        "brier": np.bincount(groups, brier, n_groups) / safe,
+        "accuracy": np.bincount(groups, correct, n_groups) / safe,
+    }
+
+
+def calibration(probs, y, groups, n_groups, bins=CALIBRATION_BINS):
+    """
+    Courbes de calibration par groupe et par issue : probabilité prédite
+    moyenne et fréquence observée dans chaque tranche [k/bins, (k+1)/bins).
+    Tableau (groupes x issues x tranches x 3) : prédite, observée, effectif.
+    """
+    onehot = np.eye(3)[y]
+    bin_idx = np.minimum((probs * bins).astype(int), bins - 1)
+    outcome_idx = np.broadcast_to(np.arange(3), probs.shape)
+    flat = (groups[:, None] * 3 + outcome_idx) * bins + bin_idx
+    size = n_groups * 3 * bins
+    count = np.bincount(flat.ravel(), minlength=size)
+    predicted = np.bincount(flat.ravel(), probs.ravel(), size)
+    observed = np.bincount(flat.ravel(), onehot.ravel(), size)
+    safe = np.maximum(count, 1)
+    curves = np.stack([
+        np.where(count > 0, predicted / safe, np.nan),
+        np.where(count > 0, observed / safe, np.nan),
+        count,
+    ], axis=1)
+    return curves.reshape(n_groups, 3, bins, 3)
+
+
+# -------------------------------------------------------------- backtest
+def run_backtest(dataset=None, weights=None, weather_store=None, start=None, end=None,
+                 bins=CALIBRATION_BINS):
+    """
+    Évalue les pondérations sur tout l'historique. Retourne
+    (résumé par ligue et saison, courbes de calibration), deux DataFrames ;
+    le résumé se termine par une ligne « toutes ligues » (league_id = -1).
+    """
+    matches = load_matches(dataset, start, end)
+    y = outcomes(matches)
+    probs = predict_proba(factor_matrix(matches, weather_store), weights)
+    groups, keys = _groups(matches)
+    n_groups = len(keys)
+
+    per_group = scores(probs, y, groups, n_groups)
+    overall = scores(probs, y, np.zeros(len(y), dtype=int), 1)
+    summary = pd.DataFrame({
+        "league_id": np.r_[keys[:, 0], -1] if n_groups else [-1],
+        "season": np.r_[keys[:, 1], -1] if n_groups else [-1],
+        **{name: np.r_[per_group[name], overall[name]] for name in per_group},
+    })
+
+    curves = calibration(probs, y, groups, n_groups, bins)
+    g, o, b = np.meshgrid(np.arange(n_groups), np.arange(3), np.arange(bins), indexing="ij")
+    calibration_frame = pd.DataFrame({
+        "league_id": keys[g.ravel(), 0] if n_groups else [],
+        "season": keys[g.ravel(), 1] if n_groups else [],
+        "outcome": np.array(OUTCOMES)[o.ravel()],
+        "bin_low": b.ravel() / bins,
+        "predicted": curves[..., 0].ravel(),
+        "observed": curves[..., 1].ravel(),
+        "count": curves[..., 2].ravel().astype(int),
+    })
+    return summary, calibration_frame[calibration_frame["count"] > 0].reset_index(drop=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest du modèle sur l'historique stocké.")
+    parser.add_argument("--start", help="Premier jour (AAAA-MM-JJ)")
+    parser.add_argument("--end", help="Dernier jour (AAAA-MM-JJ)")
+    parser.add_argument("--bins", type=int, default=CALIBRATION_BINS, help="Tranches de calibration")
+    parser.add_argument("--calibration", help="Fichier CSV des courbes de calibration")
+    args = parser.parse_args(argv)
+
+    start = datetime.strptime(args.start, "%Y-%m-%d").date() if args.start else None
+    end = datetime.strptime(args.end, "%Y-%m-%d").date() if args.end else None
+    summary, curves = run_backtest(start=start, end=end, bins=args.bins)
+    summary.to_string(sys.stdout, index=False, float_format=lambda v: f"{v:.4f}")
+    print()
+    if args.calibration:
+        curves.to_csv(args.calibration, index=False)
+
+
+if __name__ == "__main__":
+    main()
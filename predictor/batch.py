@@ -0,0 +1,137 @@
+# predictor/batch.py
+"""
+Prédiction en lot : tous les matchs d'une date (une ligue ou toutes).
+
+Les facteurs de tous les matchs sont collectés sur un même pool de threads,
+rassemblés dans une matrice NumPy (n x 10), puis la matrice de probabilités
+(n x 3) est calculée en une seule opération vectorisée.
+
+Usage :
+    python -m predictor.batch --date 2024-12-07 --league 61 --output ligue1.csv
+    python -m predictor.batch --date 2024-12-07 --output all.json
+    python -m predictor.batch --date 2024-12-07 --analysis   # prégénère les analyses IA
+    python -m predictor.batch --date 2024-12-07 --store      # enregistre dans predictor.predictions
+"""
+
+import argparse
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+from .client import LOW
+from .factors import submit_match_factors
+from .fixtures import get_fixture_board
+from .model import FACTOR_NAMES, model_version, predict_proba
+from .odds import get_odds_book
+from .weights import weights_for
+
+
+def fetch_day_fixtures(match_date, league_id=None, season=None, priority=LOW):
+    """Matchs d'une date, pour une ligue ou pour toutes les ligues (index par date partagé)."""
+    day_fixtures = get_fixture_board().day(match_date, priority)
+    if day_fixtures is None:
+        return []
+    if not league_id:
+        return list(day_fixtures.by_id.values())
+    fixtures = day_fixtures.league(league_id)
+    if season:
+        fixtures = [f for f in fixtures if f['league'].get('season') == season]
+    return list(fixtures)
+
+
+def gather_factors(fixtures, match_date, max_workers=16, priority=LOW):
+    """Matrice (n x 10) des facteurs des matchs, collectés sur un pool commun."""
+    if not fixtures:
+        return np.empty((0, len(FACTOR_NAMES)))
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="batch") as pool:
+        pending = [
+            submit_match_factors(
+                pool,
+                fix['league']['id'],
+                fix['teams']['home']['id'],
+                fix['teams']['away']['id'],
+                fix['fixture']['id'],
+                fix['fixture'].get('venue', {}).get('city'),
+                fix['fixture'].get('timestamp') or match_date,
+                priority,
+                fix['fixture'].get('venue', {}).get('id'),
+            )
+            for fix in fixtures
+        ]
+        return np.array([result() for result in pending], dtype=float)
+
+
+def predict_fixtures(fixtures, factors, weights=None):
+    """
+    DataFrame des prédictions : une ligne par match, facteurs et probabilités.
+    Sans `weights`, chaque ligue reçoit ses pondérations calibrées (predictor.weights).
+    """
+    league_ids = np.array([f['league']['id'] for f in fixtures], dtype=np.int64)
+    probs = np.empty((len(fixtures), 3))
+    versions = np.empty(len(fixtures), dtype=object)
+    for league_id in np.unique(league_ids):
+        rows = league_ids == league_id
+        league_weights = weights if weights is not None else weights_for(int(league_id))
+        probs[rows] = predict_proba(factors[rows], league_weights)
+        versions[rows] = model_version(league_weights)
+    frame = pd.DataFrame({
+        'fixture_id': [f['fixture']['id'] for f in fixtures],
+        'kickoff': [f['fixture'].get('date') for f in fixtures],
+        'league_id': league_ids,
+        'league_name': [f['league'].get('name') for f in fixtures],
+        'home_team': [f['teams']['home']['name'] for f in fixtures],
+        'away_team': [f['teams']['away']['name'] for f in fixtures],
+    })
+    factor_frame = pd.DataFrame(factors.reshape(-1, len(FACTOR_NAMES)), columns=FACTOR_NAMES)
+    prob_frame = pd.DataFrame(probs, columns=['home_prob', 'draw_prob', 'away_prob'])
+    frame = pd.concat([frame, factor_frame, prob_frame], axis=1)
+    frame['model_version'] = versions
+    return frame
+
+
+def predict_day(match_date, league_id=None, season=None, weights=None, max_workers=16, priority=LOW):
+    """Prédictions de tous les matchs d'une date (une ligue, ou toutes si league_id est None)."""
+    fixtures = fetch_day_fixtures(match_date, league_id, season, priority)
+    if not league_id:
+        # Toutes ligues : un seul flux de cotes paginé pour la journée
+        get_odds_book().load(match_date, None, priority)
+    factors = gather_factors(fixtures, match_date, max_workers, priority)
+    return predict_fixtures(fixtures, factors, weights)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prédictions de tous les matchs d'une journée.")
+    parser.add_argument("--date", default=date.today().isoformat(), help="Date des matchs (AAAA-MM-JJ)")
+    parser.add_argument("--league", type=int, help="Identifiant de ligue (toutes les ligues si absent)")
+    parser.add_argument("--season", type=int, help="Saison (déduite de la date si absente)")
+    parser.add_argument("--workers", type=int, default=16, help="Nombre d'appels API simultanés")
+    parser.add_argument("--output", help="Fichier de sortie .csv ou .json (stdout si absent)")
+    parser.add_argument("--analysis", action="store_true",
+                        help="Prégénère (et met en cache) l'analyse IA de chaque match")
+    parser.add_argument("--store", action="store_true",
+                        help="Enregistre les prédictions (et analyses) dans le stockage des prédictions")
+    args = parser.parse_args(argv)
+
+    match_date = datetime.strptime(args.date, "%Y-%m-%d").date()
+    predictions = predict_day(match_date, args.league, args.season, max_workers=args.workers)
+    if args.analysis:
+        from .analysis import pregenerate_analyses
+        predictions['analysis'] = pregenerate_analyses(predictions)
+    if args.store:
+        from .predictions import store_predictions
+        store_predictions(predictions)
+
+    if args.output and args.output.endswith(".json"):
+        predictions.to_json(args.output, orient="records", indent=2, force_ascii=False)
+    elif args.output:
+        predictions.to_csv(args.output, index=False)
+    else:
+        predictions.to_csv(sys.stdout, index=False)
+    print(f"{len(predictions)} match(s) prédit(s) pour le {match_date}.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+# predictor/bench.py
+"""
+Banc d'essai hors ligne, sur les réponses enregistrées par predictor.stub.
+
+Le banc démarre le serveur bouchon en mode rejeu (latence et erreurs
+configurables), puis exécute les scénarios dans un processus neuf dont les
+caches, l'historique, le gazetteer et le stockage des prédictions pointent
+vers un répertoire temporaire : chaque exécution part de caches vides et ne
+touche ni le réseau ni les fichiers locaux de l'application.
+
+Mesures :
+- rendu de la page de match (chemin de données de football.py, sans
+  Streamlit) : durée et appels aux fournisseurs par rendu, à froid puis à chaud ;
+- taux de succès du cache des réponses, par endpoint ;
+- débit de la prédiction en lot (predictor.batch.predict_day).
+
+Avec --baseline, les écarts relatifs à une exécution précédente (--json)
+sont affichés, et la commande échoue au-delà de --tolerance.
+
+Usage :
+    python -m predictor.bench --date 2024-12-07 --league 61
+    python -m predictor.bench --date 2024-12-07 --league 61 --latency 0.08 --error-rate 0.05
+    python -m predictor.bench --date 2024-12-07 --league 61 --json bench.json --baseline previous.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+from .stub import DEFAULT_CASSETTE_DIR, STATS_PATH, CassetteStore, StubConfig, StubServer, parse_host_latency
+
+# Mesures comparées à la référence : (clé, plus grand = meilleur)
+TRACKED = (
+    ("render.cold.p50_ms", False),
+    ("render.warm.p50_ms", False),
+    ("render.cold.calls_per_render", False),
+    ("render.warm.calls_per_render", False),
+    ("cache.hit_ratio", True),
+    ("batch.fixtures_per_second", True),
+    ("batch.calls", False),
+)
+
+
+# ----------------------------------------------------------------- worker
+def _stub_requests():
+    import requests
+    return requests.get(os.environ["UPSTREAM_STUB_URL"] + STATS_PATH, timeout=5).json()["total"]
+
+
+def render_match(fixture_date, league_id, fixture_id, analysis=True):
+    """Chemin de données d'un affichage de la page de match (football.py)."""
+    from .analysis import stream_ai_analysis
+    from .catalogue import get_catalogue
+    from .factors import collect_match_factors
+    from .fixtures import get_fixture_board
+    from .predictions import read_through, save_analysis
+
+    catalogue = get_catalogue()
+    if catalogue is not None:
+        catalogue.league(league_id)
+    day_fixtures = get_fixture_board().day(fixture_date)
+    fixture = day_fixtures.fixture(fixture_id) if day_fixtures is not None else None
+    if fixture is None:
+        return None
+    venue = fixture['fixture'].get('venue') or {}
+    prediction = read_through(fixture, lambda: collect_match_factors(
+        league_id, fixture['teams']['home']['id'], fixture['teams']['away']['id'],
+        fixture_id, venue.get('city'), fixture['fixture'].get('timestamp') or fixture_date,
+        venue_id=venue.get('id'),
+    ))
+    if analysis and not prediction.get('analysis'):
+        factors = prediction['factors']
+        text = "".join(stream_ai_analysis(
+            fixture['teams']['home']['name'], fixture['teams']['away']['name'],
+            prediction['home_prob'], prediction['draw_prob'], prediction['away_prob'],
+            factors['home_form'], factors['away_form'], factors['home_h2h'], factors['away_h2h'],
+        ))
+        if text:
+            save_analysis(prediction['fixture_id'], prediction['model_version'], text)
+    return prediction
+
+
+def _render_pass(fixture_date, league_id, fixture_ids, analysis):
+    durations, calls = [], []
+    for fixture_id in fixture_ids:
+        before, start = _stub_requests(), time.perf_counter()
+        render_match(fixture_date, league_id, fixture_id, analysis)
+        durations.append((time.perf_counter() - start) * 1000)
+        calls.append(_stub_requests() - before)
+    durations = np.array(durations) if durations else np.zeros(1)
+    return {
+        "renders": len(fixture_ids),
+        "p50_ms": float(np.percentile(durations, 50)),
+        "p95_ms": float(np.percentile(durations, 95)),
+        "calls_per_render": float(np.mean(calls)) if calls else 0.0,
+    }
+
+
+def run_scenarios(fixture_date, league_id, renders, analysis=True, workers=16):
+    """Exécute les scénarios dans le processus courant ; retourne les mesures."""
+    from .api import get_response_cache
+    from .batch import fetch_day_fixtures, predict_day
+
+    fixture_ids = [f['fixture']['id'] for f in fetch_day_fixtures(fixture_date, league_id)][:renders]
+    results = {
+        "render": {
+            "cold": _render_pass(fixture_date, league_id, fixture_ids, analysis),
+            "warm": _render_pass(fixture_date, league_id, fixture_ids, analysis),
+        },
+    }
+    before, start = _stub_requests(), time.perf_counter()
+    predictions = predict_day(fixture_date, league_id, max_workers=workers)
+    elapsed = time.perf_counter() - start
+    results["batch"] = {
+        "fixtures": len(predictions),
+        "seconds": elapsed,
+        "fixtures_per_second": len(predictions) / elapsed if elapsed else 0.0,
+        "calls": _stub_requests() - before,
+    }
+    stats = get_response_cache().stats()
+    results["cache"] = {"hit_ratio": stats["hit_ratio"], "by_endpoint": stats["by_endpoint"]}
+    return results
+
+
+# ------------------------------------------------------------ orchestration
+def run_bench(fixture_date, league_id, renders=10, cassettes=DEFAULT_CASSETTE_DIR, config=None,
+              analysis=True, workers=16):
+    """Démarre le bouchon, exécute les scénarios dans un processus isolé ; retourne les mesures."""
+    stub = StubServer(CassetteStore(cassettes), config=config).start()
+    try:
+        with tempfile.TemporaryDirectory(prefix="bench-") as workdir:
+            env = dict(
+                os.environ,
+                UPSTREAM_STUB_URL=stub.url,
+                API_CACHE_PATH=os.path.join(workdir, "api.sqlite3"),
+                HISTORY_DB_PATH=os.path.join(workdir, "history.sqlite3"),
+                GAZETTEER_PATH=os.path.join(workdir, "gazetteer.sqlite3"),
+                PREDICTIONS_DB_PATH=os.path.join(workdir, "predictions.sqlite3"),
+                PREDICTIONS_BACKEND="sqlite",
+            )
+            env.pop("OPENAI_BASE_URL", None)
+            for name in ("API_KEY", "OPENAI_API_KEY", "POSITIONSTACK_API_KEY", "WEATHER_API_KEY"):
+                env.setdefault(name, "stub")
+            command = [sys.executable, "-m", "predictor.bench", "--worker",
+                       "--date", fixture_date.isoformat(), "--league", str(league_id),
+                       "--renders", str(renders), "--workers", str(workers)]
+            if not analysis:
+                command.append("--no-analysis")
+            proc = subprocess.run(command, env=env, capture_output=True, text=True)
+            if proc.returncode != 0:
+                raise RuntimeError(f"Échec du scénario :\n{proc.stderr}")
+            results = json.loads(proc.stdout)
+        results["stub"] = stub.stats()
+        return results
+    finally:
+        stub.stop()
+
+
+def _lookup(results, dotted):
+    value = results
+    for part in dotted.split("."):
+        value = value.get(part, {}) if isinstance(value, dict) else {}
+    return value if isinstance(value, (int, float)) else None
+
+
+def compare(results, baseline, tolerance):
+    """[(mesure, référence, valeur, écart relatif, régression ?), ...]."""
+    rows = []
+    for key, higher_is_better in TRACKED:
+        old, new = _lookup(baseline, key), _lookup(results, key)
+        if old is None or new is None:
+            continue
+        change = (new - old) / old if old else 0.0
+        worse = -change if higher_is_better else change
+        rows.append((key, old, new, change, worse > tolerance))
+    return rows
+
+
+def report(results):
+    cold, warm = results["render"]["cold"], results["render"]["warm"]
+    batch, cache = results["batch"], results["cache"]
+    lines = [
+        f"Rendu à froid : p50 {cold['p50_ms']:.1f} ms, p95 {cold['p95_ms']:.1f} ms, "
+        f"{cold['calls_per_render']:.1f} appel(s)/rendu ({cold['renders']} rendu(s))",
+        f"Rendu à chaud : p50 {warm['p50_ms']:.1f} ms, p95 {warm['p95_ms']:.1f} ms, "
+        f"{warm['calls_per_render']:.1f} appel(s)/rendu",
+        f"Lot : {batch['fixtures']} match(s) en {batch['seconds']:.2f} s "
+        f"({batch['fixtures_per_second']:.1f} match(s)/s, {batch['calls']} appel(s))",
+        f"Cache des réponses : {cache['hit_ratio']:.1%} de succès",
+    ]
+    lines += [f"  {ep:<24} {c['hits']:>5} succès {c['misses']:>5} échecs"
+              for ep, c in cache["by_endpoint"].items()]
+    outcomes = results.get("stub", {}).get("outcomes", {})
+    lines.append("Bouchon : " + ", ".join(f"{k} {v}" for k, v in sorted(outcomes.items())))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banc d'essai hors ligne (réponses enregistrées).")
+    parser.add_argument("--date", required=True, help="Date des matchs enregistrés (AAAA-MM-JJ)")
+    parser.add_argument("--league", type=int, required=True, help="Identifiant de ligue")
+    parser.add_argument("--renders", type=int, default=10, help="Matchs affichés par passe")
+    parser.add_argument("--workers", type=int, default=16, help="Appels simultanés du lot")
+    parser.add_argument("--no-analysis", action="store_true", help="Sans texte IA")
+    parser.add_argument("--cassettes", default=DEFAULT_CASSETTE_DIR, help="Répertoire des cassettes")
+    parser.add_argument("--latency", type=float, default=0.0, help="Latence ajoutée (secondes)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Variation de latence (± secondes)")
+    parser.add_argument("--host-latency", action="append", metavar="HÔTE=SECONDES",
+                        help="Latence propre à un hôte (répétable)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Proportion de réponses en erreur")
+    parser.add_argument("--seed", type=int, default=0, help="Graine du tirage latence / erreurs")
+    parser.add_argument("--json", help="Écrit les mesures dans ce fichier")
+    parser.add_argument("--baseline", help="Mesures de référence (fichier --json précédent)")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Dégradation relative tolérée")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    fixture_date = datetime.strptime(args.date, "%Y-%m-%d").date()
+    if args.worker:
+        results = run_scenarios(fixture_date, args.league, args.renders,
+                                analysis=not args.no_analysis, workers=args.workers)
+        json.dump(results, sys.stdout)
+        return
+
+    config = StubConfig(args.latency, args.jitter, args.error_rate,
+                        host_latency=parse_host_latency(args.host_latency), seed=args.seed)
+    results = run_bench(fixture_date, args.league, args.renders, args.cassettes, config,
+                        analysis=not args.no_analysis, workers=args.workers)
+    print(report(results))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            rows = compare(results, json.load(f), args.tolerance)
+        for key, old, new, change, regressed in rows:
+            flag = "  RÉGRESSION" if regressed else ""
+            print(f"{key:<32} {old:>10.2f} -> {new:>10.2f} ({change:+.1%}){flag}")
+        if any(row[4] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
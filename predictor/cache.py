@@ -0,0 +1,264 @@
+# predictor/cache.py
+"""
+Cache persistant des réponses API-Football.
+
+Les réponses sont stockées dans un fichier SQLite (JSON compressé zlib),
+partagé par toutes les sessions et conservé entre deux redémarrages.
+La clé est l'endpoint + les paramètres normalisés ; la durée de vie
+dépend de l'endpoint (et, pour les matchs, de leur statut).
+
+Une lecture ne fait pas d'écriture : les dates d'accès (pour l'éviction
+LRU) sont gardées en mémoire et écrites par lots. La taille totale n'est
+recalculée que toutes les EVICT_EVERY écritures, ou quand l'estimation
+tenue à jour dépasse la limite.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from collections import Counter
+
+from .metrics import record_cache
+from .shared import SingleFlight, connect
+
+DEFAULT_CACHE_PATH = os.getenv("API_CACHE_PATH", os.path.join(".cache", "api_football.sqlite3"))
+DEFAULT_MAX_BYTES = int(os.getenv("API_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+# Statuts API-Football d'un match terminé (le résultat ne changera plus).
+# CANC / ABD en sont exclus : ces matchs sont souvent reprogrammés.
+FINISHED_STATUSES = {"FT", "AET", "PEN", "AWD", "WO"}
+
+ACCESS_FLUSH_SIZE = 256      # dates d'accès en attente avant écriture groupée
+ACCESS_FLUSH_INTERVAL = 60   # secondes au plus entre deux écritures groupées
+EVICT_EVERY = 100            # écritures entre deux recalculs de la taille
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+
+# Durée de vie par endpoint (en secondes) ; None = pas d'expiration
+ENDPOINT_TTLS = {
+    "leagues": 3 * DAY,
+    "teams": 7 * DAY,
+    "standings": HOUR,
+    "fixtures": 10 * MINUTE,
+    "fixtures/headtohead": 12 * HOUR,
+    "injuries": 6 * HOUR,
+    "odds": 5 * MINUTE,
+    # Prévisions meteoblue : une par maille et par fenêtre de rafraîchissement
+    "packages/basic-1h": 3 * HOUR,
+    # Analyses IA : clé = empreinte du prompt, le contenu ne périme pas
+    "openai/analysis": None,
+}
+DEFAULT_TTL = 10 * MINUTE
+
+
+def endpoint_of(url):
+    """Retourne le chemin de l'endpoint ('fixtures', 'fixtures/headtohead', ...) d'une URL."""
+    path = url.split("://", 1)[-1].split("/", 1)[-1]
+    return path.strip("/")
+
+
+def normalize_params(params):
+    """Paramètres triés, valeurs converties en texte : deux requêtes équivalentes ont la même clé."""
+    return sorted((str(k), str(v)) for k, v in (params or {}).items() if v is not None)
+
+
+def cache_key(endpoint, params):
+    raw = json.dumps([endpoint, normalize_params(params)], separators=(",", ":"))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def ttl_for(endpoint, params, payload):
+    """
+    Durée de vie d'une réponse.
+    Une liste de matchs tous terminés n'expire jamais (sauf recherche "last", qui glisse).
+    """
+    if endpoint == "fixtures" and "last" not in dict(normalize_params(params)):
+        fixtures = payload.get("response", []) if isinstance(payload, dict) else []
+        if fixtures and all(
+            f.get("fixture", {}).get("status", {}).get("short") in FINISHED_STATUSES
+            for f in fixtures
+        ):
+            return None
+    return ENDPOINT_TTLS.get(endpoint, DEFAULT_TTL)
+
+
+class ResponseCache:
+    """
+    Cache disque borné en taille (éviction LRU) avec compteurs hit/miss par endpoint.
+    Une instance est sûre entre threads ; plusieurs instances, et plusieurs
+    processus, peuvent viser le même fichier (WAL). get_or_fetch ne laisse
+    qu'un appel en cours par clé, tous processus confondus.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = Counter()
+        self.misses = Counter()
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.flights = SingleFlight(f"{path}.lock")
+        self._conn = connect(path)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                endpoint TEXT NOT NULL,
+                payload BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                stored_at REAL NOT NULL,
+                expires_at REAL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS responses_last_access ON responses(last_access);
+            """
+        )
+        self._accessed = {}         # clé -> dernière lecture, pas encore écrite
+        self._flushed_at = time.time()
+        self._size = None           # estimation de la taille totale (None : à mesurer)
+        self._writes = 0
+
+    # ----------------------------------------------------------------- lecture
+    def _read(self, key, max_age=None):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, expires_at, stored_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (row[1] is not None and row[1] <= now):
+                return None
+            if max_age is not None and now - row[2] >= max_age:
+                return None
+            self._accessed[key] = now
+            if len(self._accessed) >= ACCESS_FLUSH_SIZE or now - self._flushed_at >= ACCESS_FLUSH_INTERVAL:
+                self._flush_access()
+        return json.loads(zlib.decompress(row[0]))
+
+    def _flush_access(self):
+        """Écrit les dates d'accès en attente (verrou tenu)."""
+        if self._accessed:
+            self._conn.executemany(
+                "UPDATE responses SET last_access = ? WHERE key = ?",
+                [(at, key) for key, at in self._accessed.items()],
+            )
+            self._accessed.clear()
+        self._flushed_at = time.time()
+
+    def get(self, endpoint, params, max_age=None):
+        """
+        Retourne la réponse JSON en cache, ou None si absente / expirée
+        (ou enregistrée depuis `max_age` secondes ou plus).
+        """
+        payload = self.peek(endpoint, params, max_age)
+        with self._lock:
+            (self.hits if payload is not None else self.misses)[endpoint] += 1
+        record_cache("api", endpoint, payload is not None)
+        return payload
+
+    def peek(self, endpoint, params, max_age=None):
+        """Comme get(), sans compter de succès / échec."""
+        return self._read(cache_key(endpoint, params), max_age)
+
+    def stored_at(self, endpoint, params):
+        """Date d'enregistrement (timestamp) de la réponse en cache, ou None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT stored_at FROM responses WHERE key = ?", (cache_key(endpoint, params),)
+            ).fetchone()
+        return row[0] if row else None
+
+    # -------------------------------------------------------------- écriture
+    def set(self, endpoint, params, payload, ttl=None):
+        """Enregistre une réponse ; ttl=None applique la politique ttl_for()."""
+        if ttl is None:
+            ttl = ttl_for(endpoint, params, payload)
+        blob = zlib.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (cache_key(endpoint, params), endpoint, blob, len(blob), now, expires_at, now),
+            )
+            self._writes += 1
+            if self._size is not None:
+                self._size += len(blob)  # surestimation si la clé existait : recalcul anticipé
+            if self._size is None or self._size > self.max_bytes or self._writes >= EVICT_EVERY:
+                self._evict()
+
+    def get_or_fetch(self, endpoint, params, fetch, max_age=None):
+        """
+        Lecture à travers le cache : fetch() n'est appelé qu'en cas de miss, et
+        une seule fois pour tous les appelants simultanés de la même clé (threads
+        et processus). Une réponse None (échec de l'appel) n'est jamais mise en cache.
+        `max_age` écarte les réponses plus anciennes (0 : rechargement forcé).
+        """
+        payload = self.get(endpoint, params, max_age)
+        if payload is not None:
+            return payload
+        key = cache_key(endpoint, params)
+
+        def load():
+            payload = fetch()
+            if payload is not None:
+                self.set(endpoint, params, payload)
+            return payload
+
+        return self.flights.do(key, load, check=lambda: self._read(key, max_age))
+
+    def _evict(self):
+        """Supprime les entrées expirées puis les moins récemment lues au-delà de max_bytes (verrou tenu)."""
+        self._flush_access()
+        self._writes = 0
+        self._conn.execute(
+            "DELETE FROM responses WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)
+        )
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        self._size = total
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        freed = 0
+        victims = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_access"):
+            victims.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+        self._size = total - freed
+
+    # ------------------------------------------------------------ statistiques
+    def stats(self):
+        """Compteurs hit/miss par endpoint et occupation disque."""
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        hits, misses = sum(self.hits.values()), sum(self.misses.values())
+        return {
+            "entries": entries,
+            "bytes": size,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / (hits + misses) if hits + misses else 0.0,
+            "by_endpoint": {
+                ep: {"hits": self.hits[ep], "misses": self.misses[ep]}
+                for ep in sorted(set(self.hits) | set(self.misses))
+            },
+        }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._accessed.clear()
+            self._size = 0
+            self.hits.clear()
+            self.misses.clear()
@@ -0,0 +1,204 @@
+# predictor/calibrate.py
+"""
+Calibration des pondérations du modèle sur l'historique (log-loss minimale).
+
+Les facteurs reconstruits au moment du match (predictor.backtest) sont écrits
+une fois en .npy puis ouverts en np.memmap par chaque processus du pool : les
+pages sont partagées par le système, aucun worker n'en reçoit de copie. Les
+candidats — les cinq pondérations des facteurs sur une grille du simplexe
+(somme 1) et le mélange du nul draw_odds / draw_weather (somme 1) — sont
+répartis par paquets entre les processus ; chaque paquet est évalué d'un bloc
+(einsum) et la log-loss est sommée par ligue avec bincount. Le même passage
+donne donc le meilleur candidat global et le meilleur par ligue.
+
+Les cotes et les blessures ne sont pas historisées (facteurs constants dans
+le backtest) et la météo l'est rarement (presque toujours FALLBACK_FACTOR) :
+leurs pondérations et le mélange du nul draw_odds / draw_weather sont
+maintenus par défaut à leur valeur actuelle (--fixed, "draw" désignant le
+mélange du nul) ; seules la forme et les H2H sont ajustées. Une ligue ne reçoit
+ses propres pondérations qu'avec assez de matchs et un gain de log-loss
+suffisant sur les pondérations par défaut ; de même pour les globales.
+
+Usage :
+    python -m predictor.calibrate --output data/weights.json
+    python -m predictor.calibrate --step 0.05 --workers 8 --min-matches 300
+"""
+
+import argparse
+import itertools
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+
+from .backtest import EPSILON, factor_matrix, load_matches, outcomes
+from .model import DEFAULT_WEIGHTS, MODEL_VERSION, weight_matrix
+from .weights import DEFAULT_WEIGHTS_PATH, WeightsFile
+
+FACTOR_WEIGHTS = ("form", "h2h", "odds", "weather", "injury")
+DRAW_BLEND = "draw"  # mélange du nul draw_odds / draw_weather
+NO_HISTORY_WEIGHTS = ("odds", "injury", "weather", DRAW_BLEND)
+DEFAULT_STEP = 0.1
+CHUNK_SIZE = 64
+MIN_LEAGUE_MATCHES = 200
+MIN_IMPROVEMENT = 0.005  # gain de log-loss minimal sur les pondérations par défaut
+
+# Tableaux partagés, ouverts en memmap par l'initialiseur de chaque worker
+_shared = {}
+
+
+def candidate_weights(step=DEFAULT_STEP, fixed=None, base=None):
+    """
+    Grille de candidats : pondérations des facteurs libres sur le simplexe
+    (la masse des pondérations fixées est déduite), mélange du nul au même pas
+    sauf s'il est fixé (DRAW_BLEND dans `fixed`).
+    """
+    base = dict(DEFAULT_WEIGHTS, **(base or {}))
+    fixed_draw = DRAW_BLEND in (fixed or ())
+    fixed = {name: base[name] for name in (fixed or ()) if name != DRAW_BLEND}
+    free = [name for name in FACTOR_WEIGHTS if name not in fixed]
+    units = int(round(1 / step))
+    free_units = int(round((1 - sum(fixed.values())) * units))
+    candidates = [dict(base)]  # les pondérations actuelles sont toujours évaluées
+    if free:
+        # Répartitions de free_units unités entre len(free) pondérations (« stars and bars »)
+        splits = []
+        for bars in itertools.combinations(range(free_units + len(free) - 1), len(free) - 1):
+            edges = (-1,) + bars + (free_units + len(free) - 1,)
+            splits.append([edges[i + 1] - edges[i] - 1 for i in range(len(free))])
+    else:
+        splits = [[]]
+    draws = [None] if fixed_draw else range(units + 1)
+    for split in splits:
+        for draw in draws:
+            weights = dict(fixed)
+            weights.update((name, round(k / units, 6)) for name, k in zip(free, split))
+            if draw is None:
+                weights.update(draw_odds=base["draw_odds"], draw_weather=base["draw_weather"])
+            else:
+                weights["draw_odds"] = round(draw / units, 6)
+                weights["draw_weather"] = round(1 - draw / units, 6)
+            candidates.append(weights)
+    return candidates
+
+
+def _init_worker(paths):
+    _shared.update((name, np.load(path, mmap_mode="r")) for name, path in paths.items())
+
+
+def _evaluate(candidates):
+    """Log-loss cumulée (candidats x ligues) d'un paquet de candidats."""
+    F, y, league = _shared["factors"], _shared["outcomes"], _shared["leagues"]
+    n_leagues = int(_shared["n_leagues"][0])
+    W = np.stack([weight_matrix(c) for c in candidates])           # (k, 10, 3)
+    base = np.einsum("nf,kfo->kno", F, W)                           # (k, n, 3)
+    total = base.sum(axis=2)
+    chosen = base[:, np.arange(len(y)), y]
+    probs = np.divide(chosen, total, out=np.full_like(chosen, 1 / 3), where=total > 0)
+    losses = -np.log(np.clip(probs, EPSILON, 1))
+    return np.stack([np.bincount(league, row, n_leagues) for row in losses])
+
+
+def _share(directory, **arrays):
+    paths = {}
+    for name, array in arrays.items():
+        paths[name] = os.path.join(directory, f"{name}.npy")
+        np.save(paths[name], np.ascontiguousarray(array))
+    return paths
+
+
+def calibrate(dataset=None, weather_store=None, step=DEFAULT_STEP, fixed=NO_HISTORY_WEIGHTS,
+              workers=None, min_matches=MIN_LEAGUE_MATCHES, min_improvement=MIN_IMPROVEMENT,
+              start=None, end=None, chunk_size=CHUNK_SIZE):
+    """
+    Cherche les pondérations de log-loss minimale, globalement et par ligue
+    (ligues d'au moins `min_matches` matchs). Les pondérations par défaut sont
+    conservées si le meilleur candidat ne gagne pas `min_improvement` de
+    log-loss. Retourne un WeightsFile.
+    """
+    matches = load_matches(dataset, start, end)
+    y = outcomes(matches)
+    leagues, league_index = np.unique(matches['league.id'], return_inverse=True)
+    counts = np.bincount(league_index, minlength=len(leagues))
+    candidates = candidate_weights(step, fixed)
+    chunks = [candidates[i:i + chunk_size] for i in range(0, len(candidates), chunk_size)]
+
+    with tempfile.TemporaryDirectory(prefix="calibrate-") as directory:
+        paths = _share(
+            directory,
+            factors=factor_matrix(matches, weather_store),
+            outcomes=y.astype(np.int64),
+            leagues=league_index.astype(np.int64),
+            n_leagues=np.array([len(leagues)]),
+        )
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(paths,)) as pool:
+            losses = np.concatenate(list(pool.map(_evaluate, chunks)))   # (candidats, ligues)
+
+    # candidates[0] : pondérations par défaut
+    overall = losses.sum(axis=1) / max(len(y), 1)
+    best = int(np.argmin(overall))
+    if overall[0] - overall[best] < min_improvement:
+        best = 0
+    per_league, scores = {}, {"global": {"matches": int(len(y)), "log_loss": float(overall[best]),
+                                         "default_log_loss": float(overall[0])}}
+    for j, league_id in enumerate(leagues):
+        if counts[j] < min_matches:
+            continue
+        league_loss = losses[:, j] / counts[j]
+        k = int(np.argmin(league_loss))
+        if league_loss[0] - league_loss[k] < min_improvement:
+            continue
+        per_league[str(int(league_id))] = candidates[k]
+        scores[str(int(league_id))] = {"matches": int(counts[j]), "log_loss": float(league_loss[k]),
+                                       "default_log_loss": float(league_loss[0])}
+
+    now = datetime.now(timezone.utc)
+    return WeightsFile({
+        "version": now.strftime("%Y%m%dT%H%M%SZ"),
+        "model_version": MODEL_VERSION,
+        "created_at": now.isoformat(),
+        "matches": int(len(y)),
+        "candidates": len(candidates),
+        "step": step,
+        "fixed": sorted(fixed or ()),
+        "global": candidates[best],
+        "leagues": per_league,
+        "scores": scores,
+    })
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calibration des pondérations sur l'historique.")
+    parser.add_argument("--output", default=DEFAULT_WEIGHTS_PATH, help="Fichier de pondérations produit")
+    parser.add_argument("--step", type=float, default=DEFAULT_STEP, help="Pas de la grille")
+    parser.add_argument("--workers", type=int, help="Processus (nombre de cœurs par défaut)")
+    parser.add_argument("--min-matches", type=int, default=MIN_LEAGUE_MATCHES,
+                        help="Matchs minimum pour calibrer une ligue séparément")
+    parser.add_argument("--min-improvement", type=float, default=MIN_IMPROVEMENT,
+                        help="Gain de log-loss minimal pour remplacer les pondérations par défaut")
+    parser.add_argument("--fixed", default=",".join(NO_HISTORY_WEIGHTS),
+                        help="Pondérations maintenues à leur valeur actuelle (séparées par des "
+                             "virgules ; draw : mélange du nul)")
+    parser.add_argument("--start", help="Premier jour (AAAA-MM-JJ)")
+    parser.add_argument("--end", help="Dernier jour (AAAA-MM-JJ)")
+    args = parser.parse_args(argv)
+
+    start = datetime.strptime(args.start, "%Y-%m-%d").date() if args.start else None
+    end = datetime.strptime(args.end, "%Y-%m-%d").date() if args.end else None
+    fixed = [name for name in args.fixed.split(",") if name]
+    weights = calibrate(step=args.step, fixed=fixed, workers=args.workers,
+                        min_matches=args.min_matches, min_improvement=args.min_improvement,
+                        start=start, end=end)
+    weights.save(args.output)
+    score = weights.payload["scores"]["global"]
+    print(f"{weights.payload['candidates']} candidats, {score['matches']} matchs : "
+          f"log-loss {score['default_log_loss']:.4f} -> {score['log_loss']:.4f} "
+          f"({len(weights.leagues)} ligue(s) calibrée(s)) -> {args.output} [{weights.version}]",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
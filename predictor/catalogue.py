@@ -0,0 +1,118 @@
+# predictor/catalogue.py
+"""
+Catalogue des ligues et des pays, construit une fois par processus.
+
+La réponse /leagues (plus d'un millier de ligues avec saisons et couverture)
+est réduite à des enregistrements légers, puis indexée par identifiant, par
+pays et par (pays, nom). Les listes ordonnées affichées par l'interface
+(pays par continent, D1 en tête) sont précalculées : sélectionner un pays ou
+une ligue devient une simple lecture de dictionnaire.
+"""
+
+import threading
+import time
+from collections import namedtuple
+
+from .api import API_URL_LEAGUES, api_football_get
+from .cache import ENDPOINT_TTLS
+from .leagues import CONTINENTS, reorder_countries, top_leagues_names
+
+# Enregistrement minimal d'une ligue (tuple : pas de dictionnaire par instance)
+League = namedtuple("League", ["id", "name", "country", "logo", "season"])
+
+INTERNATIONAL = "International"
+
+
+def _current_season(entry):
+    for season in entry.get('seasons') or []:
+        if season.get('current'):
+            return season.get('year')
+    return None
+
+
+def slim_league(entry):
+    """Réduit une entrée de /leagues à un enregistrement League."""
+    league = entry['league']
+    return League(
+        league['id'],
+        league['name'],
+        (entry.get('country') or {}).get('name'),
+        league.get('logo'),
+        _current_season(entry),
+    )
+
+
+class LeagueCatalogue:
+    """Index en lecture seule des ligues ; partagé par toutes les sessions."""
+
+    def __init__(self, leagues):
+        self.by_id = {l.id: l for l in leagues}
+
+        by_country = {}
+        for l in leagues:
+            if l.country:
+                by_country.setdefault(l.country, []).append(l)
+
+        # Ligues de chaque pays : d'abord la D1, puis le reste, par ordre alphabétique
+        self.by_country = {}
+        for country, items in by_country.items():
+            d1_names = top_leagues_names.get(country, [])
+            items.sort(key=lambda l: (l.name not in d1_names, l.name))
+            self.by_country[country] = tuple(items)
+
+        self.by_country_name = {
+            (l.country, l.name): l for items in self.by_country.values() for l in reversed(items)
+        }
+
+        countries = list(self.by_country)
+        self.countries_by_continent = {}
+        for continent in CONTINENTS:
+            ordered = reorder_countries(continent, countries)
+            # En Europe, "International" (coupes d'Europe) est proposé en tête
+            if continent == "Europe" and INTERNATIONAL not in ordered:
+                ordered = [INTERNATIONAL] + ordered
+            self.countries_by_continent[continent] = tuple(ordered)
+
+    @classmethod
+    def from_response(cls, data_leagues):
+        return cls([slim_league(entry) for entry in data_leagues])
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def countries(self, continent):
+        """Pays ordonnés pour un continent (pays phares d'abord)."""
+        return self.countries_by_continent.get(continent) or tuple(sorted(self.by_country))
+
+    def leagues_in(self, country):
+        """Ligues d'un pays, D1 en tête."""
+        return self.by_country.get(country, ())
+
+    def league(self, league_id):
+        return self.by_id.get(league_id)
+
+    def find(self, country, name):
+        """Première ligue d'un pays portant ce nom (ordre d'affichage)."""
+        return self.by_country_name.get((country, name))
+
+
+_catalogue = None
+_built_at = 0.0
+_catalogue_lock = threading.Lock()
+
+
+def get_catalogue(max_age=ENDPOINT_TTLS["leagues"]):
+    """
+    Catalogue partagé par le processus, reconstruit après `max_age` secondes.
+    Retourne None si /leagues est indisponible et qu'aucun catalogue n'existe.
+    """
+    global _catalogue, _built_at
+    if _catalogue is not None and time.time() - _built_at < max_age:
+        return _catalogue
+    with _catalogue_lock:
+        if _catalogue is None or time.time() - _built_at >= max_age:
+            payload = api_football_get(API_URL_LEAGUES)
+            if payload is not None:
+                _catalogue = LeagueCatalogue.from_response(payload.get('response', []))
+                _built_at = time.time()
+    return _catalogue
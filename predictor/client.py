@@ -0,0 +1,252 @@
+# predictor/client.py
+"""
+Client HTTP commun à tous les appels externes.
+
+Une session keep-alive par fournisseur (API-Football, meteoblue, PositionStack,
+OpenAI), des timeouts connexion/lecture systématiques et un seau à jetons par
+fournisseur, recalé sur les en-têtes de quota renvoyés par l'API.
+Les appels de faible priorité (préchargement, tâches de fond) sont mis en
+attente moins longtemps et abandonnés quand le quota devient bas, afin de
+réserver les appels restants aux utilisateurs.
+"""
+
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .metrics import record_upstream, registry
+
+# Priorités d'appel
+HIGH = "high"   # affichage d'une page pour un utilisateur
+LOW = "low"     # préchargement, tâches batch
+
+DEFAULT_TIMEOUT = (3.05, 15)  # (connexion, lecture) en secondes
+
+
+def stub_url(url):
+    """
+    Adresse à appeler : `url` telle quelle, ou <UPSTREAM_STUB_URL>/<hôte>/<chemin>
+    quand le serveur bouchon (predictor.stub) remplace les fournisseurs.
+    """
+    base = os.getenv("UPSTREAM_STUB_URL")
+    if not base or not url:
+        return url
+    parts = urlsplit(url)
+    query = f"?{parts.query}" if parts.query else ""
+    return f"{base.rstrip('/')}/{parts.netloc}{parts.path}{query}"
+
+
+class QuotaExceeded(requests.exceptions.RequestException):
+    """Appel abandonné localement : quota insuffisant ou attente trop longue."""
+
+
+class ProviderConfig:
+    def __init__(self, name, rate_per_minute, timeout=DEFAULT_TIMEOUT, pool_size=16,
+                 daily_reserve_ratio=0.1, high_wait=10.0, low_wait=0.5):
+        self.name = name
+        self.rate_per_minute = rate_per_minute
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.daily_reserve_ratio = daily_reserve_ratio
+        self.high_wait = high_wait
+        self.low_wait = low_wait
+
+
+PROVIDERS = {
+    "api-football": ProviderConfig(
+        "api-football", int(os.getenv("API_FOOTBALL_RATE_PER_MIN", 300)), timeout=(3.05, 15)
+    ),
+    "meteoblue": ProviderConfig(
+        "meteoblue", int(os.getenv("METEOBLUE_RATE_PER_MIN", 500)), timeout=(3.05, 10)
+    ),
+    "positionstack": ProviderConfig(
+        "positionstack", int(os.getenv("POSITIONSTACK_RATE_PER_MIN", 100)), timeout=(3.05, 10)
+    ),
+    "openai": ProviderConfig(
+        "openai", int(os.getenv("OPENAI_RATE_PER_MIN", 60)), timeout=(3.05, 30), pool_size=8
+    ),
+}
+
+
+class TokenBucket:
+    """
+    Seau à jetons (débit par minute) partagé entre threads.
+    Les appels LOW ne peuvent pas consommer la réserve gardée pour les appels HIGH.
+    """
+
+    def __init__(self, rate_per_minute, high_reserve_ratio=0.2):
+        self.high_reserve_ratio = high_reserve_ratio
+        self._cond = threading.Condition()
+        self._set_rate(rate_per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _set_rate(self, rate_per_minute):
+        self.rate = max(rate_per_minute, 1) / 60.0
+        self.capacity = float(max(rate_per_minute, 1))
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, priority=HIGH, timeout=10.0):
+        """Prend un jeton ; retourne False si aucun n'est disponible avant `timeout`."""
+        floor = 1.0 if priority == HIGH else 1.0 + self.capacity * self.high_reserve_ratio
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                self._refill()
+                if self.tokens >= floor:
+                    self.tokens -= 1
+                    return True
+                wait = (floor - self.tokens) / self.rate
+                if time.monotonic() + wait > deadline:
+                    return False
+                self._cond.wait(wait)
+
+    def sync(self, limit=None, remaining=None):
+        """Recale le seau sur les en-têtes de quota par minute renvoyés par le serveur."""
+        with self._cond:
+            if limit:
+                self._set_rate(limit)
+            self._refill()
+            if remaining is not None:
+                self.tokens = min(self.tokens, float(remaining))
+
+    def pause(self, seconds):
+        """Vide le seau pour `seconds` secondes (réponse 429 / Retry-After)."""
+        with self._cond:
+            self._refill()
+            self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+
+
+def _header_int(headers, name):
+    value = headers.get(name)
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class ProviderClient:
+    """Session keep-alive + timeouts + limitation de débit pour un fournisseur."""
+
+    def __init__(self, config):
+        self.config = config
+        self.bucket = TokenBucket(config.rate_per_minute)
+        self.daily_limit = None
+        self.daily_remaining = None
+        self.calls = 0
+        self._calls_lock = threading.Lock()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=config.pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _check_daily_quota(self, priority):
+        if self.daily_remaining is None:
+            return
+        if self.daily_remaining <= 0:
+            raise QuotaExceeded(f"{self.config.name} : quota journalier épuisé")
+        if priority == LOW and self.daily_limit:
+            if self.daily_remaining <= self.daily_limit * self.config.daily_reserve_ratio:
+                raise QuotaExceeded(f"{self.config.name} : quota bas, appel de fond abandonné")
+
+    def throttle(self, priority=HIGH):
+        """Attend un jeton (ou lève QuotaExceeded) ; à appeler avant toute requête."""
+        try:
+            self._check_daily_quota(priority)
+            wait = self.config.high_wait if priority == HIGH else self.config.low_wait
+            if not self.bucket.acquire(priority, timeout=wait):
+                raise QuotaExceeded(f"{self.config.name} : limite de débit atteinte")
+        except QuotaExceeded:
+            registry.count("upstream_throttled_total", provider=self.config.name, priority=priority)
+            raise
+
+    def record_headers(self, headers):
+        """Met à jour les quotas à partir des en-têtes x-ratelimit-* de la réponse."""
+        self.bucket.sync(
+            limit=_header_int(headers, "X-RateLimit-Limit"),
+            remaining=_header_int(headers, "X-RateLimit-Remaining"),
+        )
+        daily_limit = _header_int(headers, "x-ratelimit-requests-limit")
+        daily_remaining = _header_int(headers, "x-ratelimit-requests-remaining")
+        if daily_limit is not None:
+            self.daily_limit = daily_limit
+        if daily_remaining is not None:
+            self.daily_remaining = daily_remaining
+
+    def get(self, url, params=None, headers=None, priority=HIGH, timeout=None):
+        self.throttle(priority)
+        with self._calls_lock:
+            self.calls += 1
+        endpoint = urlsplit(url).path.strip("/")
+        start = time.perf_counter()
+        try:
+            resp = self.session.get(
+                stub_url(url), params=params, headers=headers, timeout=timeout or self.config.timeout
+            )
+        except requests.exceptions.RequestException:
+            record_upstream(self.config.name, endpoint, "error", time.perf_counter() - start)
+            raise
+        record_upstream(self.config.name, endpoint, resp.status_code, time.perf_counter() - start,
+                        len(resp.content))
+        self.record_headers(resp.headers)
+        if resp.status_code == 429:
+            retry_after = _header_int(resp.headers, "Retry-After") or 60
+            self.bucket.pause(retry_after)
+        return resp
+
+    def quota(self):
+        return {
+            "calls": self.calls,
+            "daily_limit": self.daily_limit,
+            "daily_remaining": self.daily_remaining,
+            "tokens": round(self.bucket.tokens, 2),
+            "rate_per_minute": round(self.bucket.rate * 60),
+        }
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(provider):
+    """Client partagé (un par processus) pour le fournisseur donné."""
+    client = _clients.get(provider)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(provider)
+            if client is None:
+                client = _clients[provider] = ProviderClient(PROVIDERS[provider])
+    return client
+
+
+def active_clients():
+    """Clients déjà créés dans ce processus, par fournisseur."""
+    with _clients_lock:
+        return dict(_clients)
+
+
+def build_openai_client(api_key, base_url=None):
+    """Client OpenAI avec pool keep-alive borné et timeouts explicites."""
+    import httpx
+    from openai import OpenAI
+
+    config = PROVIDERS["openai"]
+    connect, read = config.timeout
+    return OpenAI(
+        api_key=api_key,
+        base_url=base_url,
+        timeout=httpx.Timeout(read, connect=connect),
+        max_retries=1,
+        http_client=httpx.Client(
+            limits=httpx.Limits(max_connections=config.pool_size, max_keepalive_connections=config.pool_size),
+            timeout=httpx.Timeout(read, connect=connect),
+        ),
+    )
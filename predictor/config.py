@@ -0,0 +1,18 @@
+# predictor/config.py
+"""
+Lecture des clés secrètes : variables d'environnement d'abord,
+puis st.secrets quand le code tourne sous Streamlit.
+"""
+
+import os
+
+
+def get_secret(name, default=None):
+    value = os.getenv(name)
+    if value:
+        return value
+    try:
+        import streamlit as st
+        return st.secrets[name]
+    except Exception:
+        return default
@@ -0,0 +1,301 @@
+# predictor/dataset.py
+"""
+Jeu de données historique des matchs, partitionné par date.
+
+Remplace les caches pickle nommés par plage de dates : chaque jour de match
+est un fichier `AAAA-MM-JJ.cols` (format colonne, types explicites), et un
+match n'apparaît qu'une fois (dédoublonnage sur fixture.id). Étendre la
+plage d'un jour n'écrit que la partition de ce jour ; une lecture ne charge
+que les colonnes demandées, directement projetées en mémoire (np.memmap).
+
+Format d'une partition :
+    MAGIC | longueur de l'en-tête (uint64) | en-tête JSON | colonnes alignées
+L'en-tête donne le nombre de lignes et, pour chaque colonne, son dtype NumPy
+et son offset dans le fichier.
+
+Usage :
+    python -m predictor.dataset import match_data.csv match_data_cache_*.pkl
+    python -m predictor.dataset extend --since 2024-12-01 --league 61
+"""
+
+import argparse
+import glob
+import json
+import os
+import struct
+import tempfile
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from .api import API_URL_FIXTURES, api_football_get
+from .client import LOW
+
+DEFAULT_DATASET_DIR = os.getenv("MATCH_DATASET_DIR", os.path.join("data", "matches"))
+
+MAGIC = b"MATCHCOL1\n"
+ALIGN = 64
+SUFFIX = ".cols"
+
+INT = "int64"      # entier toujours présent
+FLOAT = "float64"  # nombre pouvant manquer (NaN)
+STR = "str"        # texte UTF-8, largeur fixe par partition (b'' si absent)
+BOOL = "bool?"     # booléen pouvant manquer : 1.0 / 0.0 / NaN
+
+# Schéma des colonnes issues de pd.json_normalize(/fixtures)
+SCHEMA = {
+    'fixture.id': INT,
+    'fixture.referee': STR,
+    'fixture.timezone': STR,
+    'fixture.date': STR,
+    'fixture.timestamp': INT,
+    'fixture.periods.first': FLOAT,
+    'fixture.periods.second': FLOAT,
+    'fixture.venue.id': FLOAT,
+    'fixture.venue.name': STR,
+    'fixture.venue.city': STR,
+    'fixture.status.long': STR,
+    'fixture.status.short': STR,
+    'fixture.status.elapsed': FLOAT,
+    'fixture.status.extra': FLOAT,
+    'league.id': INT,
+    'league.name': STR,
+    'league.country': STR,
+    'league.logo': STR,
+    'league.flag': STR,
+    'league.season': INT,
+    'league.round': STR,
+    'teams.home.id': INT,
+    'teams.home.name': STR,
+    'teams.home.logo': STR,
+    'teams.home.winner': BOOL,
+    'teams.away.id': INT,
+    'teams.away.name': STR,
+    'teams.away.logo': STR,
+    'teams.away.winner': BOOL,
+    'goals.home': FLOAT,
+    'goals.away': FLOAT,
+    'score.halftime.home': FLOAT,
+    'score.halftime.away': FLOAT,
+    'score.fulltime.home': FLOAT,
+    'score.fulltime.away': FLOAT,
+    'score.extratime.home': FLOAT,
+    'score.extratime.away': FLOAT,
+    'score.penalty.home': FLOAT,
+    'score.penalty.away': FLOAT,
+}
+
+_BOOL_VALUES = {True: 1.0, False: 0.0, 'True': 1.0, 'False': 0.0, 'true': 1.0, 'false': 0.0}
+
+
+def _column_array(series, kind):
+    """Convertit une colonne pandas vers le type NumPy du schéma."""
+    if kind == INT:
+        return pd.to_numeric(series, errors='coerce').fillna(-1).to_numpy(dtype=np.int64)
+    if kind == FLOAT:
+        return pd.to_numeric(series, errors='coerce').to_numpy(dtype=np.float64)
+    if kind == BOOL:
+        return series.map(lambda v: _BOOL_VALUES.get(v, np.nan)).to_numpy(dtype=np.float64)
+    values = [
+        b'' if v is None or (isinstance(v, float) and np.isnan(v)) else str(v).encode('utf-8')
+        for v in series
+    ]
+    width = max((len(v) for v in values), default=1) or 1
+    return np.array(values, dtype=f"S{width}")
+
+
+def to_columns(frame):
+    """DataFrame json_normalize -> {colonne: ndarray} typé selon SCHEMA."""
+    n = len(frame)
+    columns = {}
+    for name, kind in SCHEMA.items():
+        series = frame[name] if name in frame else pd.Series([None] * n, dtype=object)
+        columns[name] = _column_array(series.reset_index(drop=True), kind)
+    return columns
+
+
+def match_day(timestamps):
+    """Date UTC de chaque match (clé de partition)."""
+    return [datetime.fromtimestamp(int(ts), tz=timezone.utc).date() for ts in timestamps]
+
+
+# ------------------------------------------------------------------ fichiers
+def write_partition(path, columns):
+    """Écrit une partition de façon atomique (fichier temporaire + rename)."""
+    rows = len(columns['fixture.id'])
+    layout, offset = [], 0
+    for name, array in columns.items():
+        offset = -(-offset // ALIGN) * ALIGN
+        layout.append({"name": name, "dtype": array.dtype.str, "offset": offset})
+        offset += array.nbytes
+    header = json.dumps({"rows": rows, "columns": layout}).encode("utf-8")
+    start = -(-(len(MAGIC) + 8 + len(header)) // ALIGN) * ALIGN
+
+    directory = os.path.dirname(path) or "."
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(MAGIC + struct.pack("<Q", len(header)) + header)
+        for entry, array in zip(layout, columns.values()):
+            f.seek(start + entry["offset"])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(start + offset)
+    os.replace(tmp, path)
+
+
+def read_partition(path, columns=None):
+    """{colonne: np.memmap} pour les colonnes demandées (toutes si None)."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} : partition invalide")
+        (size,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(size))
+    start = -(-(len(MAGIC) + 8 + size) // ALIGN) * ALIGN
+    rows = header["rows"]
+    wanted = set(columns) if columns is not None else None
+    arrays = {}
+    for entry in header["columns"]:
+        if wanted is not None and entry["name"] not in wanted:
+            continue
+        dtype = np.dtype(entry["dtype"])
+        if rows == 0:
+            arrays[entry["name"]] = np.empty(0, dtype=dtype)
+        else:
+            arrays[entry["name"]] = np.memmap(
+                path, dtype=dtype, mode="r", offset=start + entry["offset"], shape=(rows,)
+            )
+    return arrays
+
+
+class MatchDataset:
+    """Jeu de données partitionné par jour, une partition = un fichier colonne."""
+
+    def __init__(self, root=DEFAULT_DATASET_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, day):
+        return os.path.join(self.root, day.isoformat() + SUFFIX)
+
+    def partitions(self, start=None, end=None):
+        """Jours disponibles, triés, éventuellement bornés."""
+        days = sorted(
+            date.fromisoformat(os.path.basename(p)[:-len(SUFFIX)])
+            for p in glob.glob(os.path.join(self.root, "*" + SUFFIX))
+        )
+        return [d for d in days if (start is None or d >= start) and (end is None or d <= end)]
+
+    # -------------------------------------------------------------- écriture
+    def append(self, frame):
+        """
+        Ajoute des matchs (DataFrame json_normalize ou liste de fixtures API).
+        Seules les partitions des jours concernés sont réécrites ; en cas de
+        doublon de fixture.id, la version la plus récente l'emporte.
+        Retourne la liste des jours écrits.
+        """
+        if not isinstance(frame, pd.DataFrame):
+            frame = pd.json_normalize(frame)
+        if frame.empty:
+            return []
+        new = to_columns(frame)
+        days = np.array(match_day(new['fixture.timestamp']))
+        written = []
+        for day in sorted(set(days)):
+            mask = days == day
+            part = {name: array[mask] for name, array in new.items()}
+            path = self._path(day)
+            if os.path.exists(path):
+                part = self._merge(read_partition(path), part)
+            write_partition(path, part)
+            written.append(day)
+        return written
+
+    @staticmethod
+    def _merge(old, new):
+        """Union de deux partitions, dédoublonnée sur fixture.id (nouvelle version gagnante)."""
+        keep_old = ~np.isin(old['fixture.id'], new['fixture.id'])
+        merged = {}
+        for name in SCHEMA:
+            a, b = np.asarray(old[name])[keep_old], new[name]
+            if a.dtype.kind == 'S':
+                width = max(a.dtype.itemsize, b.dtype.itemsize)
+                a, b = a.astype(f"S{width}"), b.astype(f"S{width}")
+            merged[name] = np.concatenate([a, b])
+        order = np.argsort(merged['fixture.timestamp'], kind="stable")
+        return {name: array[order] for name, array in merged.items()}
+
+    def extend(self, until=None, since=None, leagues=None, priority=LOW):
+        """
+        Récupère les jours absents jusqu'à `until` (/fixtures?date=) et écrit
+        leur partition. `leagues` restreint le jeu de données à ces ligues.
+        """
+        until = until or date.today() - timedelta(days=1)
+        existing = self.partitions()
+        day = since or (existing[-1] + timedelta(days=1) if existing else until)
+        have = set(existing)
+        written = []
+        while day <= until:
+            if day not in have:
+                payload = api_football_get(API_URL_FIXTURES, {'date': day.isoformat()}, priority)
+                if payload is None:
+                    break
+                fixtures = payload.get('response', [])
+                if leagues:
+                    fixtures = [f for f in fixtures if f['league']['id'] in leagues]
+                written += self.append(fixtures)
+            day += timedelta(days=1)
+        return written
+
+    # --------------------------------------------------------------- lecture
+    def load_arrays(self, columns=None, start=None, end=None):
+        """{colonne: ndarray} concaténé sur les partitions ; seules ces colonnes sont lues."""
+        names = list(columns) if columns is not None else list(SCHEMA)
+        parts = [read_partition(self._path(d), names) for d in self.partitions(start, end)]
+        if not parts:
+            return {name: np.empty(0, dtype=SCHEMA[name] if SCHEMA[name] in (INT, FLOAT) else FLOAT)
+                    for name in names}
+        return {name: np.concatenate([p[name] for p in parts]) for name in names}
+
+    def load(self, columns=None, start=None, end=None):
+        """DataFrame des colonnes demandées (toutes si None) ; les textes sont décodés."""
+        arrays = self.load_arrays(columns, start, end)
+        return pd.DataFrame({
+            name: np.char.decode(array, 'utf-8') if array.dtype.kind == 'S' else array
+            for name, array in arrays.items()
+        })
+
+
+def read_source(path):
+    """Lit un ancien export (pickle ou CSV json_normalize)."""
+    if path.endswith(".pkl"):
+        return pd.read_pickle(path)
+    return pd.read_csv(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Jeu de données des matchs partitionné par date.")
+    parser.add_argument("--root", default=DEFAULT_DATASET_DIR, help="Répertoire du jeu de données")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="Importe des exports pickle / CSV existants")
+    imp.add_argument("paths", nargs="+")
+    ext = sub.add_parser("extend", help="Ajoute les jours manquants depuis l'API")
+    ext.add_argument("--since", help="Premier jour (AAAA-MM-JJ)")
+    ext.add_argument("--until", help="Dernier jour (hier par défaut)")
+    ext.add_argument("--league", type=int, action="append", help="Ligue à conserver (répétable)")
+    args = parser.parse_args(argv)
+
+    dataset = MatchDataset(args.root)
+    if args.command == "import":
+        days = set()
+        for path in args.paths:
+            days.update(dataset.append(read_source(path)))
+        print(f"{len(days)} partition(s) écrite(s) dans {args.root}.")
+    else:
+        since = datetime.strptime(args.since, "%Y-%m-%d").date() if args.since else None
+        until = datetime.strptime(args.until, "%Y-%m-%d").date() if args.until else None
+        days = dataset.extend(until, since, set(args.league) if args.league else None)
+        print(f"{len(days)} partition(s) écrite(s) dans {args.root}.")
+
+
+if __name__ == "__main__":
+    main()
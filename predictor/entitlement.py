@@ -0,0 +1,149 @@
+# predictor/entitlement.py
+"""
+Jeton de droits d'accès signé (JWT), vérifiable localement.
+
+À la connexion, les droits (essai ou abonnement, avec leur date de fin) sont
+calculés une fois depuis Supabase puis signés dans un jeton de courte durée.
+Chaque rerun, et tout autre processus partageant ENTITLEMENT_SECRET, vérifie
+ce jeton sans appel réseau ; Supabase n'est réinterrogé qu'à son expiration
+(et pas du tout tant que la période d'essai, portée par le jeton, court).
+"""
+
+import logging
+import secrets
+import threading
+import time
+from datetime import timedelta
+
+import jwt
+
+from .auth import TRIAL_DAYS, check_subscription, get_user_creation_date, subscription_end_date
+from .config import get_secret
+
+logger = logging.getLogger(__name__)
+
+ALGORITHM = "HS256"
+TOKEN_TTL = 15 * 60  # durée de validité maximale d'un jeton (secondes)
+
+TRIAL = "trial"
+SUBSCRIPTION = "subscription"
+
+_secret = None
+_secret_lock = threading.Lock()
+
+
+def require_signing_secret():
+    """
+    À appeler au démarrage d'un serveur (page Streamlit, service) : sans
+    ENTITLEMENT_SECRET, chaque processus signerait avec son propre secret et
+    les jetons seraient refusés par les autres workers et après un redémarrage.
+    """
+    if not get_secret("ENTITLEMENT_SECRET"):
+        raise RuntimeError("ENTITLEMENT_SECRET doit être défini (secret partagé par tous les processus).")
+    return signing_secret()
+
+
+def signing_secret():
+    """
+    Secret de signature ; à partager entre processus via ENTITLEMENT_SECRET.
+    Hors serveur (scripts, essais), un secret propre au processus le remplace.
+    """
+    global _secret
+    if _secret is None:
+        with _secret_lock:
+            if _secret is None:
+                _secret = get_secret("ENTITLEMENT_SECRET")
+                if not _secret:
+                    logger.warning("ENTITLEMENT_SECRET absent : secret propre à ce processus.")
+                    _secret = secrets.token_hex(32)
+    return _secret
+
+
+def issue_entitlement(user_id, trial_end=None, subscription=None, now=None):
+    """
+    Signe les droits d'un utilisateur. `trial_end` : timestamp de fin d'essai ;
+    `subscription` : ligne de la table subscriptions. Retourne None sans droit actif.
+    """
+    now = int(now or time.time())
+    if trial_end and trial_end > now:
+        claims = {"kind": TRIAL, "plan": None, "status": None, "ends": int(trial_end)}
+    elif subscription:
+        # L'accès dépend du statut de l'abonnement (check_subscription) ; la
+        # date de fin calculée ne sert qu'à l'affichage.
+        end_date = subscription_end_date(subscription.get('plan'), subscription.get('updated_at'))
+        ends = int(end_date.timestamp()) if end_date else None
+        claims = {
+            "kind": SUBSCRIPTION,
+            "plan": subscription.get('plan'),
+            "status": subscription.get('status'),
+            "ends": ends,
+        }
+    else:
+        return None
+    claims.update(
+        sub=str(user_id),
+        trial_end=int(trial_end) if trial_end else None,
+        iat=now,
+        exp=min(now + TOKEN_TTL, claims["ends"]) if claims["kind"] == TRIAL else now + TOKEN_TTL,
+    )
+    return jwt.encode(claims, signing_secret(), algorithm=ALGORITHM)
+
+
+def entitlement_from_login(user, client=None):
+    """Jeton d'un utilisateur qui vient de s'authentifier (None sans essai ni abonnement)."""
+    created_at = get_user_creation_date(user)
+    trial_end = (created_at + timedelta(days=TRIAL_DAYS)).timestamp() if created_at else None
+    if trial_end and trial_end > time.time():
+        return issue_entitlement(user.id, trial_end)
+    return issue_entitlement(user.id, trial_end, check_subscription(user.id, client))
+
+
+def verify_entitlement(token):
+    """Droits portés par un jeton valide et non expiré, sinon None (aucun appel réseau)."""
+    if not token:
+        return None
+    try:
+        return jwt.decode(token, signing_secret(), algorithms=[ALGORITHM])
+    except jwt.PyJWTError:
+        return None
+
+
+def refresh_entitlement(token, client=None):
+    """
+    Réémet un jeton expiré mais authentique : sans appel réseau si l'essai
+    court encore, sinon après vérification de l'abonnement dans Supabase.
+    Retourne le nouveau jeton ou None.
+    """
+    try:
+        claims = jwt.decode(
+            token, signing_secret(), algorithms=[ALGORITHM], options={"verify_exp": False}
+        )
+    except jwt.PyJWTError:
+        return None
+    trial_end = claims.get("trial_end")
+    if trial_end and trial_end > time.time():
+        return issue_entitlement(claims["sub"], trial_end)
+    return issue_entitlement(claims["sub"], trial_end, check_subscription(claims["sub"], client))
+
+
+def current_entitlement(token, client=None):
+    """(jeton, droits) à utiliser pour ce rerun ; (None, None) si l'accès a expiré."""
+    claims = verify_entitlement(token)
+    if claims is not None:
+        return token, claims
+    token = refresh_entitlement(token, client) if token else None
+    return token, verify_entitlement(token)
+
+
+def days_left(claims, now=None):
+    """
+    Jours restants avant la fin des droits : jour entamé compté pour l'essai
+    (comme trial_days_remaining), jours pleins pour l'abonnement ; None si
+    la date de fin de l'abonnement est inconnue.
+    """
+    if claims["ends"] is None:
+        return None
+    remaining = int(claims["ends"] - (now or time.time()))
+    if claims["kind"] == TRIAL:
+        return max(0, -(-remaining // 86400))
+    return max(0, remaining // 86400)
@@ -0,0 +1,171 @@
+# predictor/factors.py
+"""
+Facteurs d'un match (forme, H2H, cotes, blessures, météo) et leur collecte
+concurrente sur un pool de threads borné.
+"""
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from .api import (
+    API_URL_FIXTURES, API_URL_FIXTURES_H2H,
+    api_football_get, season_for,
+)
+from .client import HIGH
+from .features import get_feature_engine
+from .geocode import get_gazetteer
+from .history import fixture_row, form_from_matches, get_history, h2h_from_matches, score_rows
+from .injuries import get_injury_book
+from .metrics import timed
+from .odds import get_odds_score, odds_day
+from .weather import get_weather_factor
+
+# ===================== FACTEURS API-FOOTBALL ======================
+@timed("get_team_form")
+def get_team_form(team_id, n=5, priority=HIGH):
+    """
+    Retourne la forme d’une équipe sur les n derniers matchs (0 à 1).
+    Répond depuis l'historique local s'il est à jour, sinon via l'API.
+    """
+    history = get_history()
+    if history.is_current():
+        matches = history.last_matches(team_id, n)
+        if len(matches) >= n:
+            return form_from_matches(team_id, matches)
+
+    form_params = {'team': team_id, 'last': n}
+    payload = api_football_get(API_URL_FIXTURES, form_params, priority)
+    if payload is not None:
+        form_data = payload.get('response', [])
+        history.ingest(form_data)
+        return form_from_matches(team_id, score_rows(form_data))
+    return 0.33
+
+@timed("get_h2h_score")
+def get_h2h_score(home_team_id, away_team_id, priority=HIGH):
+    """
+    Retourne la proportion de victoires domicile et extérieures sur l’historique H2H.
+    Une paire déjà chargée depuis l'API est ensuite servie par l'historique local.
+    """
+    history = get_history()
+    if history.is_current() and history.has_h2h(home_team_id, away_team_id):
+        return h2h_from_matches(home_team_id, history.h2h_matches(home_team_id, away_team_id))
+
+    params = {'h2h': f"{home_team_id}-{away_team_id}"}
+    payload = api_football_get(API_URL_FIXTURES_H2H, params, priority)
+    if payload is not None:
+        h2h_data = payload.get('response', [])
+        history.ingest(h2h_data)
+        history.mark_h2h_complete(home_team_id, away_team_id)
+        # Mêmes matchs que l'historique local : confrontations réellement jouées
+        played = [m for m in h2h_data if fixture_row(m) is not None]
+        return h2h_from_matches(home_team_id, score_rows(played))
+
+    return 0.33, 0.33
+
+@timed("get_injury_factor")
+def get_injury_factor(league_id, team_id, priority=HIGH, match_date=None, match_id=None):
+    """
+    Réduit la forme de l’équipe en fonction du nombre de blessés.
+    Lu dans la liste de la ligue pour la saison du match (une requête par ligue).
+    """
+    return get_injury_book().get(league_id, team_id, match_date, match_id, priority)
+
+
+# ===================== NOUVELLE FONCTION GEO AVEC POSITIONSTACK =============
+@timed("geocode_city")
+def geocode_city(city_name, priority=HIGH, venue_id=None):
+    """
+    Coordonnées (lat, lon) d'un stade ou d'une ville, ou (None, None) en cas d'échec.
+    Servies par le gazetteer persistant ; PositionStack n'est appelé qu'au premier passage.
+    """
+    return get_gazetteer().lookup(city_name, venue_id, priority)
+
+
+# ===================== COLLECTE CONCURRENTE DES FACTEURS ==========
+FACTOR_POOL_SIZE = 8
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_factor_pool():
+    """Pool de threads borné, partagé par tout le processus, pour les appels d'un match."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=FACTOR_POOL_SIZE, thread_name_prefix="factors")
+    return _pool
+
+
+def _weather_for_city(city, match_date, priority, venue_id=None):
+    lat, lon = geocode_city(city, priority, venue_id)
+    return get_weather_factor(lat, lon, match_date, priority)
+
+
+def _done(value):
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+def _league_features(league_id, match_date):
+    """Caractéristiques de la ligue pour la saison du match, si l'historique local est à jour."""
+    if league_id is None or match_date is None or not get_history().is_current():
+        return None
+    return get_feature_engine().features(league_id, season_for(odds_day(match_date)))
+
+
+def submit_match_factors(pool, league_id, home_team_id, away_team_id, match_id, fixture_city,
+                         match_date, priority=HIGH, venue_id=None):
+    """
+    Soumet au pool tous les appels d'un match et retourne une fonction qui attend
+    leurs résultats. Seul ordre imposé : le géocodage précède la météo (même tâche).
+    Historique local à jour : forme et H2H viennent toujours des tableaux de la
+    ligue et de la saison (predictor.features, même définition que le backtest,
+    0.33 sans match) ; sinon seulement, de get_team_form / get_h2h_score. Un
+    même match reçoit ainsi les mêmes facteurs quel que soit l'état des caches.
+    """
+    features = _league_features(league_id, match_date)
+
+    if features is not None:
+        f_home_form = _done(features.form(home_team_id))
+        f_away_form = _done(features.form(away_team_id))
+        f_h2h = _done(features.h2h(home_team_id, away_team_id))
+    else:
+        f_home_form = pool.submit(get_team_form, home_team_id, 5, priority)
+        f_away_form = pool.submit(get_team_form, away_team_id, 5, priority)
+        f_h2h = pool.submit(get_h2h_score, home_team_id, away_team_id, priority)
+    f_odds = pool.submit(get_odds_score, match_id, priority, match_date, league_id)
+    f_home_injury = pool.submit(get_injury_factor, league_id, home_team_id, priority, match_date, match_id)
+    f_away_injury = pool.submit(get_injury_factor, league_id, away_team_id, priority, match_date, match_id)
+    f_weather = pool.submit(_weather_for_city, fixture_city, match_date, priority, venue_id)
+
+    def result():
+        home_h2h_score, away_h2h_score = f_h2h.result()
+        home_odds_prob, draw_odds_prob, away_odds_prob = f_odds.result()
+        return (
+            f_home_form.result(), f_away_form.result(),
+            home_h2h_score, away_h2h_score,
+            home_odds_prob, draw_odds_prob, away_odds_prob,
+            f_home_injury.result(), f_away_injury.result(),
+            f_weather.result()
+        )
+
+    return result
+
+
+@timed("collect_match_factors")
+def collect_match_factors(league_id, home_team_id, away_team_id, match_id, fixture_city, match_date,
+                          priority=HIGH, venue_id=None):
+    """
+    Lance en parallèle tous les appels nécessaires au calcul d'un match.
+    Retourne le tuple de facteurs dans l'ordre de model.FACTOR_NAMES :
+    (home_form, away_form, home_h2h, away_h2h, home_odds, draw_odds, away_odds,
+     home_injury, away_injury, weather_factor)
+    """
+    return submit_match_factors(
+        get_factor_pool(), league_id, home_team_id, away_team_id, match_id,
+        fixture_city, match_date, priority, venue_id
+    )()
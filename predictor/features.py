@@ -0,0 +1,303 @@
+# predictor/features.py
+"""
+Caractéristiques d'une ligue (forme, buts, H2H) en tableaux NumPy indexés par équipe.
+
+Pour une ligue et une saison, LeagueFeatures conserve :
+- par équipe, un tampon circulaire des `window` derniers matchs (victoire,
+  nul, défaite, buts marqués, buts encaissés) et leurs sommes glissantes ;
+- par équipe, les buts marqués / encaissés à domicile et à l'extérieur
+  (équivalent du groupby de calculate_goals_performance du script `test`) ;
+- une matrice équipe x équipe des victoires et des confrontations ; elle
+  couvre toutes les saisons stockées de la ligue jusqu'à la saison demandée.
+La construction est entièrement vectorisée (quelques millisecondes pour une
+ligue) et un match terminé met à jour les tableaux en place (O(1) pour la
+forme et les buts, deux cases pour le H2H). Lire un facteur revient à
+indexer un tableau.
+
+FeatureEngine construit les ligues à la demande depuis l'historique local
+(predictor.history) et s'y abonne : chaque match ingéré par le processus
+met à jour les ligues déjà construites. Chaque ligue construite porte la
+version de l'historique qu'elle reflète ; si un autre processus (la
+synchronisation du préchargement) a écrit depuis, elle est reconstruite.
+"""
+
+import threading
+
+import numpy as np
+
+from .history import get_history
+
+FORM_WINDOW = 5
+NO_HISTORY = 0.33
+# Colonnes du tampon de forme
+WIN, DRAW, LOSS, GOALS_FOR, GOALS_AGAINST = range(5)
+
+
+def _outcome_columns(goals_for, goals_against):
+    """(n x 5) : victoire, nul, défaite, buts pour, buts contre."""
+    gf, ga = np.asarray(goals_for, dtype=float), np.asarray(goals_against, dtype=float)
+    return np.column_stack([gf > ga, gf == ga, gf < ga, gf, ga]).astype(float)
+
+
+def goals_by_team(home_ids, away_ids, home_goals, away_goals):
+    """
+    Buts marqués / encaissés par équipe, à domicile et à l'extérieur :
+    (équipes, domicile (n x 2), extérieur (n x 2)), colonnes (marqués, encaissés).
+    """
+    home_ids, away_ids = np.asarray(home_ids, dtype=np.int64), np.asarray(away_ids, dtype=np.int64)
+    hg = np.nan_to_num(np.asarray(home_goals, dtype=float))
+    ag = np.nan_to_num(np.asarray(away_goals, dtype=float))
+    teams, inverse = np.unique(np.concatenate([home_ids, away_ids]), return_inverse=True)
+    h_idx, a_idx = inverse[:len(home_ids)], inverse[len(home_ids):]
+    home = np.column_stack([np.bincount(h_idx, hg, len(teams)), np.bincount(h_idx, ag, len(teams))])
+    away = np.column_stack([np.bincount(a_idx, ag, len(teams)), np.bincount(a_idx, hg, len(teams))])
+    return teams, home, away
+
+
+class LeagueFeatures:
+    """Tableaux de caractéristiques d'une ligue et d'une saison, mis à jour en place."""
+
+    def __init__(self, league_id=None, season=None, window=FORM_WINDOW):
+        self.league_id = league_id
+        self.season = season
+        self.window = window
+        self.team_ids = np.empty(0, dtype=np.int64)
+        self.recent = np.zeros((0, window, 5))      # tampon circulaire des derniers matchs
+        self.filled = np.zeros(0, dtype=np.int64)   # matchs présents dans le tampon
+        self.cursor = np.zeros(0, dtype=np.int64)   # prochaine case à écrire
+        self.last_kickoff = np.zeros(0, dtype=np.int64)
+        self.rolling = np.zeros((0, 5))             # sommes du tampon
+        self.home_goals = np.zeros((0, 2))          # (marqués, encaissés) à domicile
+        self.away_goals = np.zeros((0, 2))          # (marqués, encaissés) à l'extérieur
+        self.h2h_wins = np.zeros((0, 0), dtype=np.int32)    # [a, b] : victoires de a contre b
+        self.h2h_played = np.zeros((0, 0), dtype=np.int32)  # [a, b] : confrontations a / b
+        self.applied = set()
+        self.stale = False  # match arrivé dans le désordre : reconstruction nécessaire
+        self.version = 0    # version de la ligue dans l'historique (history.league_version)
+
+    # --------------------------------------------------------------- index
+    def _grow(self, team_ids):
+        new = np.setdiff1d(np.asarray(team_ids, dtype=np.int64), self.team_ids)
+        if not len(new):
+            return
+        ids = np.concatenate([self.team_ids, new])
+        order = np.argsort(ids, kind="stable")
+        old_pos = np.argsort(order)[:len(self.team_ids)]  # nouvelle ligne de chaque ancienne équipe
+        size = len(ids)
+
+        def resize(array, fill=0):
+            grown = np.full((size,) + array.shape[1:], fill, dtype=array.dtype)
+            grown[old_pos] = array
+            return grown
+
+        self.recent, self.filled, self.cursor = resize(self.recent), resize(self.filled), resize(self.cursor)
+        self.last_kickoff, self.rolling = resize(self.last_kickoff), resize(self.rolling)
+        self.home_goals, self.away_goals = resize(self.home_goals), resize(self.away_goals)
+        for name in ("h2h_wins", "h2h_played"):
+            matrix = np.zeros((size, size), dtype=np.int32)
+            matrix[np.ix_(old_pos, old_pos)] = getattr(self, name)
+            setattr(self, name, matrix)
+        self.team_ids = ids[order]
+
+    def rows(self, team_ids):
+        """Ligne de chaque équipe (-1 si inconnue)."""
+        ids = np.asarray(team_ids, dtype=np.int64)
+        if not len(self.team_ids):
+            return np.full(ids.shape, -1)
+        pos = np.minimum(np.searchsorted(self.team_ids, ids), len(self.team_ids) - 1)
+        return np.where(self.team_ids[pos] == ids, pos, -1)
+
+    # ------------------------------------------------------- construction
+    @classmethod
+    def build(cls, fixture_ids, kickoff, home_ids, away_ids, home_goals, away_goals,
+              league_id=None, season=None, window=FORM_WINDOW, h2h_only=None):
+        """
+        Construit les tableaux à partir de matchs terminés (tableaux alignés).
+        `h2h_only` (booléens) marque les matchs qui ne comptent que pour le H2H
+        (saisons précédentes).
+        """
+        self = cls(league_id, season, window)
+        home_ids = np.asarray(home_ids, dtype=np.int64)
+        away_ids = np.asarray(away_ids, dtype=np.int64)
+        if not len(home_ids):
+            return self
+        kickoff = np.asarray(kickoff, dtype=np.int64)
+        hg, ag = np.asarray(home_goals, dtype=float), np.asarray(away_goals, dtype=float)
+        self._grow(np.concatenate([home_ids, away_ids]))
+        h, a = self.rows(home_ids), self.rows(away_ids)
+
+        # H2H : toutes les saisons fournies
+        winner = np.where(hg > ag, h, a)
+        loser = np.where(hg > ag, a, h)
+        decided = hg != ag
+        np.add.at(self.h2h_wins, (winner[decided], loser[decided]), 1)
+        np.add.at(self.h2h_played, (h, a), 1)
+        np.add.at(self.h2h_played, (a, h), 1)
+
+        season_rows = ~np.asarray(h2h_only, dtype=bool) if h2h_only is not None else np.ones(len(h), bool)
+        h, a, kickoff, hg, ag = h[season_rows], a[season_rows], kickoff[season_rows], hg[season_rows], ag[season_rows]
+        self.applied.update(int(f) for f in np.asarray(fixture_ids)[season_rows])
+        n_teams = len(self.team_ids)
+        self.home_goals = np.column_stack([np.bincount(h, hg, n_teams), np.bincount(h, ag, n_teams)])
+        self.away_goals = np.column_stack([np.bincount(a, ag, n_teams), np.bincount(a, hg, n_teams)])
+
+        # Forme : les `window` derniers matchs de chaque équipe, rangés dans le tampon
+        team = np.concatenate([h, a])
+        values = np.concatenate([_outcome_columns(hg, ag), _outcome_columns(ag, hg)])
+        times = np.concatenate([kickoff, kickoff])
+        order = np.lexsort((times, team))
+        team, values, times = team[order], values[order], times[order]
+        counts = np.bincount(team, minlength=n_teams)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        position = np.arange(len(team)) - starts[team]
+        keep = position >= counts[team] - window
+        self.recent[team[keep], position[keep] % window] = values[keep]
+        self.filled = np.minimum(counts, window)
+        self.cursor = counts % window
+        self.last_kickoff = np.zeros(n_teams, dtype=np.int64)
+        np.maximum.at(self.last_kickoff, team, times)
+        self.rolling = self.recent.sum(axis=1)
+        return self
+
+    # ---------------------------------------------------------- mise à jour
+    def update(self, fixture_id, kickoff, home_id, away_id, home_goals, away_goals):
+        """Ajoute un match terminé en place ; sans effet s'il est déjà compté."""
+        if fixture_id in self.applied or home_goals is None or away_goals is None:
+            return False
+        self._grow([home_id, away_id])
+        h, a = self.rows([home_id, away_id])
+        if kickoff < max(self.last_kickoff[h], self.last_kickoff[a]):
+            self.stale = True  # la forme glissante suppose l'ordre chronologique
+            return False
+        self.applied.add(fixture_id)
+        for row, gf, ga in ((h, home_goals, away_goals), (a, away_goals, home_goals)):
+            slot = self.cursor[row]
+            values = _outcome_columns([gf], [ga])[0]
+            self.rolling[row] += values - self.recent[row, slot]
+            self.recent[row, slot] = values
+            self.cursor[row] = (slot + 1) % self.window
+            self.filled[row] = min(self.filled[row] + 1, self.window)
+            self.last_kickoff[row] = kickoff
+        self.home_goals[h] += (home_goals, away_goals)
+        self.away_goals[a] += (away_goals, home_goals)
+        self.h2h_played[h, a] += 1
+        self.h2h_played[a, h] += 1
+        if home_goals != away_goals:
+            winner, loser = (h, a) if home_goals > away_goals else (a, h)
+            self.h2h_wins[winner, loser] += 1
+        return True
+
+    # -------------------------------------------------------------- lecture
+    def form(self, team_id):
+        """Proportion de victoires sur les derniers matchs (comme form_from_matches)."""
+        row = self.rows([team_id])[0]
+        if row < 0 or not self.filled[row]:
+            return NO_HISTORY
+        return float(self.rolling[row, WIN] / self.filled[row])
+
+    def form_table(self, team_ids=None):
+        """(n x 5) par match : taux de victoires, nuls, défaites, buts pour, buts contre."""
+        rows = self.rows(team_ids) if team_ids is not None else np.arange(len(self.team_ids))
+        filled = self.filled[np.maximum(rows, 0)][:, None]
+        rates = np.divide(self.rolling[np.maximum(rows, 0)], filled,
+                          out=np.full((len(rows), 5), np.nan), where=filled > 0)
+        rates[rows < 0] = np.nan
+        return rates
+
+    def h2h(self, home_team_id, away_team_id):
+        """(victoires domicile, victoires extérieur) / confrontations (comme h2h_from_matches)."""
+        h, a = self.rows([home_team_id, away_team_id])
+        if h < 0 or a < 0 or not self.h2h_played[h, a]:
+            return NO_HISTORY, NO_HISTORY
+        played = self.h2h_played[h, a]
+        return float(self.h2h_wins[h, a] / played), float(self.h2h_wins[a, h] / played)
+
+    def fixture_features(self, home_ids, away_ids):
+        """Facteurs (forme dom., forme ext., H2H dom., H2H ext.) de plusieurs matchs : (n x 4)."""
+        h, a = self.rows(home_ids), self.rows(away_ids)
+        known_h, known_a = h >= 0, a >= 0
+        hs, as_ = np.maximum(h, 0), np.maximum(a, 0)
+        win_rate = np.divide(self.rolling[:, WIN], self.filled,
+                             out=np.full(len(self.team_ids), NO_HISTORY), where=self.filled > 0)
+        played = np.where(known_h & known_a, self.h2h_played[hs, as_], 0)
+        safe = np.maximum(played, 1)
+        return np.column_stack([
+            np.where(known_h, win_rate[hs], NO_HISTORY),
+            np.where(known_a, win_rate[as_], NO_HISTORY),
+            np.where(played > 0, self.h2h_wins[hs, as_] / safe, NO_HISTORY),
+            np.where(played > 0, self.h2h_wins[as_, hs] / safe, NO_HISTORY),
+        ])
+
+
+class FeatureEngine:
+    """LeagueFeatures par (ligue, saison), construites depuis l'historique et tenues à jour."""
+
+    def __init__(self, history=None, window=FORM_WINDOW):
+        self.history = history or get_history()
+        self.window = window
+        self._lock = threading.Lock()
+        self._leagues = {}
+        self.history.subscribe(self.on_ingest)
+
+    def _build(self, league_id, season, version):
+        rows = self.history.league_matches(league_id, until_season=season)
+        if rows:
+            fixture_ids, kickoff, seasons, home, away, hg, ag = (np.array(c) for c in zip(*rows))
+        else:
+            fixture_ids = kickoff = seasons = home = away = hg = ag = np.empty(0)
+        features = LeagueFeatures.build(
+            fixture_ids, kickoff, home, away, hg.astype(float), ag.astype(float),
+            league_id, season, self.window, h2h_only=seasons != season,
+        )
+        features.version = version
+        return features
+
+    def features(self, league_id, season):
+        """
+        Caractéristiques de la ligue pour la saison, construites au premier appel
+        et reconstruites si l'historique de la ligue a changé dans un autre processus.
+        """
+        key = (league_id, season)
+        # Lue avant les matchs : une écriture concurrente laisse une version en retard
+        version = self.history.league_version(league_id)
+        with self._lock:
+            features = self._leagues.get(key)
+            if features is None or features.stale or features.version != version:
+                features = self._leagues[key] = self._build(league_id, season, version)
+            return features
+
+    def on_ingest(self, rows, versions):
+        """
+        Met à jour en place les ligues construites (lignes de history.fixture_row,
+        versions après l'écriture). Une ligue qui a manqué une écriture d'un autre
+        processus est marquée à reconstruire.
+        """
+        with self._lock:
+            for (league_id, season), features in self._leagues.items():
+                if league_id not in versions:
+                    continue
+                if features.version != versions[league_id] - 1:
+                    features.stale = True
+                    continue
+                for fixture_id, kickoff, lid, s, home_id, away_id, _, _, hg, ag, _ in rows:
+                    if lid != league_id or s is None or season is None:
+                        continue
+                    if s == season:
+                        features.update(fixture_id, kickoff, home_id, away_id, hg, ag)
+                    elif s < season:
+                        features.stale = True  # compte dans le H2H des saisons suivantes
+                features.version = versions[league_id]
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_feature_engine():
+    """Moteur de caractéristiques partagé par le processus."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = FeatureEngine()
+    return _engine
@@ -0,0 +1,129 @@
+# predictor/fixtures.py
+"""
+Matchs d'une journée, toutes ligues confondues, indexés une fois par processus.
+
+/fixtures?date= est récupéré une fois par date et par fenêtre de
+rafraîchissement (au lieu d'un appel par ligue consultée), puis indexé par
+ligue et par identifiant de match. Toutes les sessions lisent le même
+index : changer de ligue ou sélectionner un match est une lecture de
+dictionnaire, sans appel ni parcours de liste. La vue « tous les matchs du
+jour » de football.py lit la table précalculée du même index.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from .api import API_URL_FIXTURES, api_football_get
+from .cache import ENDPOINT_TTLS
+from .client import HIGH
+from .shared import SingleFlight
+
+MAX_DAYS = 14
+
+
+def fixture_label(fix):
+    return f"{fix['teams']['home']['name']} vs {fix['teams']['away']['name']}"
+
+
+def kickoff_time(fix):
+    """Heure UTC du coup d'envoi (HH:MM), ou chaîne vide."""
+    timestamp = fix['fixture'].get('timestamp')
+    if not timestamp:
+        return ""
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime("%H:%M")
+
+
+class DayFixtures:
+    """Index en lecture seule des matchs d'une date ; partagé par toutes les sessions."""
+
+    def __init__(self, day, fixtures):
+        self.day = day
+        ordered = sorted(fixtures, key=lambda f: (f['fixture'].get('timestamp') or 0, f['fixture']['id']))
+        self.by_id = {f['fixture']['id']: f for f in ordered}
+        by_league = {}
+        for f in ordered:
+            by_league.setdefault(f['league']['id'], []).append(f)
+        self.by_league = {league_id: tuple(items) for league_id, items in by_league.items()}
+        self.labels = {fixture_id: fixture_label(f) for fixture_id, f in self.by_id.items()}
+        # Vue toutes ligues : regroupée par pays et compétition, puis par heure
+        self.rows = tuple(sorted(
+            (
+                {
+                    'fixture_id': f['fixture']['id'],
+                    'league_id': f['league']['id'],
+                    'country': f['league'].get('country') or "",
+                    'league': f['league'].get('name') or "",
+                    'kickoff': kickoff_time(f),
+                    'match': self.labels[f['fixture']['id']],
+                    'status': (f['fixture'].get('status') or {}).get('short') or "",
+                }
+                for f in ordered
+            ),
+            key=lambda r: (r['country'], r['league'], r['kickoff']),
+        ))
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def league(self, league_id):
+        """Matchs d'une ligue, par heure de coup d'envoi."""
+        return self.by_league.get(league_id, ())
+
+    def fixture(self, fixture_id):
+        return self.by_id.get(fixture_id)
+
+    def label(self, fixture_id):
+        return self.labels.get(fixture_id, "")
+
+
+class FixtureBoard:
+    """Matchs par date, rechargés après `ttl`, partagés par le processus (MAX_DAYS dates au plus)."""
+
+    def __init__(self, ttl=ENDPOINT_TTLS["fixtures"], max_days=MAX_DAYS):
+        self.ttl = ttl
+        self.max_days = max_days
+        self._lock = threading.Lock()
+        self._days = OrderedDict()
+        self._flights = SingleFlight()
+
+    def _fresh(self, day):
+        with self._lock:
+            entry = self._days.get(day)
+            if entry and time.time() - entry[0] < self.ttl:
+                self._days.move_to_end(day)
+                return entry[1]
+        return None
+
+    def _download(self, day, priority):
+        payload = api_football_get(API_URL_FIXTURES, {'date': day.strftime('%Y-%m-%d')}, priority)
+        if payload is None:
+            return None
+        fixtures = DayFixtures(day, payload.get('response', []))
+        with self._lock:
+            self._days[day] = (time.time(), fixtures)
+            self._days.move_to_end(day)
+            while len(self._days) > self.max_days:
+                self._days.popitem(last=False)
+        return fixtures
+
+    def day(self, day, priority=HIGH):
+        """Index des matchs d'une date ; None si l'appel échoue."""
+        fixtures = self._fresh(day)
+        if fixtures is not None:
+            return fixtures
+        return self._flights.do(day, lambda: self._download(day, priority), check=lambda: self._fresh(day))
+
+
+_board = None
+_board_lock = threading.Lock()
+
+
+def get_fixture_board():
+    global _board
+    if _board is None:
+        with _board_lock:
+            if _board is None:
+                _board = FixtureBoard()
+    return _board
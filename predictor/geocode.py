@@ -0,0 +1,231 @@
+# predictor/geocode.py
+"""
+Gazetteer persistant des stades pour geocode_city.
+
+Les stades ne bougent pas : une coordonnée obtenue une fois est conservée
+(SQLite), indexée par fixture.venue.id et par nom de ville normalisé. Les
+sessions concurrentes qui géocodent la même ville partagent un seul appel
+PositionStack en cours ; une ville introuvable est retenue MISS_TTL secondes
+avant un nouvel essai. Le gazetteer se préremplit depuis l'historique des
+matchs (match_data.csv ou le jeu de données partitionné).
+
+Usage :
+    python -m predictor.geocode prefill --csv match_data.csv
+"""
+
+import argparse
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import requests
+
+from .client import HIGH, LOW, get_client
+from .config import get_secret
+from .metrics import record_cache
+from .shared import SingleFlight, connect
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GAZETTEER_PATH = os.getenv("GAZETTEER_PATH", os.path.join(".cache", "gazetteer.sqlite3"))
+POSITIONSTACK_URL = "http://api.positionstack.com/v1/forward"
+MISS_TTL = 3600  # secondes avant de regéocoder une ville introuvable
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cities (
+    city_key TEXT PRIMARY KEY,
+    city TEXT NOT NULL,
+    lat REAL NOT NULL,
+    lon REAL NOT NULL,
+    stored_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS misses (
+    city_key TEXT PRIMARY KEY,
+    stored_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS venues (
+    venue_id INTEGER PRIMARY KEY,
+    city_key TEXT NOT NULL,
+    lat REAL NOT NULL,
+    lon REAL NOT NULL
+);
+"""
+
+
+def normalize_city(city_name):
+    """'  Saint-Étienne ' -> 'saint etienne' (casse, accents, ponctuation)."""
+    text = unicodedata.normalize("NFKD", city_name or "")
+    text = "".join(c for c in text if not unicodedata.combining(c)).casefold()
+    return re.sub(r"[^a-z0-9]+", " ", text).strip()
+
+
+def positionstack_lookup(city_name, priority=HIGH):
+    """
+    Géocode un nom de ville via l'API PositionStack.
+    Retourne (lat, lon) ou (None, None) en cas d'échec.
+    """
+    params = {
+        "access_key": get_secret("POSITIONSTACK_API_KEY"),
+        "query": city_name,
+        "limit": 1
+    }
+    try:
+        resp = get_client("positionstack").get(POSITIONSTACK_URL, params=params, priority=priority)
+        resp.raise_for_status()  # génère une exception si code HTTP != 200
+        data = resp.json()
+
+        if "data" in data and len(data["data"]) > 0:
+            first_result = data["data"][0]
+            lat = first_result.get("latitude")
+            lon = first_result.get("longitude")
+            if lat is not None and lon is not None:
+                return float(lat), float(lon)
+        # Si pas de résultat, on renvoie None
+        return None, None
+
+    except requests.exceptions.RequestException as e:
+        logger.warning("Erreur lors de la requête PositionStack : %s", e)
+        return None, None
+
+
+class Gazetteer:
+    """Coordonnées des stades et des villes ; sûr entre threads."""
+
+    def __init__(self, path=DEFAULT_GAZETTEER_PATH, lookup=positionstack_lookup, miss_ttl=MISS_TTL):
+        self.path = path
+        self.lookup_remote = lookup
+        self.miss_ttl = miss_ttl
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._flights = SingleFlight(f"{path}.lock")
+        self._conn = connect(path)
+        self._conn.executescript(SCHEMA)
+
+    def _venue(self, venue_id):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT lat, lon FROM venues WHERE venue_id = ?", (venue_id,)
+            ).fetchone()
+
+    def _city(self, city_key):
+        """(lat, lon) connus, (None, None) pour un échec récent, sinon None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT lat, lon FROM cities WHERE city_key = ?", (city_key,)
+            ).fetchone()
+            if row is None and self._conn.execute(
+                "SELECT 1 FROM misses WHERE city_key = ? AND stored_at > ?",
+                (city_key, time.time() - self.miss_ttl),
+            ).fetchone():
+                return None, None
+        return row
+
+    def _store(self, city_name, city_key, coords, venue_id=None):
+        lat, lon = coords
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cities VALUES (?, ?, ?, ?, ?)",
+                (city_key, city_name, lat, lon, time.time()),
+            )
+            if venue_id is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO venues VALUES (?, ?, ?, ?)", (venue_id, city_key, lat, lon)
+                )
+
+    def _store_miss(self, city_key):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO misses VALUES (?, ?)", (city_key, time.time()))
+
+    def _remember_venue(self, venue_id, city_key, coords):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO venues VALUES (?, ?, ?, ?)", (venue_id, city_key, *coords)
+            )
+
+    def _fetch_once(self, city_name, city_key, priority):
+        """Un seul appel distant par ville en cours (tous processus) ; les autres attendent son résultat."""
+        def fetch():
+            coords = self.lookup_remote(city_name, priority)
+            if coords[0] is not None:
+                self._store(city_name, city_key, coords)
+            else:
+                self._store_miss(city_key)
+            return coords
+
+        return self._flights.do(city_key, fetch, check=lambda: self._city(city_key))
+
+    def lookup(self, city_name, venue_id=None, priority=HIGH):
+        """(lat, lon) du stade, puis de la ville ; appel distant seulement en dernier recours."""
+        if venue_id is not None:
+            row = self._venue(venue_id)
+            record_cache("gazetteer", "venue", bool(row))
+            if row:
+                return row
+        city_key = normalize_city(city_name)
+        if not city_key:
+            return None, None
+        row = self._city(city_key)
+        record_cache("gazetteer", "city", row is not None)
+        if row is None:
+            row = self._fetch_once(city_name, city_key, priority)
+        if row[0] is not None and venue_id is not None:
+            self._remember_venue(venue_id, city_key, row)
+        return tuple(row)
+
+    def prefill(self, venues, max_workers=4, priority=LOW):
+        """
+        Préremplit à partir de couples (venue_id, city) ; une seule requête par ville.
+        Retourne le nombre de stades connus après l'opération.
+        """
+        venues = [(v, c) for v, c in venues if c and normalize_city(c)]
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gazetteer") as pool:
+            list(pool.map(lambda vc: self.lookup(vc[1], vc[0], priority), venues))
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM venues").fetchone()[0]
+
+
+def venues_from_frame(frame):
+    """Couples (venue_id, city) distincts d'un DataFrame json_normalize."""
+    venues = frame[['fixture.venue.id', 'fixture.venue.city']].dropna().drop_duplicates()
+    return [(int(v), str(c)) for v, c in venues.itertuples(index=False)]
+
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer():
+    """Gazetteer partagé par le processus."""
+    global _gazetteer
+    if _gazetteer is None:
+        with _gazetteer_lock:
+            if _gazetteer is None:
+                _gazetteer = Gazetteer()
+    return _gazetteer
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gazetteer des stades.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    prefill = sub.add_parser("prefill", help="Géocode tous les stades de l'historique")
+    prefill.add_argument("--csv", help="Export json_normalize (ex. match_data.csv)")
+    args = parser.parse_args(argv)
+
+    if args.csv:
+        frame = pd.read_csv(args.csv)
+    else:
+        from .dataset import MatchDataset
+        frame = MatchDataset().load(['fixture.venue.id', 'fixture.venue.city'])
+    count = get_gazetteer().prefill(venues_from_frame(frame))
+    print(f"{count} stade(s) connu(s).")
+
+
+if __name__ == "__main__":
+    main()
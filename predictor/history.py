@@ -0,0 +1,309 @@
+# predictor/history.py
+"""
+Historique local des matchs terminés (SQLite), pour la forme et les H2H.
+
+Les matchs terminés ne changent plus : ils sont stockés une fois, indexés par
+équipe et par paire d'équipes, et la synchronisation ne récupère que les
+jours postérieurs à la dernière date synchronisée (/fixtures?date=).
+get_team_form et get_h2h_score répondent depuis ce stockage et ne retombent
+sur l'API que si l'historique local ne couvre pas la demande.
+
+Usage :
+    python -m predictor.history sync --since 2024-08-01
+"""
+
+import argparse
+import os
+import threading
+from datetime import date, datetime, timedelta
+
+from .api import API_URL_FIXTURES, api_football_get
+from .cache import FINISHED_STATUSES
+from .client import LOW
+from .shared import connect
+
+DEFAULT_HISTORY_PATH = os.getenv("HISTORY_DB_PATH", os.path.join(".cache", "history.sqlite3"))
+DEFAULT_SYNC_DAYS = 30
+
+# Matchs réellement joués (les matchs annulés / abandonnés sont ignorés)
+PLAYED_STATUSES = FINISHED_STATUSES - {"CANC", "ABD"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fixtures (
+    id INTEGER PRIMARY KEY,
+    kickoff INTEGER NOT NULL,
+    league_id INTEGER,
+    season INTEGER,
+    home_id INTEGER NOT NULL,
+    away_id INTEGER NOT NULL,
+    team_lo INTEGER NOT NULL,
+    team_hi INTEGER NOT NULL,
+    home_goals INTEGER,
+    away_goals INTEGER,
+    status TEXT
+);
+CREATE INDEX IF NOT EXISTS fixtures_home ON fixtures(home_id, kickoff);
+CREATE INDEX IF NOT EXISTS fixtures_away ON fixtures(away_id, kickoff);
+CREATE INDEX IF NOT EXISTS fixtures_pair ON fixtures(team_lo, team_hi, kickoff);
+CREATE INDEX IF NOT EXISTS fixtures_league ON fixtures(league_id, season, kickoff);
+CREATE TABLE IF NOT EXISTS sync_state (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS league_versions (
+    league_id INTEGER PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS h2h_complete (
+    team_lo INTEGER NOT NULL,
+    team_hi INTEGER NOT NULL,
+    PRIMARY KEY (team_lo, team_hi)
+);
+"""
+
+
+def fixture_row(fix):
+    """Ligne SQL d'un match API-Football (None si le match n'est pas terminé)."""
+    status = fix['fixture'].get('status', {}).get('short')
+    if status not in PLAYED_STATUSES:
+        return None
+    home_id = fix['teams']['home']['id']
+    away_id = fix['teams']['away']['id']
+    return (
+        fix['fixture']['id'],
+        fix['fixture'].get('timestamp') or 0,
+        fix.get('league', {}).get('id'),
+        fix.get('league', {}).get('season'),
+        home_id,
+        away_id,
+        min(home_id, away_id),
+        max(home_id, away_id),
+        fix['goals'].get('home'),
+        fix['goals'].get('away'),
+        status,
+    )
+
+
+class FixtureHistory:
+    """Stockage des matchs terminés, clé fixture.id ; sûr entre threads."""
+
+    def __init__(self, path=DEFAULT_HISTORY_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = connect(path)
+        self._conn.executescript(SCHEMA)
+        self._listeners = []
+
+    def subscribe(self, listener):
+        """
+        `listener(rows, versions)` est appelé après chaque écriture de ce processus
+        (lignes de fixture_row, {ligue: version après l'écriture}).
+        """
+        self._listeners.append(listener)
+
+    # -------------------------------------------------------------- écriture
+    def ingest(self, fixtures):
+        """
+        Ajoute / met à jour les matchs terminés ; retourne le nombre de lignes écrites.
+        La version de chaque ligue touchée est incrémentée dans la même
+        transaction, pour que les autres processus voient le changement.
+        """
+        rows = [r for r in (fixture_row(f) for f in fixtures) if r is not None]
+        if rows:
+            leagues = sorted({r[2] for r in rows if r[2] is not None})
+            with self._lock:
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO fixtures VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+                    )
+                    self._conn.executemany(
+                        "INSERT INTO league_versions VALUES (?, 1) "
+                        "ON CONFLICT(league_id) DO UPDATE SET version = version + 1",
+                        [(league_id,) for league_id in leagues],
+                    )
+                    versions = dict(self._conn.execute(
+                        f"SELECT league_id, version FROM league_versions "
+                        f"WHERE league_id IN ({', '.join('?' * len(leagues))})",
+                        leagues,
+                    ).fetchall()) if leagues else {}
+                    self._conn.execute("COMMIT")
+                except BaseException:
+                    # Sans ROLLBACK, la connexion partagée garderait le verrou d'écriture
+                    self._conn.execute("ROLLBACK")
+                    raise
+            for listener in self._listeners:
+                listener(rows, versions)
+        return len(rows)
+
+    def mark_h2h_complete(self, team_a, team_b):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO h2h_complete VALUES (?, ?)",
+                (min(team_a, team_b), max(team_a, team_b)),
+            )
+
+    # ------------------------------------------------------- synchronisation
+    def synced_until(self):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM sync_state WHERE name = 'synced_until'"
+            ).fetchone()
+        return date.fromisoformat(row[0]) if row else None
+
+    def _set_synced_until(self, day):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sync_state VALUES ('synced_until', ?)", (day.isoformat(),)
+            )
+
+    def is_current(self, today=None):
+        """Vrai si tous les jours jusqu'à la veille sont synchronisés."""
+        synced = self.synced_until()
+        return synced is not None and synced >= (today or date.today()) - timedelta(days=1)
+
+    def sync(self, until=None, since=None, priority=LOW):
+        """
+        Synchronise jour par jour depuis la dernière date vue (rejouée, des matchs
+        ayant pu se terminer après la précédente synchronisation) jusqu'à `until`.
+        Retourne le nombre de matchs écrits.
+        """
+        until = until or date.today()
+        start = self.synced_until() or since or until - timedelta(days=DEFAULT_SYNC_DAYS)
+        written = 0
+        day = start
+        while day <= until:
+            payload = api_football_get(API_URL_FIXTURES, {'date': day.isoformat()}, priority)
+            if payload is None:
+                break
+            written += self.ingest(payload.get('response', []))
+            self._set_synced_until(day)
+            day += timedelta(days=1)
+        return written
+
+    # --------------------------------------------------------------- lecture
+    def last_matches(self, team_id, n=5, before=None):
+        """n derniers matchs terminés d'une équipe : [(home_id, away_id, hg, ag), ...]."""
+        before = before if before is not None else 2 ** 62
+        with self._lock:
+            return self._conn.execute(
+                """
+                SELECT home_id, away_id, home_goals, away_goals FROM (
+                    SELECT kickoff, home_id, away_id, home_goals, away_goals FROM fixtures
+                    WHERE home_id = ? AND kickoff < ?
+                    UNION ALL
+                    SELECT kickoff, home_id, away_id, home_goals, away_goals FROM fixtures
+                    WHERE away_id = ? AND kickoff < ?
+                ) ORDER BY kickoff DESC LIMIT ?
+                """,
+                (team_id, before, team_id, before, n),
+            ).fetchall()
+
+    def h2h_matches(self, team_a, team_b, before=None):
+        """Tous les matchs terminés entre deux équipes : [(home_id, away_id, hg, ag), ...]."""
+        before = before if before is not None else 2 ** 62
+        with self._lock:
+            return self._conn.execute(
+                "SELECT home_id, away_id, home_goals, away_goals FROM fixtures "
+                "WHERE team_lo = ? AND team_hi = ? AND kickoff < ? ORDER BY kickoff DESC",
+                (min(team_a, team_b), max(team_a, team_b), before),
+            ).fetchall()
+
+    def league_matches(self, league_id, until_season=None):
+        """
+        Matchs terminés d'une ligue (jusqu'à la saison `until_season` incluse), par date :
+        [(id, kickoff, season, home_id, away_id, hg, ag), ...].
+        """
+        until_season = until_season if until_season is not None else 2 ** 31
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, kickoff, season, home_id, away_id, home_goals, away_goals FROM fixtures "
+                "WHERE league_id = ? AND season <= ? AND home_goals IS NOT NULL "
+                "AND away_goals IS NOT NULL ORDER BY kickoff",
+                (league_id, until_season),
+            ).fetchall()
+
+    def league_version(self, league_id):
+        """Compteur d'écritures de la ligue, tous processus confondus (0 si aucune)."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT version FROM league_versions WHERE league_id = ?", (league_id,)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def has_h2h(self, team_a, team_b):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM h2h_complete WHERE team_lo = ? AND team_hi = ?",
+                (min(team_a, team_b), max(team_a, team_b)),
+            ).fetchone() is not None
+
+
+def score_rows(fixtures):
+    """Matchs API-Football -> [(home_id, away_id, hg, ag), ...]."""
+    return [
+        (m['teams']['home']['id'], m['teams']['away']['id'], m['goals'].get('home'), m['goals'].get('away'))
+        for m in fixtures
+    ]
+
+
+def form_from_matches(team_id, matches):
+    """Proportion de victoires (0 à 1) ; 0.33 sans match."""
+    wins, total = 0, 0
+    for h_id, a_id, hg, ag in matches:
+        hg, ag = hg or 0, ag or 0
+        total += 1
+        if (h_id == team_id and hg > ag) or (h_id != team_id and ag > hg):
+            wins += 1
+    return wins / total if total > 0 else 0.33
+
+
+def h2h_from_matches(home_team_id, matches):
+    """(victoires domicile, victoires extérieur) / nombre de confrontations."""
+    if not matches:
+        return 0.33, 0.33
+    home_wins, away_wins = 0, 0
+    for h_id, a_id, hg, ag in matches:
+        if hg == ag:
+            continue
+        if (h_id == home_team_id and hg > ag) or (a_id == home_team_id and ag > hg):
+            home_wins += 1
+        else:
+            away_wins += 1
+    return home_wins / len(matches), away_wins / len(matches)
+
+
+_history = None
+_history_lock = threading.Lock()
+
+
+def get_history():
+    """Historique local partagé par le processus."""
+    global _history
+    if _history is None:
+        with _history_lock:
+            if _history is None:
+                _history = FixtureHistory()
+    return _history
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Historique local des matchs terminés.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sync = sub.add_parser("sync", help="Synchronisation incrémentale depuis la dernière date vue")
+    sync.add_argument("--since", help="Date de départ si l'historique est vide (AAAA-MM-JJ)")
+    sync.add_argument("--until", help="Dernière date à synchroniser (aujourd'hui par défaut)")
+    args = parser.parse_args(argv)
+
+    history = get_history()
+    since = datetime.strptime(args.since, "%Y-%m-%d").date() if args.since else None
+    until = datetime.strptime(args.until, "%Y-%m-%d").date() if args.until else None
+    written = history.sync(until=until, since=since)
+    print(f"{written} match(s) écrit(s) ; synchronisé jusqu'au {history.synced_until()}.")
+
+
+if __name__ == "__main__":
+    main()
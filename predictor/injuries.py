@@ -0,0 +1,162 @@
+# predictor/injuries.py
+"""
+Blessures : liste d'une ligue et d'une saison, chargée en une requête.
+
+/injuries?league=&season= est récupéré une fois par fenêtre de
+rafraîchissement (une requête par ligue, quel que soit le nombre de matchs
+affichés), puis aplati en tableaux (équipe, match, coup d'envoi, joueur)
+triés par équipe et par date. Le facteur d'une équipe pour un match compte
+les joueurs absents de ce match s'il figure dans la liste, sinon ceux de
+son dernier match listé avant le coup d'envoi ; factors() calcule toutes
+les équipes de la ligue en une passe vectorisée.
+"""
+
+import threading
+import time
+from datetime import date, datetime, timezone
+
+import numpy as np
+
+from .api import API_URL_INJURIES, api_football_get, season_for
+from .cache import ENDPOINT_TTLS
+from .client import HIGH
+from .odds import odds_day
+from .shared import SingleFlight
+
+INJURY_PENALTY = 0.05
+DEFAULT_INJURY_FACTOR = 0.9
+
+
+def injury_factor(count):
+    """Facteur (0 à 1) pour un nombre de joueurs absents."""
+    return np.maximum(0, 1 - np.asarray(count) * INJURY_PENALTY)
+
+
+def kickoff_timestamp(kickoff=None):
+    """Timestamp d'un coup d'envoi (timestamp, datetime ou date : fin de journée UTC) ; maintenant sinon."""
+    if kickoff is None:
+        return int(time.time())
+    if isinstance(kickoff, (int, float)):
+        return int(kickoff)
+    if isinstance(kickoff, datetime):
+        return int(kickoff.timestamp() if kickoff.tzinfo else kickoff.replace(tzinfo=timezone.utc).timestamp())
+    return int(datetime(kickoff.year, kickoff.month, kickoff.day, 23, 59, 59, tzinfo=timezone.utc).timestamp())
+
+
+def flatten_injuries(items):
+    """Réponse /injuries -> tableaux (équipe, match, coup d'envoi, joueur), sans doublon."""
+    rows = [
+        (
+            (item.get('team') or {}).get('id'),
+            (item.get('fixture') or {}).get('id') or 0,
+            (item.get('fixture') or {}).get('timestamp') or 0,
+            (item.get('player') or {}).get('id') or 0,
+        )
+        for item in items
+    ]
+    rows = np.unique(np.array([r for r in rows if r[0] is not None], dtype=np.int64).reshape(-1, 4), axis=0)
+    return rows[:, 0], rows[:, 1], rows[:, 2], rows[:, 3]
+
+
+class InjurySnapshot:
+    """Blessures d'une ligue et d'une saison, indexées par équipe et par match."""
+
+    def __init__(self, team_ids, fixture_ids, timestamps):
+        self.teams, team_index = np.unique(np.asarray(team_ids, dtype=np.int64), return_inverse=True)
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        fixture_ids = np.asarray(fixture_ids, dtype=np.int64)
+        order = np.lexsort((timestamps, team_index))
+        self.team_index = team_index[order]
+        self.timestamps = timestamps[order]
+        counts = np.bincount(self.team_index, minlength=len(self.teams))
+        self.starts = np.concatenate([[0], np.cumsum(counts)])
+        # Joueurs absents par (match, équipe)
+        pairs, per_pair = np.unique(np.column_stack([fixture_ids[order], self.team_index]).reshape(-1, 2),
+                                    axis=0, return_counts=True)
+        self.by_fixture = {(int(f), int(self.teams[t])): int(n) for (f, t), n in zip(pairs, per_pair)}
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def count(self, team_id, kickoff=None, fixture_id=None):
+        """Joueurs absents d'une équipe pour un match (ou à la date du coup d'envoi)."""
+        if fixture_id is not None and (fixture_id, team_id) in self.by_fixture:
+            return self.by_fixture[(fixture_id, team_id)]
+        pos = np.searchsorted(self.teams, team_id)
+        if pos >= len(self.teams) or self.teams[pos] != team_id:
+            return 0
+        listed = self.timestamps[self.starts[pos]:self.starts[pos + 1]]
+        last = np.searchsorted(listed, kickoff_timestamp(kickoff), side="right")
+        if last == 0:
+            return 0
+        return int(last - np.searchsorted(listed, listed[last - 1], side="left"))
+
+    def factor(self, team_id, kickoff=None, fixture_id=None):
+        return float(injury_factor(self.count(team_id, kickoff, fixture_id)))
+
+    def factors(self, kickoff=None):
+        """Facteur de chaque équipe listée à la date du coup d'envoi : (équipes, facteurs)."""
+        mask = self.timestamps <= kickoff_timestamp(kickoff)
+        last = np.full(len(self.teams), -1, dtype=np.int64)
+        np.maximum.at(last, self.team_index[mask], self.timestamps[mask])
+        current = mask & (self.timestamps == last[self.team_index])
+        counts = np.bincount(self.team_index[current], minlength=len(self.teams))
+        return self.teams, injury_factor(counts)
+
+
+class InjuryBook:
+    """Listes de blessures par (ligue, saison), rechargées après `ttl`, partagées par le processus."""
+
+    def __init__(self, ttl=ENDPOINT_TTLS["injuries"]):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._snapshots = {}
+        self._flights = SingleFlight()
+
+    def _fresh(self, key):
+        with self._lock:
+            entry = self._snapshots.get(key)
+            if entry and time.time() - entry[0] < self.ttl:
+                return entry[1]
+        return None
+
+    def _download(self, league_id, season, priority):
+        payload = api_football_get(API_URL_INJURIES, {'league': league_id, 'season': season}, priority)
+        if payload is None:
+            return None
+        snapshot = InjurySnapshot(*flatten_injuries(payload.get('response', []))[:3])
+        with self._lock:
+            self._snapshots[(league_id, season)] = (time.time(), snapshot)
+        return snapshot
+
+    def load(self, league_id, season, priority=HIGH):
+        """Liste de la ligue pour la saison ; None si l'appel échoue."""
+        key = (league_id, season)
+        snapshot = self._fresh(key)
+        if snapshot is not None:
+            return snapshot
+        return self._flights.do(key, lambda: self._download(league_id, season, priority),
+                                check=lambda: self._fresh(key))
+
+    def get(self, league_id, team_id, kickoff=None, fixture_id=None, priority=HIGH):
+        """Facteur blessures d'une équipe pour un match."""
+        if league_id is None:
+            return DEFAULT_INJURY_FACTOR
+        day = odds_day(kickoff) if kickoff is not None else date.today()
+        snapshot = self.load(league_id, season_for(day), priority)
+        if snapshot is None:
+            return DEFAULT_INJURY_FACTOR
+        return snapshot.factor(team_id, kickoff, fixture_id)
+
+
+_book = None
+_book_lock = threading.Lock()
+
+
+def get_injury_book():
+    global _book
+    if _book is None:
+        with _book_lock:
+            if _book is None:
+                _book = InjuryBook()
+    return _book
@@ -0,0 +1,55 @@
+# predictor/leagues.py
+"""
+Référentiel éditorial : pays et compétitions mis en avant dans l'interface.
+"""
+
+CONTINENTS = ["Europe", "South America", "North America", "Asia", "Africa"]
+
+# ===================== MAPPING PAYS “PHARES” PAR CONTINENT ====================
+def reorder_countries(continent, all_countries):
+    """
+    Réordonne les pays pour mettre en premier ceux considérés comme “phares”
+    dans le foot (par continent), puis le reste en ordre alphabétique.
+    """
+    top_countries_by_continent = {
+        "Europe": [
+            "France", "England", "Spain", "Italy", "Germany", 
+            "Portugal", "Netherlands", "Belgium", "Turkey"
+        ],
+        "South America": ["Brazil", "Argentina", "Colombia", "Uruguay", "Chile"],
+        "North America": ["United States", "Mexico", "Canada"],
+        "Asia": ["Japan", "South Korea", "Saudi Arabia"],
+        "Africa": ["Egypt", "Senegal", "Morocco", "Tunisia", "Algeria"]
+    }
+    
+    top_countries = top_countries_by_continent.get(continent, [])
+    top_list = [c for c in top_countries if c in all_countries]  # pays phares présents
+    remaining = [c for c in all_countries if c not in top_list]
+    remaining.sort()
+    return top_list + remaining
+
+# ===================== MAPPING D1 (COMPÉTITIONS PHARES) PAR PAYS ============
+top_leagues_names = {
+    "France": ["Ligue 1"],
+    "England": ["Premier League"],
+    "Spain": ["La Liga", "Primera Division"],
+    "Italy": ["Serie A"],
+    "Germany": ["Bundesliga"],
+    "Portugal": ["Primeira Liga"],
+    "Netherlands": ["Eredivisie"],
+    "Belgium": ["Jupiler Pro League"],
+    "Turkey": ["Süper Lig"],
+
+    "Brazil": ["Serie A"],
+    "Argentina": ["Liga Profesional Argentina", "Primera Division"],
+    "Mexico": ["Liga MX"],
+    "United States": ["MLS"],
+    # etc.
+}
+
+# ===================== GRANDES COMPÉTITIONS EUROPÉENNES ===========
+european_top_competitions = {
+    "UEFA Champions League": 2,
+    "UEFA Europa League": 3,
+    "UEFA Europa Conference League": 848
+}
@@ -0,0 +1,320 @@
+# predictor/metrics.py
+"""
+Métriques du processus : durées, appels aux fournisseurs, tailles, cache, quotas.
+
+Un registre unique, protégé par un verrou, reçoit :
+- des spans chronométrés (span / timed) autour des fonctions coûteuses ;
+- un compteur et un histogramme de durée par appel sortant (fournisseur,
+  endpoint, statut) et le volume reçu ;
+- les succès / échecs des caches ;
+- les quotas restants, lus sur les clients au moment de l'export.
+L'enregistrement coûte un verrou et quelques additions par appel.
+
+Export au format texte Prometheus : render_prometheus(), ou serveur HTTP
+(GET /metrics) démarré par start_metrics_server() quand METRICS_PORT est défini.
+snapshot() alimente le panneau d'administration de football.py.
+"""
+
+import functools
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PREFIX = "predictor_"
+
+HELP = {
+    "span_seconds": "Durée des opérations instrumentées",
+    "upstream_requests_total": "Appels sortants par fournisseur, endpoint et statut",
+    "upstream_request_seconds": "Durée des appels sortants",
+    "upstream_response_bytes_total": "Octets reçus des fournisseurs",
+    "upstream_throttled_total": "Appels abandonnés localement (quota ou débit)",
+    "cache_requests_total": "Lectures de cache par résultat (hit / miss)",
+    "page_render_seconds": "Durée d'affichage d'une page",
+    "page_views_total": "Affichages de page",
+    "page_upstream_calls_total": "Appels sortants pendant les affichages de page",
+    "quota_remaining": "Quota restant par fournisseur (daily : jour, tokens : seau par minute)",
+    "quota_limit": "Quota journalier par fournisseur",
+    "http_requests_total": "Requêtes de l'API des prédictions par route et statut",
+    "http_request_seconds": "Durée des requêtes de l'API des prédictions",
+}
+
+
+def _key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "sum", "max")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Estimation (borne du bucket) du quantile q."""
+        target, seen = q * self.count, 0
+        for bound, n in zip(BUCKETS, self.counts):
+            seen += n
+            if seen >= target:
+                return bound
+        return self.max
+
+
+class Registry:
+    """Compteurs et histogrammes étiquetés ; sûr entre threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = defaultdict(lambda: defaultdict(float))
+        self.histograms = defaultdict(lambda: defaultdict(Histogram))
+
+    def count(self, metric, value=1, **labels):
+        with self._lock:
+            self.counters[metric][_key(labels)] += value
+
+    def observe(self, metric, value, **labels):
+        with self._lock:
+            self.histograms[metric][_key(labels)].observe(value)
+
+    def total(self, metric):
+        with self._lock:
+            return sum(self.counters[metric].values())
+
+    def clear(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def collect(self):
+        """Copie cohérente : ({nom: {labels: valeur}}, {nom: {labels: (counts, count, sum, max)}})."""
+        with self._lock:
+            counters = {n: dict(series) for n, series in self.counters.items()}
+            histograms = {
+                n: {k: (list(h.counts), h.count, h.sum, h.max) for k, h in series.items()}
+                for n, series in self.histograms.items()
+            }
+        return counters, histograms
+
+
+registry = Registry()
+
+
+# ----------------------------------------------------------- enregistrement
+@contextmanager
+def span(name, **labels):
+    """Chronomètre le bloc (span_seconds{name=...}), même s'il lève une exception."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe("span_seconds", time.perf_counter() - start, name=name, **labels)
+
+
+def timed(name):
+    """Décorateur : chaque appel de la fonction est un span `name`."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def record_upstream(provider, endpoint, status, seconds, size=0):
+    """Un appel sortant terminé (status : code HTTP ou "error")."""
+    registry.count("upstream_requests_total", provider=provider, endpoint=endpoint, status=status)
+    registry.observe("upstream_request_seconds", seconds, provider=provider, endpoint=endpoint)
+    if size:
+        registry.count("upstream_response_bytes_total", size, provider=provider, endpoint=endpoint)
+
+
+@contextmanager
+def upstream_call(provider, endpoint):
+    """Appel sortant fait par une bibliothèque cliente (OpenAI, Supabase) : durée et issue."""
+    start = time.perf_counter()
+    status = "error"
+    try:
+        yield
+        status = "200"
+    finally:
+        record_upstream(provider, endpoint, status, time.perf_counter() - start)
+
+
+def record_cache(cache, endpoint, hit):
+    registry.count("cache_requests_total", cache=cache, endpoint=endpoint, result="hit" if hit else "miss")
+
+
+class page_render:
+    """
+    Durée d'affichage d'une page et appels sortants pendant cet affichage
+    (approximatif quand plusieurs sessions affichent en même temps).
+    S'utilise comme contexte, ou via stop() pour un script Streamlit.
+    """
+
+    def __init__(self, page):
+        self.page = page
+        self.calls = registry.total("upstream_requests_total")
+        self.start = time.perf_counter()
+
+    def stop(self):
+        registry.observe("page_render_seconds", time.perf_counter() - self.start, page=self.page)
+        registry.count("page_views_total", page=self.page)
+        registry.count("page_upstream_calls_total",
+                       registry.total("upstream_requests_total") - self.calls, page=self.page)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+# -------------------------------------------------------------------- export
+def _quota_samples():
+    from .client import active_clients
+    samples = []
+    for provider, client in active_clients().items():
+        quota = client.quota()
+        if quota["daily_remaining"] is not None:
+            samples.append(("quota_remaining", {"provider": provider, "scope": "daily"}, quota["daily_remaining"]))
+        if quota["daily_limit"] is not None:
+            samples.append(("quota_limit", {"provider": provider}, quota["daily_limit"]))
+        samples.append(("quota_remaining", {"provider": provider, "scope": "tokens"}, quota["tokens"]))
+    return samples
+
+
+def _labels(key, **extra):
+    items = list(key) + sorted(extra.items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{str(v).replace(chr(34), chr(39))}"' for k, v in items) + "}"
+
+
+def render_prometheus():
+    """Toutes les métriques au format texte d'exposition Prometheus."""
+    counters, histograms = registry.collect()
+    lines = []
+    for name, series in sorted(counters.items()):
+        lines += [f"# HELP {PREFIX}{name} {HELP.get(name, name)}", f"# TYPE {PREFIX}{name} counter"]
+        lines += [f"{PREFIX}{name}{_labels(k)} {v:g}" for k, v in sorted(series.items())]
+    for name, series in sorted(histograms.items()):
+        lines += [f"# HELP {PREFIX}{name} {HELP.get(name, name)}", f"# TYPE {PREFIX}{name} histogram"]
+        for key, (counts, count, total, _) in sorted(series.items()):
+            cumulative = 0
+            for bound, n in zip(BUCKETS, counts):
+                cumulative += n
+                lines.append(f"{PREFIX}{name}_bucket{_labels(key, le=f'{bound:g}')} {cumulative}")
+            lines.append(f"{PREFIX}{name}_bucket{_labels(key, le='+Inf')} {count}")
+            lines.append(f"{PREFIX}{name}_sum{_labels(key)} {total:.6f}")
+            lines.append(f"{PREFIX}{name}_count{_labels(key)} {count}")
+    gauges = defaultdict(list)
+    for name, labels, value in _quota_samples():
+        gauges[name].append((labels, value))
+    for name, samples in sorted(gauges.items()):
+        lines += [f"# HELP {PREFIX}{name} {HELP.get(name, name)}", f"# TYPE {PREFIX}{name} gauge"]
+        lines += [f"{PREFIX}{name}{_labels(_key(labels))} {value:g}" for labels, value in samples]
+    return "\n".join(lines) + "\n"
+
+
+def snapshot():
+    """Vue tabulaire pour le panneau d'administration : {table: [dict, ...]}."""
+    counters, histograms = registry.collect()
+
+    def timings(name):
+        rows = []
+        for key, (counts, count, total, peak) in histograms.get(name, {}).items():
+            h = Histogram()
+            h.counts, h.count, h.sum, h.max = counts, count, total, peak
+            rows.append(dict(key, count=count, mean_ms=1000 * total / count if count else 0.0,
+                             p95_ms=1000 * h.quantile(0.95), max_ms=1000 * peak))
+        return sorted(rows, key=lambda r: -r["mean_ms"] * r["count"])
+
+    upstream = defaultdict(lambda: {"calls": 0, "errors": 0, "bytes": 0})
+    for key, value in counters.get("upstream_requests_total", {}).items():
+        labels = dict(key)
+        row = upstream[(labels["provider"], labels["endpoint"])]
+        row["calls"] += int(value)
+        if not labels["status"].startswith("2"):
+            row["errors"] += int(value)
+    for key, value in counters.get("upstream_response_bytes_total", {}).items():
+        labels = dict(key)
+        upstream[(labels["provider"], labels["endpoint"])]["bytes"] += int(value)
+
+    cache = defaultdict(lambda: {"hits": 0, "misses": 0})
+    for key, value in counters.get("cache_requests_total", {}).items():
+        labels = dict(key)
+        cache[(labels["cache"], labels["endpoint"])]["hits" if labels["result"] == "hit" else "misses"] += int(value)
+
+    return {
+        "spans": timings("span_seconds"),
+        "upstream": [dict(provider=p, endpoint=e, **row) for (p, e), row in sorted(upstream.items())],
+        "cache": [
+            dict(cache=c, endpoint=e, hit_ratio=row["hits"] / max(row["hits"] + row["misses"], 1), **row)
+            for (c, e), row in sorted(cache.items())
+        ],
+        "pages": [
+            dict(row, calls_per_view=counters.get("page_upstream_calls_total", {}).get(_key(row_key), 0)
+                 / max(counters.get("page_views_total", {}).get(_key(row_key), 0), 1))
+            for row, row_key in ((row, {"page": row["page"]}) for row in timings("page_render_seconds"))
+        ],
+        "quotas": [dict(labels, value=value) for _, labels, value in _quota_samples()],
+    }
+
+
+# ------------------------------------------------------------------- serveur
+_server = None
+_server_lock = threading.Lock()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_metrics_server(port=None, host="0.0.0.0"):
+    """
+    Démarre (une fois par processus) GET /metrics sur `port` ou METRICS_PORT ;
+    ne fait rien si aucun port n'est configuré. Retourne le serveur ou None.
+    """
+    global _server
+    port = port or os.getenv("METRICS_PORT")
+    if not port:
+        return None
+    if _server is None:
+        with _server_lock:
+            if _server is None:
+                try:
+                    server = ThreadingHTTPServer((host, int(port)), _MetricsHandler)
+                except OSError:
+                    return None  # port déjà pris (autre processus)
+                server.daemon_threads = True
+                threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+                _server = server
+    return _server
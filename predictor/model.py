@@ -0,0 +1,85 @@
+# predictor/model.py
+"""
+Modèle de pondération des facteurs, en version vectorisée.
+
+Un match est décrit par 10 facteurs (ordre de FACTOR_NAMES). La pondération
+est une matrice (10 x 3) : une seule multiplication matricielle donne les
+scores domicile / nul / extérieur de tous les matchs, normalisés ensuite en
+probabilités.
+"""
+
+import hashlib
+import json
+
+import numpy as np
+
+FACTOR_NAMES = (
+    "home_form", "away_form",
+    "home_h2h", "away_h2h",
+    "home_odds", "draw_odds", "away_odds",
+    "home_injury", "away_injury",
+    "weather",
+)
+
+# Pondérations ajustables
+DEFAULT_WEIGHTS = {
+    "form": 0.3,
+    "h2h": 0.2,
+    "odds": 0.3,
+    "weather": 0.1,
+    "injury": 0.1,
+    "draw_odds": 0.7,
+    "draw_weather": 0.3,
+}
+
+OUTCOMES = ("home", "draw", "away")
+
+# À incrémenter quand la forme du modèle change (facteurs, matrice, normalisation)
+MODEL_VERSION = 1
+
+
+def model_version(weights=None):
+    """Identifiant des prédictions : version du modèle + empreinte des pondérations."""
+    w = dict(DEFAULT_WEIGHTS, **(weights or {}))
+    digest = hashlib.sha1(json.dumps(w, sort_keys=True).encode("utf-8")).hexdigest()[:8]
+    return f"v{MODEL_VERSION}-{digest}"
+
+
+def weight_matrix(weights=None):
+    """Matrice (facteurs x issues) correspondant aux pondérations."""
+    w = dict(DEFAULT_WEIGHTS, **(weights or {}))
+    idx = {name: i for i, name in enumerate(FACTOR_NAMES)}
+    W = np.zeros((len(FACTOR_NAMES), 3))
+    # Victoire domicile
+    W[idx["home_form"], 0] = w["form"]
+    W[idx["home_h2h"], 0] = w["h2h"]
+    W[idx["home_odds"], 0] = w["odds"]
+    W[idx["weather"], 0] = w["weather"]
+    W[idx["home_injury"], 0] = w["injury"]
+    # Match nul
+    W[idx["draw_odds"], 1] = w["draw_odds"]
+    W[idx["weather"], 1] = w["draw_weather"]
+    # Victoire extérieur
+    W[idx["away_form"], 2] = w["form"]
+    W[idx["away_h2h"], 2] = w["h2h"]
+    W[idx["away_odds"], 2] = w["odds"]
+    W[idx["weather"], 2] = w["weather"]
+    W[idx["away_injury"], 2] = w["injury"]
+    return W
+
+
+def predict_proba(factors, weights=None):
+    """
+    Probabilités (domicile, nul, extérieur) pour une matrice de facteurs (n x 10).
+    Une ligne dont le total est nul reçoit 1/3 partout.
+    """
+    F = np.atleast_2d(np.asarray(factors, dtype=float))
+    base = F @ weight_matrix(weights)
+    total = base.sum(axis=1, keepdims=True)
+    return np.divide(base, total, out=np.full_like(base, 1 / 3), where=total > 0)
+
+
+def predict_match(factors, weights=None):
+    """Version scalaire : tuple de 10 facteurs -> (home_prob, draw_prob, away_prob)."""
+    home_prob, draw_prob, away_prob = predict_proba([factors], weights)[0]
+    return float(home_prob), float(draw_prob), float(away_prob)
@@ -0,0 +1,186 @@
+# predictor/odds.py
+"""
+Cotes 1N2 : ingestion en masse et probabilités sans marge.
+
+Le flux paginé /odds?date= (éventuellement restreint à une ligue) est
+récupéré une fois par fenêtre de rafraîchissement, aplati en un tableau de
+cotes (une ligne par bookmaker et par match), puis converti en une seule
+passe vectorisée : probabilités implicites 1/cote, division par la somme de
+chaque bookmaker (suppression de la marge), moyenne par match.
+
+Une seule durée de vie, comptée depuis l'appel : le livre en mémoire est daté
+de l'obtention des pages en cache dont il provient et expire avec elles.
+"""
+
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from .api import API_URL_ODDS, api_football_get, api_football_stored_at, season_for
+from .cache import ENDPOINT_TTLS
+from .client import HIGH
+from .metrics import timed
+from .shared import SingleFlight
+
+MATCH_WINNER = 'Match Winner'
+MATCH_WINNER_BET_ID = 1
+OUTCOME_COLUMNS = {'Home': 0, 'Draw': 1, 'Away': 2}
+DEFAULT_ODDS_PROBS = (0.33, 0.33, 0.33)
+
+
+def flatten_odds(odds_data):
+    """
+    Réponse /odds -> (fixture_ids (m,), cotes (m x 3) NaN si absente),
+    une ligne par couple (match, bookmaker).
+    """
+    fixture_ids, rows = [], []
+    for book in odds_data:
+        fixture_id = book.get('fixture', {}).get('id')
+        for bookmaker in book.get('bookmakers', []):
+            for bet in bookmaker.get('bets', []):
+                if bet.get('name') != MATCH_WINNER:
+                    continue
+                row = [np.nan, np.nan, np.nan]
+                for odd in bet.get('values', []):
+                    column = OUTCOME_COLUMNS.get(odd.get('value'))
+                    if column is not None and 'odd' in odd:
+                        row[column] = float(odd['odd'])
+                fixture_ids.append(fixture_id)
+                rows.append(row)
+    return np.array(fixture_ids, dtype=np.int64), np.array(rows, dtype=float).reshape(-1, 3)
+
+
+def margin_free_probabilities(fixture_ids, prices):
+    """
+    Probabilités (domicile, nul, extérieur) par match, marge des bookmakers retirée.
+    Retourne (ids uniques, matrice (n x 3)) ; seules les lignes complètes comptent.
+    """
+    if len(fixture_ids) == 0:
+        return np.empty(0, dtype=np.int64), np.empty((0, 3))
+    valid = np.all(np.isfinite(prices) & (prices > 0), axis=1)
+    implied = np.where(valid[:, None], 1.0 / np.where(valid[:, None], prices, 1.0), 0.0)
+    overround = implied.sum(axis=1, keepdims=True)
+    normalized = np.divide(implied, overround, out=np.zeros_like(implied), where=overround > 0)
+
+    ids, index = np.unique(fixture_ids, return_inverse=True)
+    counts = np.bincount(index, weights=valid.astype(float), minlength=len(ids))
+    sums = np.stack(
+        [np.bincount(index, weights=normalized[:, k], minlength=len(ids)) for k in range(3)], axis=1
+    )
+    probs = np.divide(sums, counts[:, None], out=np.full_like(sums, DEFAULT_ODDS_PROBS[0]),
+                      where=counts[:, None] > 0)
+    return ids, probs
+
+
+def fetch_odds_feed(params, priority=HIGH, max_age=None):
+    """
+    Toutes les pages du flux /odds pour ces paramètres, et la date d'obtention
+    de la plus ancienne ; (None, None) si un appel échoue.
+    """
+    items, page, total = [], 1, 1
+    fetched_at = time.time()
+    while page <= total:
+        page_params = dict(params, page=page)
+        payload = api_football_get(API_URL_ODDS, page_params, priority, max_age)
+        if payload is None:
+            return None, None
+        fetched_at = min(fetched_at, api_football_stored_at(API_URL_ODDS, page_params) or fetched_at)
+        items.extend(payload.get('response', []))
+        total = (payload.get('paging') or {}).get('total') or 1
+        page += 1
+    return items, fetched_at
+
+
+def odds_day(kickoff):
+    """Jour UTC d'un coup d'envoi (timestamp, datetime ou date)."""
+    if isinstance(kickoff, (int, float)):
+        return datetime.fromtimestamp(kickoff, tz=timezone.utc).date()
+    if isinstance(kickoff, datetime):
+        return kickoff.astimezone(timezone.utc).date() if kickoff.tzinfo else kickoff.date()
+    return kickoff
+
+
+class OddsBook:
+    """Probabilités sans marge par match, chargées par jour (et ligue), partagées par le processus."""
+
+    def __init__(self, ttl=ENDPOINT_TTLS["odds"]):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._books = {}
+        self._flights = SingleFlight()
+
+    def _fresh(self, key):
+        with self._lock:
+            entry = self._books.get(key)
+            if entry and time.time() - entry[0] < self.ttl:
+                return entry[1]
+        return None
+
+    def _download(self, day, league_id, priority, refresh=False):
+        params = {'date': day.isoformat(), 'bet': MATCH_WINNER_BET_ID}
+        if league_id:
+            params.update(league=league_id, season=season_for(day))
+        # Pages en cache acceptées tant qu'elles ont moins de `ttl` : le livre est daté de leur obtention
+        items, fetched_at = fetch_odds_feed(params, priority, max_age=0 if refresh else self.ttl)
+        if items is None:
+            return {}
+        ids, probs = margin_free_probabilities(*flatten_odds(items))
+        book = {int(i): tuple(float(p) for p in row) for i, row in zip(ids, probs)}
+        with self._lock:
+            self._books[(day, league_id)] = (fetched_at, book)
+        return book
+
+    def load(self, day, league_id=None, priority=HIGH, refresh=False):
+        """
+        Charge le flux d'un jour (d'une ligue, ou de toutes) ; retourne {fixture_id: probas}.
+        `refresh` force un nouvel appel, même si le flux en cache est encore valable.
+        """
+        key = (day, league_id)
+        if not refresh:
+            book = self._fresh(key)
+            if book is not None:
+                return book
+        return self._flights.do(key, lambda: self._download(day, league_id, priority, refresh),
+                                check=None if refresh else lambda: self._fresh(key))
+
+    def get(self, fixture_id, day, league_id=None, priority=HIGH):
+        """Probabilités d'un match ; le flux "toutes ligues" du jour est utilisé s'il est chargé."""
+        with self._lock:
+            entry = self._books.get((day, None))
+            if entry and time.time() - entry[0] < self.ttl and fixture_id in entry[1]:
+                return entry[1][fixture_id]
+        return self.load(day, league_id, priority).get(fixture_id, DEFAULT_ODDS_PROBS)
+
+
+_book = None
+_book_lock = threading.Lock()
+
+
+def get_odds_book():
+    global _book
+    if _book is None:
+        with _book_lock:
+            if _book is None:
+                _book = OddsBook()
+    return _book
+
+
+@timed("get_odds_score")
+def get_odds_score(match_id, priority=HIGH, match_date=None, league_id=None):
+    """
+    Retourne la probabilité implicite (home, draw, away) selon les cotes des
+    bookmakers, marge retirée. Avec la date (ou le coup d'envoi) du match, la
+    valeur vient du flux du jour partagé ; sinon d'un appel /odds?fixture=.
+    """
+    if match_date is not None:
+        return get_odds_book().get(match_id, odds_day(match_date), league_id, priority)
+
+    payload = api_football_get(API_URL_ODDS, {'fixture': match_id}, priority)
+    if payload is None:
+        return DEFAULT_ODDS_PROBS
+    ids, probs = margin_free_probabilities(*flatten_odds(payload.get('response', [])))
+    if not len(ids):
+        return DEFAULT_ODDS_PROBS
+    return tuple(float(p) for p in probs[0])
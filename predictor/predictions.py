@@ -0,0 +1,394 @@
+# predictor/predictions.py
+"""
+Stockage matérialisé des prédictions (facteurs, probabilités, analyse IA).
+
+Chaque prédiction calculée est enregistrée avec ses facteurs d'entrée et la
+version du modèle (clé : fixture_id + model_version). La page lit d'abord ce
+stockage — une seule lecture par clé pour un match déjà consulté — et ne
+recalcule que lorsque la prédiction est périmée ; le lot (predictor.batch)
+l'alimente par écritures groupées.
+
+Le stockage n'est qu'un raccourci : une erreur de lecture ou d'écriture
+(table absente, panne PostgREST) est journalisée et la prédiction est
+calculée et servie quand même.
+
+Deux implémentations de la même interface :
+- SupabasePredictionStore : table "predictions" (production) ;
+- SQLitePredictionStore   : fichier local, pour le développement et les tests.
+
+Table Supabase attendue :
+    create table predictions (
+        fixture_id bigint not null,
+        model_version text not null,
+        league_id bigint,
+        kickoff bigint,
+        home_team text,
+        away_team text,
+        factors jsonb not null,
+        home_prob double precision,
+        draw_prob double precision,
+        away_prob double precision,
+        analysis text,
+        computed_at bigint not null,
+        primary key (fixture_id, model_version)
+    );
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from .config import get_secret
+from .metrics import timed, upstream_call
+from .model import FACTOR_NAMES, model_version, predict_match, predict_proba
+from .shared import connect
+from .weights import weights_for
+
+DEFAULT_PREDICTIONS_PATH = os.getenv(
+    "PREDICTIONS_DB_PATH", os.path.join(".cache", "predictions.sqlite3")
+)
+logger = logging.getLogger(__name__)
+
+TABLE = "predictions"
+UPSERT_BATCH = 500
+
+# Péremption : les cotes et la météo bougent à l'approche du coup d'envoi ;
+# une prédiction faite avant le match est figée une fois celui-ci commencé.
+NEAR_KICKOFF = 24 * 3600
+STALE_AFTER_NEAR = 10 * 60
+STALE_AFTER_FAR = 3600
+
+COLUMNS = (
+    "fixture_id", "model_version", "league_id", "kickoff", "home_team", "away_team",
+    "factors", "home_prob", "draw_prob", "away_prob", "analysis", "computed_at",
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    fixture_id INTEGER NOT NULL,
+    model_version TEXT NOT NULL,
+    league_id INTEGER,
+    kickoff INTEGER,
+    home_team TEXT,
+    away_team TEXT,
+    factors TEXT NOT NULL,
+    home_prob REAL,
+    draw_prob REAL,
+    away_prob REAL,
+    analysis TEXT,
+    computed_at INTEGER NOT NULL,
+    PRIMARY KEY (fixture_id, model_version)
+);
+CREATE INDEX IF NOT EXISTS predictions_kickoff ON predictions(kickoff);
+"""
+
+
+def _chunks(records, size=UPSERT_BATCH):
+    for start in range(0, len(records), size):
+        yield records[start:start + size]
+
+
+def is_fresh(record, now=None):
+    """Vrai si la prédiction enregistrée peut être servie telle quelle."""
+    if record is None:
+        return False
+    now = now or time.time()
+    kickoff = record.get("kickoff") or 0
+    if kickoff and kickoff <= now:
+        return True
+    max_age = STALE_AFTER_NEAR if kickoff - now < NEAR_KICKOFF else STALE_AFTER_FAR
+    return now - record["computed_at"] < max_age
+
+
+def prediction_record(fixture, factors, probs, version, analysis=None, now=None):
+    """Ligne de la table à partir d'un match API-Football, de ses facteurs et probabilités."""
+    home_prob, draw_prob, away_prob = probs
+    return {
+        "fixture_id": fixture['fixture']['id'],
+        "model_version": version,
+        "league_id": fixture.get('league', {}).get('id'),
+        "kickoff": fixture['fixture'].get('timestamp'),
+        "home_team": fixture['teams']['home']['name'],
+        "away_team": fixture['teams']['away']['name'],
+        "factors": dict(zip(FACTOR_NAMES, map(float, factors))),
+        "home_prob": float(home_prob),
+        "draw_prob": float(draw_prob),
+        "away_prob": float(away_prob),
+        "analysis": analysis,
+        "computed_at": int(now or time.time()),
+    }
+
+
+def records_from_frame(predictions, version=None, now=None):
+    """
+    Lignes de la table à partir d'un DataFrame de predictor.batch
+    (version du modèle : colonne model_version, sinon `version`).
+    """
+    now = int(now or time.time())
+    records = []
+    for row in predictions.to_dict("records"):
+        kickoff = row.get("kickoff")
+        analysis = row.get("analysis")
+        records.append({
+            "fixture_id": int(row["fixture_id"]),
+            "model_version": row.get("model_version") or version,
+            "league_id": int(row["league_id"]) if row.get("league_id") is not None else None,
+            "kickoff": int(datetime.fromisoformat(kickoff).timestamp()) if kickoff else None,
+            "home_team": row["home_team"],
+            "away_team": row["away_team"],
+            "factors": {name: float(row[name]) for name in FACTOR_NAMES},
+            "home_prob": float(row["home_prob"]),
+            "draw_prob": float(row["draw_prob"]),
+            "away_prob": float(row["away_prob"]),
+            "analysis": analysis if isinstance(analysis, str) else None,
+            "computed_at": now,
+        })
+    return records
+
+
+class SQLitePredictionStore:
+    """Table des prédictions dans un fichier SQLite local ; sûr entre threads."""
+
+    def __init__(self, path=DEFAULT_PREDICTIONS_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = connect(path)
+        self._conn.executescript(SCHEMA)
+
+    @staticmethod
+    def _decode(row):
+        record = dict(zip(COLUMNS, row))
+        record["factors"] = json.loads(record["factors"])
+        return record
+
+    def get(self, fixture_id, version):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM predictions WHERE fixture_id = ? AND model_version = ?",
+                (fixture_id, version),
+            ).fetchone()
+        return self._decode(row) if row else None
+
+    def get_many(self, fixture_ids, version):
+        """{fixture_id: ligne} pour les matchs déjà enregistrés."""
+        ids = list(fixture_ids)
+        found = {}
+        for chunk in _chunks(ids):
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT {', '.join(COLUMNS)} FROM predictions "
+                    f"WHERE model_version = ? AND fixture_id IN ({', '.join('?' * len(chunk))})",
+                    (version, *chunk),
+                ).fetchall()
+            found.update((row[0], self._decode(row)) for row in rows)
+        return found
+
+    def upsert(self, records):
+        """Insère ou remplace les lignes, par lots ; retourne le nombre de lignes écrites."""
+        rows = [
+            tuple(json.dumps(r["factors"]) if c == "factors" else r.get(c) for c in COLUMNS)
+            for r in records
+        ]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for chunk in _chunks(rows):
+                    self._conn.executemany(
+                        f"INSERT OR REPLACE INTO predictions VALUES ({', '.join('?' * len(COLUMNS))})", chunk
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+    def set_analysis(self, fixture_id, version, text):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE predictions SET analysis = ? WHERE fixture_id = ? AND model_version = ?",
+                (text, fixture_id, version),
+            )
+
+
+class SupabasePredictionStore:
+    """Table "predictions" de Supabase (même interface que SQLitePredictionStore)."""
+
+    def __init__(self, client=None):
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            from .auth import get_supabase
+            self._client = get_supabase()
+        return self._client
+
+    def get(self, fixture_id, version):
+        with upstream_call("supabase", "rest/v1/predictions"):
+            response = self.client.table(TABLE).select('*')\
+                .eq('fixture_id', fixture_id)\
+                .eq('model_version', version)\
+                .limit(1)\
+                .execute()
+        return response.data[0] if response.data else None
+
+    def get_many(self, fixture_ids, version):
+        ids = list(fixture_ids)
+        found = {}
+        for chunk in _chunks(ids):
+            with upstream_call("supabase", "rest/v1/predictions"):
+                response = self.client.table(TABLE).select('*')\
+                    .eq('model_version', version)\
+                    .in_('fixture_id', chunk)\
+                    .execute()
+            found.update((row['fixture_id'], row) for row in response.data or [])
+        return found
+
+    def upsert(self, records):
+        for chunk in _chunks(list(records)):
+            with upstream_call("supabase", "rest/v1/predictions"):
+                self.client.table(TABLE).upsert(chunk, on_conflict='fixture_id,model_version').execute()
+        return len(records)
+
+    def set_analysis(self, fixture_id, version, text):
+        with upstream_call("supabase", "rest/v1/predictions"):
+            self.client.table(TABLE).update({'analysis': text})\
+                .eq('fixture_id', fixture_id)\
+                .eq('model_version', version)\
+                .execute()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_prediction_store():
+    """
+    Stockage du processus : PREDICTIONS_BACKEND ("supabase" ou "sqlite") ;
+    par défaut Supabase si SUPABASE_URL est configuré, SQLite sinon.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                backend = get_secret("PREDICTIONS_BACKEND") or (
+                    "supabase" if get_secret("SUPABASE_URL") else "sqlite"
+                )
+                _store = SupabasePredictionStore() if backend == "supabase" else SQLitePredictionStore()
+    return _store
+
+
+def set_prediction_store(store):
+    """Remplace le stockage du processus (tests : SQLitePredictionStore(":memory:"))."""
+    global _store
+    _store = store
+
+
+def store_predictions(predictions, store=None):
+    """Enregistre en bloc un DataFrame de predictor.batch ; retourne le nombre de lignes."""
+    records = records_from_frame(predictions)
+    return (store or get_prediction_store()).upsert(records) if records else 0
+
+
+def _save(store, records):
+    try:
+        store.upsert(records)
+    except Exception as e:
+        logger.warning("Enregistrement des prédictions impossible : %s", e)
+
+
+def save_analysis(fixture_id, version, text, store=None):
+    """Enregistre le texte IA d'une prédiction ; une erreur du stockage est seulement journalisée."""
+    try:
+        (store or get_prediction_store()).set_analysis(fixture_id, version, text)
+    except Exception as e:
+        logger.warning("Enregistrement de l'analyse impossible : %s", e)
+
+
+@timed("read_through")
+def read_through(fixture, collect, weights=None, store=None, now=None):
+    """
+    Prédiction d'un match : servie depuis le stockage si elle est fraîche,
+    sinon recalculée (`collect()` retourne les 10 facteurs) puis enregistrée,
+    avec l'analyse IA déjà enregistrée. Sans `weights`, les pondérations
+    calibrées de la ligue s'appliquent.
+    """
+    store = store or get_prediction_store()
+    if weights is None:
+        weights = weights_for(fixture.get('league', {}).get('id'))
+    version = model_version(weights)
+    try:
+        record = store.get(fixture['fixture']['id'], version)
+    except Exception as e:
+        logger.warning("Lecture des prédictions impossible : %s", e)
+        record = None
+    if is_fresh(record, now):
+        return record
+    factors = collect()
+    record = prediction_record(
+        fixture, factors, predict_match(factors, weights), version,
+        analysis=record.get("analysis") if record else None, now=now,
+    )
+    _save(store, [record])
+    return record
+
+
+def _stored_many(fixtures, store):
+    """(pondérations par ligue, version par match, ligne enregistrée par match ou None)."""
+    league_weights, versions, by_version = {}, [], {}
+    for i, fixture in enumerate(fixtures):
+        league_id = fixture.get('league', {}).get('id')
+        if league_id not in league_weights:
+            league_weights[league_id] = weights_for(league_id)
+        versions.append(model_version(league_weights[league_id]))
+        by_version.setdefault(versions[-1], []).append(i)
+
+    stored = [None] * len(fixtures)
+    for version, rows in by_version.items():
+        try:
+            found = store.get_many([fixtures[i]['fixture']['id'] for i in rows], version)
+        except Exception as e:
+            logger.warning("Lecture des prédictions impossible : %s", e)
+            found = {}
+        for i in rows:
+            stored[i] = found.get(fixtures[i]['fixture']['id'])
+    return league_weights, versions, stored
+
+
+def stored_predictions(fixtures, store=None):
+    """Prédictions déjà enregistrées des matchs, dans leur ordre, sans recalcul (absentes omises)."""
+    _, _, stored = _stored_many(fixtures, store or get_prediction_store())
+    return [record for record in stored if record is not None]
+
+
+@timed("read_through_many")
+def read_through_many(fixtures, collect_many, store=None, now=None):
+    """
+    Prédictions de plusieurs matchs, dans leur ordre : une lecture groupée par
+    version du modèle, puis recalcul en bloc des absentes ou périmées
+    (`collect_many(matchs)` retourne la matrice (n x 10) de leurs facteurs)
+    et un seul upsert (analyses IA conservées). Chaque ligue reçoit ses
+    pondérations calibrées.
+    """
+    store = store or get_prediction_store()
+    league_weights, versions, stored = _stored_many(fixtures, store)
+    records = [record if is_fresh(record, now) else None for record in stored]
+
+    missing = [i for i, record in enumerate(records) if record is None]
+    if missing:
+        factors = np.asarray(collect_many([fixtures[i] for i in missing]), dtype=float)
+        for row, i in zip(factors, missing):
+            weights = league_weights[fixtures[i].get('league', {}).get('id')]
+            probs = predict_proba(row, weights)[0]
+            analysis = stored[i].get("analysis") if stored[i] else None
+            records[i] = prediction_record(fixtures[i], row, probs, versions[i], analysis, now=now)
+        _save(store, [records[i] for i in missing])
+    return records
@@ -0,0 +1,203 @@
+# predictor/prefetch.py
+"""
+Préchargement en tâche de fond des matchs à venir.
+
+Un processus dédié parcourt les prochains jours des ligues mises en avant
+(top_leagues_names et european_top_competitions) et remplit, avec la priorité
+LOW, les mêmes caches que ceux lus par l'application : liste des matchs,
+forme, H2H, blessures, cotes, géocodage et météo. Chaque cycle complet
+commence par la synchronisation incrémentale de l'historique des matchs
+terminés (predictor.history), qui sert ensuite la forme et les H2H sans
+appel. Les cotes, volatiles, sont rechargées (sans relire le cache) sur un
+cycle plus court. Chaque cycle est plafonné par un budget d'appels
+API-Football ; le client abandonne de lui-même les appels LOW quand le
+quota journalier devient bas.
+
+Usage :
+    python -m predictor.prefetch --days 3 --budget 500
+"""
+
+import argparse
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from .catalogue import get_catalogue
+from .client import LOW, get_client
+from .factors import submit_match_factors
+from .fixtures import get_fixture_board
+from .history import get_history
+from .leagues import european_top_competitions, top_leagues_names
+from .metrics import start_metrics_server
+from .odds import get_odds_book, odds_day
+
+logger = logging.getLogger(__name__)
+
+WAVE_SIZE = 4  # matchs préchargés simultanément (7 appels chacun au plus)
+
+
+class BudgetExhausted(Exception):
+    """Le budget d'appels du cycle est atteint."""
+
+
+class CallBudget:
+    """Plafond d'appels API-Football pour un cycle, mesuré sur le compteur du client."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.start = get_client("api-football").calls
+
+    @property
+    def used(self):
+        return get_client("api-football").calls - self.start
+
+    def check(self):
+        if self.limit is not None and self.used >= self.limit:
+            raise BudgetExhausted(f"{self.used} appel(s) sur {self.limit}")
+
+
+class PrefetchScheduler:
+    def __init__(self, days_ahead=3, budget=500, full_interval=3600, odds_interval=300,
+                 odds_horizon=timedelta(hours=48), max_workers=8):
+        self.days_ahead = days_ahead
+        self.budget = budget
+        self.full_interval = full_interval
+        self.odds_interval = odds_interval
+        self.odds_horizon = odds_horizon
+        self.max_workers = max_workers
+        self.fixtures = []
+
+    def target_leagues(self):
+        """Identifiants des ligues à précharger : D1 des pays phares et coupes d'Europe."""
+        ids = set(european_top_competitions.values())
+        catalogue = get_catalogue()
+        if catalogue is not None:
+            for country, names in top_leagues_names.items():
+                for name in names:
+                    league = catalogue.find(country, name)
+                    if league:
+                        ids.add(league.id)
+        return sorted(ids)
+
+    def sync_history(self, budget):
+        """Ajoute à l'historique local les jours terminés depuis la dernière synchronisation."""
+        budget.check()
+        history = get_history()
+        written = history.sync(priority=LOW)
+        logger.info("Historique : %d match(s) écrit(s), synchronisé jusqu'au %s.",
+                    written, history.synced_until())
+        return written
+
+    def upcoming_fixtures(self, budget, today=None):
+        """Matchs des prochains jours des ligues ciblées, depuis l'index par date partagé avec la page."""
+        today = today or date.today()
+        leagues = self.target_leagues()
+        fixtures = []
+        for offset in range(self.days_ahead + 1):
+            budget.check()
+            day_fixtures = get_fixture_board().day(today + timedelta(days=offset), LOW)
+            if day_fixtures is not None:
+                for league_id in leagues:
+                    fixtures.extend(day_fixtures.league(league_id))
+        return fixtures
+
+    def warm(self, fixtures, budget):
+        """Précharge tous les facteurs de chaque match ; retourne le nombre de matchs traités."""
+        warmed = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="prefetch") as pool:
+            # Quelques matchs à la fois, pour vérifier le budget entre deux vagues
+            for start in range(0, len(fixtures), WAVE_SIZE):
+                budget.check()
+                pending = []
+                for fix in fixtures[start:start + WAVE_SIZE]:
+                    venue = fix['fixture'].get('venue') or {}
+                    pending.append(submit_match_factors(
+                        pool,
+                        fix['league']['id'],
+                        fix['teams']['home']['id'],
+                        fix['teams']['away']['id'],
+                        fix['fixture']['id'],
+                        venue.get('city'),
+                        fix['fixture'].get('timestamp'),
+                        LOW,
+                        venue.get('id'),
+                    ))
+                for result in pending:
+                    result()
+                warmed += len(pending)
+        return warmed
+
+    def refresh_odds(self, fixtures, budget, now=None):
+        """Rafraîchit les flux de cotes des matchs qui commencent dans l'horizon ; retourne leur nombre."""
+        now = now or time.time()
+        horizon = now + self.odds_horizon.total_seconds()
+        # Un flux /odds paginé par (jour, ligue), pas un appel par match
+        feeds = {
+            (odds_day(fix['fixture']['timestamp']), fix['league']['id'])
+            for fix in fixtures
+            if now <= (fix['fixture'].get('timestamp') or 0) <= horizon
+        }
+        for day, league_id in sorted(feeds):
+            budget.check()
+            get_odds_book().load(day, league_id, LOW, refresh=True)
+        return len(feeds)
+
+    def run_full_cycle(self):
+        budget = CallBudget(self.budget)
+        try:
+            self.sync_history(budget)
+            self.fixtures = self.upcoming_fixtures(budget)
+            warmed = self.warm(self.fixtures, budget)
+            logger.info("Préchargement : %d match(s), %d appel(s).", warmed, budget.used)
+        except BudgetExhausted as e:
+            logger.warning("Préchargement interrompu : budget atteint (%s).", e)
+
+    def run_odds_cycle(self):
+        budget = CallBudget(self.budget)
+        try:
+            refreshed = self.refresh_odds(self.fixtures, budget)
+            logger.info("Cotes rafraîchies : %d flux, %d appel(s).", refreshed, budget.used)
+        except BudgetExhausted as e:
+            logger.warning("Rafraîchissement des cotes interrompu : budget atteint (%s).", e)
+
+    def run_forever(self, stop=None):
+        """Boucle principale : cycle complet toutes les full_interval s, cotes toutes les odds_interval s."""
+        stop = stop or threading.Event()
+        next_full = next_odds = 0.0
+        while not stop.is_set():
+            now = time.monotonic()
+            if now >= next_full:
+                self.run_full_cycle()
+                next_full = time.monotonic() + self.full_interval
+                next_odds = time.monotonic() + self.odds_interval
+            elif now >= next_odds:
+                self.run_odds_cycle()
+                next_odds = time.monotonic() + self.odds_interval
+            stop.wait(max(0.0, min(next_full, next_odds) - time.monotonic()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Préchargement des matchs à venir.")
+    parser.add_argument("--days", type=int, default=3, help="Nombre de jours à venir")
+    parser.add_argument("--budget", type=int, default=500, help="Appels API-Football max par cycle")
+    parser.add_argument("--full-interval", type=int, default=3600, help="Période du cycle complet (s)")
+    parser.add_argument("--odds-interval", type=int, default=300, help="Période de rafraîchissement des cotes (s)")
+    parser.add_argument("--once", action="store_true", help="Un seul cycle complet, puis arrêt")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    scheduler = PrefetchScheduler(
+        days_ahead=args.days, budget=args.budget,
+        full_interval=args.full_interval, odds_interval=args.odds_interval,
+    )
+    if args.once:
+        scheduler.run_full_cycle()
+    else:
+        start_metrics_server()
+        scheduler.run_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,535 @@
+# predictor/service.py
+"""
+API JSON des prédictions, à côté de l'interface Streamlit (asyncio, bibliothèque standard).
+
+    GET  /predictions?date=AAAA-MM-JJ[&league=ID]   prédictions des matchs d'une date
+    GET  /predictions/{fixture_id}                  prédiction d'un match
+    POST /auth/token   {"email": ..., "password": ...}   jeton de droits
+    GET  /health
+
+Quota API-Football : seules les dates proches (aujourd'hui ± DAY_WINDOW) et
+les matchs de l'index par date sont servis. Une requête par ligue calcule au
+plus MAX_COMPUTED matchs, en priorité LOW ; une journée entière ne sert que
+les prédictions déjà enregistrées. /auth/token est limité par adresse
+(TOKEN_RATE par TOKEN_PERIOD secondes).
+
+Les métriques (http_requests_total, http_request_seconds...) ne sont pas
+exposées sur ce port public : elles restent sur l'exporteur d'administration
+METRICS_PORT (predictor.metrics.start_metrics_server).
+
+Les prédictions viennent du même chemin que la page : index des matchs par
+date (predictor.fixtures), stockage des prédictions (read_through), facteurs
+et pondérations calibrées par ligue. Le calcul, bloquant, tourne sur un pool
+de threads ; la boucle asyncio ne fait que le protocole.
+
+Accès : en-tête `Authorization: Bearer <jeton>` (predictor.entitlement).
+Le jeton est vérifié localement ; un jeton expiré mais authentique est
+réémis après vérification de l'abonnement Supabase, une fois par jeton, et
+le nouveau jeton est renvoyé dans l'en-tête X-Entitlement-Token.
+
+Chaque réponse est mise en mémoire quelques secondes (corps JSON, version
+gzip et ETag calculés une fois) ; les requêtes identiques simultanées
+partagent le même calcul. If-None-Match donne 304, Accept-Encoding: gzip
+la version compressée.
+
+Usage :
+    python -m predictor.service serve --port 8080
+    python -m predictor.service token --user 42 --days 1   # jeton d'essai (tests locaux)
+    UPSTREAM_STUB_URL=http://127.0.0.1:8765 python -m predictor.service serve
+"""
+
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from .auth import AuthError, authenticate_user
+from .batch import gather_factors
+from .client import LOW
+from .entitlement import (
+    entitlement_from_login, issue_entitlement, refresh_entitlement, require_signing_secret, verify_entitlement,
+)
+from .factors import collect_match_factors
+from .fixtures import get_fixture_board
+from .metrics import registry, start_metrics_server
+from .predictions import read_through, read_through_many, stored_predictions
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8080
+WORKERS = 32
+RESPONSE_TTL = 30            # secondes de mémoire d'une réponse
+MAX_RESPONSES = 2048
+MAX_TOKENS = 10000
+REFRESH_FAILURE_TTL = 60     # un jeton refusé n'est pas revérifié avant ce délai
+GZIP_MIN_BYTES = 1024
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = 16 * 1024
+DAY_WINDOW = 6               # jours servis de part et d'autre d'aujourd'hui
+MAX_COMPUTED = 40            # matchs calculés au plus par requête (le reste : stockage seul)
+TOKEN_RATE = 10              # POST /auth/token par adresse et par TOKEN_PERIOD
+TOKEN_PERIOD = 60
+
+JSON = "application/json; charset=utf-8"
+TOKEN_HEADER = "X-Entitlement-Token"
+
+Entry = namedtuple("Entry", ["body", "gzipped", "etag", "expires"])
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+def _json(payload):
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def accepts_gzip(value):
+    """Vrai si l'en-tête Accept-Encoding accepte gzip (q > 0)."""
+    for part in (value or "").split(","):
+        name, _, params = part.partition(";")
+        if name.strip().lower() not in ("gzip", "*"):
+            continue
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                return float(quality[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+def etag_matches(value, etag):
+    """If-None-Match correspond-il à l'ETag (comparaison faible) ?"""
+    if not value:
+        return False
+    strip = lambda tag: tag.strip().removeprefix("W/")
+    return value.strip() == "*" or strip(etag) in (strip(tag) for tag in value.split(","))
+
+
+# ----------------------------------------------------------------- calculs
+def check_day(day, today=None):
+    """Refuse (400) une date hors de la fenêtre servie : aujourd'hui ± DAY_WINDOW jours."""
+    today = today or date.today()
+    if abs((day - today).days) > DAY_WINDOW:
+        raise HTTPError(400, f"Date hors de la fenêtre servie (aujourd'hui ± {DAY_WINDOW} jours).")
+
+
+def day_predictions(day, league_id=None):
+    """
+    Prédictions des matchs d'une date. Pour une ligue, les MAX_COMPUTED
+    premiers matchs absents ou périmés du stockage sont calculés (priorité
+    LOW) ; toutes ligues confondues, et au-delà du plafond, seules les
+    prédictions déjà enregistrées (page, lot, préchargement) sont servies.
+    """
+    day_fixtures = get_fixture_board().day(day)
+    if day_fixtures is None:
+        raise HTTPError(502, "Impossible de récupérer les matchs.")
+    fixtures = list(day_fixtures.league(league_id) if league_id else day_fixtures.by_id.values())
+    computed = fixtures[:MAX_COMPUTED] if league_id else []
+    records = read_through_many(computed, lambda missing: gather_factors(missing, day, priority=LOW))
+    records += stored_predictions(fixtures[len(computed):])
+    return {"date": day.isoformat(), "league": league_id, "count": len(records), "predictions": records}
+
+
+def find_fixture(fixture_id, today=None):
+    """Match de l'index par date (hier à aujourd'hui + DAY_WINDOW), sans appel par identifiant ; None sinon."""
+    today = today or date.today()
+    board = get_fixture_board()
+    for offset in range(-1, DAY_WINDOW + 1):
+        day_fixtures = board.day(today + timedelta(days=offset))
+        fixture = day_fixtures.fixture(fixture_id) if day_fixtures is not None else None
+        if fixture is not None:
+            return fixture
+    return None
+
+
+def fixture_prediction(fixture_id):
+    """Prédiction d'un match, identifié par son fixture.id ; seuls les matchs de l'index par date sont servis."""
+    fixture = find_fixture(fixture_id)
+    if fixture is None:
+        raise HTTPError(404, "Match inconnu.")
+    venue = fixture['fixture'].get('venue') or {}
+    return read_through(fixture, lambda: collect_match_factors(
+        fixture['league']['id'], fixture['teams']['home']['id'], fixture['teams']['away']['id'],
+        fixture_id, venue.get('city'), fixture['fixture'].get('timestamp'), venue_id=venue.get('id'),
+    ))
+
+
+# ------------------------------------------------------------------ droits
+class EntitlementCache:
+    """
+    Jetons déjà vérifiés (jusqu'à leur expiration) et jetons expirés déjà
+    réémis : Supabase n'est interrogé qu'une fois par jeton expiré.
+    Utilisé depuis la boucle asyncio uniquement.
+    """
+
+    def __init__(self, executor):
+        self.executor = executor
+        self._verified = {}   # jeton -> droits
+        self._refreshed = {}  # jeton expiré -> (valable jusqu'à, nouveau jeton, droits)
+        self._inflight = {}
+
+    def _prune(self, now):
+        for cache, expiry in ((self._verified, lambda v: v["exp"]), (self._refreshed, lambda v: v[0])):
+            if len(cache) > MAX_TOKENS:
+                for token in [t for t, v in cache.items() if expiry(v) <= now]:
+                    del cache[token]
+                if len(cache) > MAX_TOKENS:
+                    cache.clear()
+
+    async def check(self, token):
+        """(jeton à utiliser, droits), ou (None, None) si l'accès a expiré."""
+        now = time.time()
+        claims = self._verified.get(token)
+        if claims is not None and claims["exp"] > now:
+            return token, claims
+        claims = verify_entitlement(token)
+        if claims is not None:
+            self._verified[token] = claims
+            self._prune(now)
+            return token, claims
+        entry = self._refreshed.get(token)
+        if entry is not None and entry[0] > now:
+            return entry[1], entry[2]
+        task = self._inflight.get(token)
+        if task is None:
+            task = self._inflight[token] = asyncio.get_running_loop().create_task(self._refresh(token))
+        return await asyncio.shield(task)
+
+    async def _refresh(self, token):
+        try:
+            loop = asyncio.get_running_loop()
+            new_token = await loop.run_in_executor(self.executor, refresh_entitlement, token)
+            claims = verify_entitlement(new_token)
+            now = time.time()
+            if claims is None:
+                self._refreshed[token] = (now + REFRESH_FAILURE_TTL, None, None)
+                return None, None
+            self._refreshed[token] = (claims["exp"], new_token, claims)
+            self._verified[new_token] = claims
+            self._prune(now)
+            return new_token, claims
+        finally:
+            self._inflight.pop(token, None)
+
+
+class RateLimiter:
+    """
+    Au plus `rate` requêtes par `period` secondes et par clé (adresse du
+    client), en fenêtre glissante. Utilisé depuis la boucle asyncio uniquement.
+    """
+
+    def __init__(self, rate=TOKEN_RATE, period=TOKEN_PERIOD, max_keys=MAX_TOKENS):
+        self.rate = rate
+        self.period = period
+        self.max_keys = max_keys
+        self._hits = {}  # clé -> horodatages (monotonic) des requêtes admises
+
+    def _prune(self, now):
+        for key in [k for k, hits in self._hits.items() if not hits or hits[-1] <= now - self.period]:
+            del self._hits[key]
+        if len(self._hits) >= self.max_keys:
+            self._hits.clear()
+
+    def retry_after(self, key, now=None):
+        """0 si la requête est admise (et comptée), sinon le délai d'attente en secondes."""
+        now = time.monotonic() if now is None else now
+        hits = self._hits.get(key)
+        if hits is None:
+            if len(self._hits) >= self.max_keys:
+                self._prune(now)
+            hits = self._hits[key] = deque()
+        while hits and hits[0] <= now - self.period:
+            hits.popleft()
+        if len(hits) >= self.rate:
+            return max(1, math.ceil(hits[0] + self.period - now))
+        hits.append(now)
+        return 0
+
+
+# ----------------------------------------------------------------- service
+class PredictionService:
+    """Serveur HTTP/1.1 (keep-alive) ; `start()` le lance dans un thread de fond (tests, banc)."""
+
+    def __init__(self, workers=WORKERS, response_ttl=RESPONSE_TTL):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="service")
+        self.entitlements = EntitlementCache(self.executor)
+        self.token_limits = RateLimiter()
+        self.response_ttl = response_ttl
+        self._responses = {}
+        self._inflight = {}
+        self._loop = None
+        self._server = None
+        self._thread = None
+
+    # ------------------------------------------------------------ réponses
+    def _entry(self, payload):
+        body = _json(payload)
+        return Entry(
+            body,
+            gzip.compress(body, compresslevel=6) if len(body) >= GZIP_MIN_BYTES else None,
+            'W/"' + hashlib.sha1(body).hexdigest() + '"',
+            time.monotonic() + self.response_ttl,
+        )
+
+    async def _cached(self, key, compute, *args):
+        """Réponse mémorisée, ou calculée une fois pour toutes les requêtes simultanées."""
+        entry = self._responses.get(key)
+        if entry is not None and entry.expires > time.monotonic():
+            return entry
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.get_running_loop().create_task(self._build(key, compute, *args))
+        return await asyncio.shield(task)
+
+    async def _build(self, key, compute, *args):
+        try:
+            payload = await asyncio.get_running_loop().run_in_executor(self.executor, compute, *args)
+            entry = self._entry(payload)
+            if len(self._responses) >= MAX_RESPONSES:
+                now = time.monotonic()
+                for stale in [k for k, e in self._responses.items() if e.expires <= now]:
+                    del self._responses[stale]
+                if len(self._responses) >= MAX_RESPONSES:
+                    self._responses.clear()
+            self._responses[key] = entry
+            return entry
+        finally:
+            self._inflight.pop(key, None)
+
+    def _conditional(self, entry, headers, extra):
+        out = dict(extra, **{
+            "Content-Type": JSON,
+            "ETag": entry.etag,
+            "Cache-Control": f"private, max-age={self.response_ttl}",
+            "Vary": "Accept-Encoding, Authorization",
+        })
+        if etag_matches(headers.get("if-none-match"), entry.etag):
+            return 304, out, b""
+        if entry.gzipped is not None and accepts_gzip(headers.get("accept-encoding")):
+            out["Content-Encoding"] = "gzip"
+            return 200, out, entry.gzipped
+        return 200, out, entry.body
+
+    # -------------------------------------------------------------- routes
+    async def _authorize(self, headers):
+        scheme, _, token = (headers.get("authorization") or "").partition(" ")
+        if scheme.lower() != "bearer" or not token.strip():
+            raise HTTPError(401, "Jeton d'accès manquant.", {"WWW-Authenticate": "Bearer"})
+        token = token.strip()
+        new_token, claims = await self.entitlements.check(token)
+        if claims is None:
+            raise HTTPError(403, "Période d'essai expirée et aucun abonnement actif.")
+        return {TOKEN_HEADER: new_token} if new_token != token else {}
+
+    async def _token(self, body):
+        try:
+            credentials = json.loads(body or b"{}")
+            email, password = credentials["email"], credentials["password"]
+        except (ValueError, KeyError, TypeError):
+            raise HTTPError(400, "Corps attendu : {\"email\": ..., \"password\": ...}.")
+
+        def login():
+            try:
+                return entitlement_from_login(authenticate_user(email, password))
+            except AuthError as e:
+                raise HTTPError(401, str(e))
+
+        token = await asyncio.get_running_loop().run_in_executor(self.executor, login)
+        claims = verify_entitlement(token)
+        if claims is None:
+            raise HTTPError(403, "Période d'essai expirée et aucun abonnement actif.")
+        return 200, {"Content-Type": JSON, "Cache-Control": "no-store"}, _json({
+            "token": token, "kind": claims["kind"], "expires_at": claims["exp"], "ends": claims["ends"],
+        })
+
+    async def _predictions(self, path, query, headers):
+        extra = await self._authorize(headers)
+        if path == "/predictions":
+            try:
+                day = datetime.strptime(query["date"][0], "%Y-%m-%d").date()
+                league_id = int(query["league"][0]) if query.get("league") else None
+            except (KeyError, ValueError):
+                raise HTTPError(400, "Paramètres attendus : date=AAAA-MM-JJ, league=identifiant (optionnel).")
+            check_day(day)
+            entry = await self._cached(("day", day, league_id), day_predictions, day, league_id)
+        else:
+            try:
+                fixture_id = int(path.rsplit("/", 1)[1])
+            except ValueError:
+                raise HTTPError(404, "Match inconnu.")
+            entry = await self._cached(("fixture", fixture_id), fixture_prediction, fixture_id)
+        return self._conditional(entry, headers, extra)
+
+    async def _dispatch(self, method, path, query, headers, body, client):
+        if path == "/health":
+            return 200, {"Content-Type": JSON}, _json({"status": "ok"})
+        if path == "/auth/token":
+            if method != "POST":
+                raise HTTPError(405, "Méthode non autorisée.", {"Allow": "POST"})
+            wait = self.token_limits.retry_after(client)
+            if wait:
+                raise HTTPError(429, "Trop de demandes de jeton, réessayez plus tard.", {"Retry-After": str(wait)})
+            return await self._token(body)
+        if path == "/predictions" or path.startswith("/predictions/"):
+            if method not in ("GET", "HEAD"):
+                raise HTTPError(405, "Méthode non autorisée.", {"Allow": "GET, HEAD"})
+            return await self._predictions(path, query, headers)
+        raise HTTPError(404, "Ressource inconnue.")
+
+    async def handle(self, method, target, headers, body=b"", client=None):
+        """(statut, en-têtes, corps) d'une requête ; `headers` en minuscules, `client` : adresse IP."""
+        start = time.perf_counter()
+        parts = urlsplit(target)
+        path = parts.path.rstrip("/") or "/"
+        route = "/predictions/{fixture_id}" if path.startswith("/predictions/") else path
+        try:
+            status, out, payload = await self._dispatch(method, path, parse_qs(parts.query), headers, body, client)
+        except HTTPError as e:
+            status, out, payload = e.status, dict(e.headers, **{"Content-Type": JSON}), _json({"error": e.message})
+        except Exception:
+            logger.exception("Erreur du service sur %s", target)
+            status, out, payload = 500, {"Content-Type": JSON}, _json({"error": "Erreur interne."})
+        if status == 404 and route not in ("/predictions", "/predictions/{fixture_id}"):
+            route = "other"
+        registry.count("http_requests_total", route=route, status=status)
+        registry.observe("http_request_seconds", time.perf_counter() - start, route=route)
+        return status, out, payload
+
+    # ----------------------------------------------------------- protocole
+    @staticmethod
+    def _response(status, headers, body, head_only, keep_alive):
+        lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        lines.append(f"Content-Length: {len(body)}")
+        lines.append("Connection: keep-alive" if keep_alive else "Connection: close")
+        head = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+        return head if head_only or status == 304 else head + body
+
+    async def _connection(self, reader, writer):
+        peer = writer.get_extra_info("peername")
+        client = peer[0] if peer else None
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    writer.write(self._response(400, {}, b"", False, False))
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    name, sep, value = line.partition(":")
+                    if sep:
+                        headers[name.strip().lower()] = value.strip()
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    writer.write(self._response(400, {}, b"", False, False))
+                    break
+                if length > MAX_BODY_BYTES:
+                    writer.write(self._response(413, {}, b"", False, False))
+                    break
+                body = await reader.readexactly(length) if length else b""
+                status, out, payload = await self.handle(method, target, headers, body, client)
+                writer.write(self._response(status, out, payload, method == "HEAD", keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass  # client parti, ou arrêt du service
+        finally:
+            writer.close()
+
+    # ------------------------------------------------------ cycle de vie
+    async def serve(self, host="0.0.0.0", port=DEFAULT_PORT, ready=None):
+        self._loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_server(self._connection, host, port, limit=MAX_HEADER_BYTES)
+        if ready is not None:
+            ready.set()
+        async with self._server:
+            try:
+                await self._server.serve_forever()
+            except asyncio.CancelledError:
+                pass
+
+    @property
+    def url(self):
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    def start(self, host="127.0.0.1", port=0):
+        """Démarre le service dans un thread de fond ; retourne self (voir `url`)."""
+        ready = threading.Event()
+        self._thread = threading.Thread(
+            target=asyncio.run, args=(self.serve(host, port, ready),), name="service", daemon=True
+        )
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop(self):
+        if self._loop is not None and self._server is not None:
+            self._loop.call_soon_threadsafe(self._server.close)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.executor.shutdown(wait=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="API JSON des prédictions.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve", help="Démarre le service")
+    serve.add_argument("--host", default="0.0.0.0")
+    serve.add_argument("--port", type=int, default=int(os.getenv("PORT") or DEFAULT_PORT))
+    serve.add_argument("--workers", type=int, default=WORKERS, help="Threads de calcul")
+    serve.add_argument("--response-ttl", type=int, default=RESPONSE_TTL, help="Mémoire des réponses (secondes)")
+    token = sub.add_parser("token", help="Signe un jeton d'essai (tests locaux ; même ENTITLEMENT_SECRET)")
+    token.add_argument("--user", required=True, help="Identifiant de l'utilisateur")
+    token.add_argument("--days", type=float, default=1.0, help="Durée de l'essai (jours)")
+    args = parser.parse_args(argv)
+
+    try:
+        require_signing_secret()
+    except RuntimeError as e:
+        parser.exit(2, f"{e}\n")
+    if args.command == "token":
+        print(issue_entitlement(args.user, trial_end=time.time() + args.days * 86400))
+        return
+    logging.basicConfig(level=logging.INFO)
+    start_metrics_server()
+    service = PredictionService(args.workers, args.response_ttl)
+    logger.info("Service des prédictions sur %s:%d", args.host, args.port)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# predictor/shared.py
+"""
+Partage entre threads et entre processus d'un même hôte.
+
+Plusieurs processus (workers Streamlit, préchargement) utilisent les mêmes
+fichiers du répertoire .cache :
+- connect() ouvre une base SQLite en mode WAL (lectures concurrentes
+  pendant une écriture, attente plutôt qu'erreur si la base est occupée) ;
+- SingleFlight garantit un seul calcul en cours par clé : les threads du
+  processus attendent le résultat du premier, et, avec un fichier de
+  verrous, les autres processus attendent que le premier ait rempli le
+  cache avant de le relire (`check`).
+
+Les verrous inter-processus sont des verrous d'octets (fcntl.lockf) sur un
+seul fichier, un octet par empreinte de clé ; le système les libère si le
+processus meurt, et ils sont abandonnés au-delà de `timeout`. Sans fcntl
+(Windows), seul le regroupement entre threads s'applique.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+BUSY_TIMEOUT = 30.0
+LOCK_TIMEOUT = 60.0
+LOCK_POLL = 0.05
+LOCK_SLOTS = 1 << 20
+
+
+def connect(path, timeout=BUSY_TIMEOUT):
+    """Connexion SQLite partageable entre threads et processus (WAL, autocommit)."""
+    conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class SingleFlight:
+    """
+    Un seul calcul en cours par clé. Avec `lock_path`, le calcul est aussi
+    exclusif entre les processus qui partagent ce fichier.
+    """
+
+    def __init__(self, lock_path=None, timeout=LOCK_TIMEOUT):
+        self.lock_path = lock_path if fcntl is not None else None
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._locks = {}
+        self._file = None
+
+    def do(self, key, fn, check=None):
+        """
+        Résultat de fn() pour `key`, partagé par tous les appelants simultanés.
+        `check()` est appelé d'abord par celui qui calcule, verrou inter-processus
+        acquis : s'il retourne autre chose que None (cache rempli entre-temps,
+        éventuellement par un autre processus), fn() n'est pas appelé.
+        """
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+        if not owner:
+            return future.result()
+        try:
+            with self._process_lock(key):
+                value = check() if check is not None else None
+                if value is None:
+                    value = fn()
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    @contextmanager
+    def lock(self, key):
+        """Section exclusive par clé (threads et processus), pour un calcul non partageable (flux)."""
+        with self._lock:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0], self._process_lock(key):
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    self._locks.pop(key, None)
+
+    # ---------------------------------------------------------- inter-processus
+    def _lock_file(self):
+        if self._file is None:
+            with self._lock:
+                if self._file is None:
+                    self._file = open(self.lock_path, "a+b")
+        return self._file
+
+    @contextmanager
+    def _process_lock(self, key):
+        if self.lock_path is None:
+            yield
+            return
+        fd = self._lock_file().fileno()
+        slot = int(hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:8], 16) % LOCK_SLOTS
+        deadline = time.monotonic() + self.timeout
+        acquired = False
+        while True:
+            try:
+                fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, slot)
+                acquired = True
+                break
+            except OSError:
+                if time.monotonic() >= deadline:
+                    break  # détenteur bloqué : on calcule sans attendre davantage
+                time.sleep(LOCK_POLL)
+        try:
+            yield
+        finally:
+            if acquired:
+                fcntl.lockf(fd, fcntl.LOCK_UN, 1, slot)
@@ -0,0 +1,292 @@
+# predictor/stub.py
+"""
+Enregistrement / rejeu des réponses des fournisseurs : serveur bouchon local.
+
+Quand UPSTREAM_STUB_URL est défini, chaque appel sortant (API-Football,
+meteoblue, PositionStack, OpenAI, Supabase) est adressé à
+<UPSTREAM_STUB_URL>/<hôte>/<chemin> (voir predictor.client.stub_url).
+Le serveur :
+- en mode `record`, relaie l'appel vers https://<hôte>/<chemin> et enregistre
+  la réponse dans une cassette (un fichier JSON par requête) ;
+- en mode `replay`, sert les cassettes sans réseau, avec une latence et un
+  taux d'erreurs (500 / 429) configurables ; une requête non enregistrée
+  reçoit 404.
+
+Les paramètres secrets (clés d'API) sont exclus de la clé de cassette et ne
+sont jamais écrits ; les en-têtes de requête ne sont pas enregistrés.
+GET /__stub/stats donne le nombre de requêtes servies par hôte et chemin.
+
+Usage :
+    python -m predictor.stub record --cassettes bench/cassettes
+    python -m predictor.stub replay --latency 0.05 --jitter 0.02 --error-rate 0.05
+    UPSTREAM_STUB_URL=http://127.0.0.1:8765 streamlit run football.py
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+
+DEFAULT_CASSETTE_DIR = os.getenv("STUB_CASSETTE_DIR", os.path.join("bench", "cassettes"))
+DEFAULT_PORT = 8765
+STATS_PATH = "/__stub/stats"
+RESET_PATH = "/__stub/reset"
+
+RECORD = "record"
+REPLAY = "replay"
+
+# Paramètres de requête jamais enregistrés ni pris en compte dans la clé
+SECRET_PARAMS = {"access_key", "apikey", "api_key", "key", "token"}
+# En-têtes de réponse non rejoués (recalculés par le serveur)
+DROPPED_HEADERS = {"connection", "content-encoding", "content-length", "date", "keep-alive",
+                   "server", "set-cookie", "transfer-encoding"}
+# En-têtes de requête non relayés vers le fournisseur
+HOP_HEADERS = {"connection", "host", "keep-alive", "accept-encoding", "content-length"}
+
+
+def split_target(path):
+    """'/hôte/chemin?requête' -> (hôte, '/chemin', [(clé, valeur), ...])."""
+    parts = urlsplit(path)
+    host, _, rest = parts.path.lstrip("/").partition("/")
+    return host, "/" + rest, parse_qsl(parts.query, keep_blank_values=True)
+
+
+def cassette_key(method, host, path, query, body=b""):
+    """Empreinte d'une requête (sans paramètres secrets, paramètres triés)."""
+    public = sorted((k, v) for k, v in query if k not in SECRET_PARAMS)
+    raw = json.dumps([method, host, path, public]).encode("utf-8") + b"\n" + (body or b"")
+    return hashlib.sha1(raw).hexdigest()
+
+
+class CassetteStore:
+    """Réponses enregistrées : <racine>/<hôte>/<empreinte>.json."""
+
+    def __init__(self, root=DEFAULT_CASSETTE_DIR):
+        self.root = root
+
+    def _path(self, host, key):
+        return os.path.join(self.root, host, f"{key}.json")
+
+    def get(self, host, key):
+        try:
+            with open(self._path(host, key), encoding="utf-8") as f:
+                record = json.load(f)
+        except FileNotFoundError:
+            return None
+        body = record.get("body")
+        record["body"] = body.encode("utf-8") if body is not None else base64.b64decode(record["body_b64"])
+        return record
+
+    def put(self, host, key, record):
+        path = self._path(host, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        record = dict(record)
+        body = record.pop("body")
+        try:
+            record["body"] = body.decode("utf-8")
+        except UnicodeDecodeError:
+            record["body_b64"] = base64.b64encode(body).decode("ascii")
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(record, f, indent=1, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def __len__(self):
+        return sum(len(files) for _, _, files in os.walk(self.root))
+
+
+class StubConfig:
+    """Latence (secondes, ± jitter), par défaut ou par hôte, et injection d'erreurs."""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, error_statuses=(500, 429),
+                 host_latency=None, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self.host_latency = dict(host_latency or {})
+        self.random = random.Random(seed)
+
+    def delay(self, host):
+        base = self.host_latency.get(host, self.latency)
+        return max(0.0, base + self.random.uniform(-self.jitter, self.jitter))
+
+    def injected_error(self):
+        if self.error_rate and self.random.random() < self.error_rate:
+            return self.random.choice(self.error_statuses)
+        return None
+
+
+class StubServer:
+    """Serveur bouchon (thread de fond) ; `url` est la valeur de UPSTREAM_STUB_URL."""
+
+    def __init__(self, cassettes=None, mode=REPLAY, config=None, host="127.0.0.1", port=0):
+        self.cassettes = cassettes or CassetteStore()
+        self.mode = mode
+        self.config = config or StubConfig()
+        self.requests = Counter()   # (hôte, chemin) -> requêtes servies
+        self.outcomes = Counter()   # hit / miss / error / recorded
+        self._stats_lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def stats(self):
+        with self._stats_lock:
+            by_host = Counter()
+            for (host, _), n in self.requests.items():
+                by_host[host] += n
+            return {
+                "requests": {f"{h}{p}": n for (h, p), n in self.requests.items()},
+                "by_host": dict(by_host),
+                "outcomes": dict(self.outcomes),
+                "total": sum(self.requests.values()),
+            }
+
+    def reset(self):
+        with self._stats_lock:
+            self.requests.clear()
+            self.outcomes.clear()
+
+    def _count(self, host, path, outcome):
+        with self._stats_lock:
+            self.requests[(host, path)] += 1
+            self.outcomes[outcome] += 1
+
+    # ----------------------------------------------------------- traitement
+    def respond(self, method, target, headers, body):
+        """(statut, en-têtes, corps) pour une requête reçue."""
+        host, path, query = split_target(target)
+        key = cassette_key(method, host, path, query, body)
+        if self.mode == RECORD:
+            record = self._forward(method, host, path, query, headers, body)
+            if record["status"] < 500:
+                self.cassettes.put(host, key, dict(record, method=method, path=path, query=[
+                    (k, v) for k, v in query if k not in SECRET_PARAMS
+                ]))
+            self._count(host, path, "recorded")
+            return record["status"], record["headers"], record["body"]
+
+        time.sleep(self.config.delay(host))
+        status = self.config.injected_error()
+        if status is not None:
+            self._count(host, path, "error")
+            extra = {"Retry-After": "1"} if status == 429 else {}
+            return status, dict(extra, **{"Content-Type": "application/json"}), b'{"errors": "injected"}'
+        record = self.cassettes.get(host, key)
+        if record is None:
+            self._count(host, path, "miss")
+            return 404, {"Content-Type": "application/json"}, b'{"errors": "not recorded"}'
+        self._count(host, path, "hit")
+        return record["status"], record["headers"], record["body"]
+
+    @staticmethod
+    def _forward(method, host, path, query, headers, body):
+        url = f"https://{host}{path}"
+        if query:
+            url += "?" + urlencode(query)
+        forwarded = {k: v for k, v in headers.items() if k.lower() not in HOP_HEADERS}
+        resp = requests.request(method, url, headers=forwarded, data=body or None, timeout=(3.05, 60))
+        kept = {k: v for k, v in resp.headers.items() if k.lower() not in DROPPED_HEADERS}
+        return {"status": resp.status_code, "headers": kept, "body": resp.content}
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, headers, body):
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _handle(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                if self.path.startswith(STATS_PATH):
+                    payload = json.dumps(stub.stats()).encode("utf-8")
+                    return self._send(200, {"Content-Type": "application/json"}, payload)
+                if self.path.startswith(RESET_PATH):
+                    stub.reset()
+                    return self._send(204, {}, b"")
+                try:
+                    status, headers, payload = stub.respond(self.command, self.path, self.headers, body)
+                except requests.exceptions.RequestException as e:
+                    status, headers, payload = 502, {"Content-Type": "text/plain"}, str(e).encode("utf-8")
+                self._send(status, headers, payload)
+
+            do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _handle
+
+        return Handler
+
+    # ------------------------------------------------------------- cycle de vie
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+
+def parse_host_latency(values):
+    """['hôte=0.2', ...] -> {'hôte': 0.2}."""
+    latency = {}
+    for value in values or []:
+        host, _, seconds = value.partition("=")
+        latency[host] = float(seconds)
+    return latency
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serveur bouchon des fournisseurs (enregistrement / rejeu).")
+    parser.add_argument("mode", choices=[RECORD, REPLAY])
+    parser.add_argument("--cassettes", default=DEFAULT_CASSETTE_DIR, help="Répertoire des cassettes")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency", type=float, default=0.0, help="Latence ajoutée (secondes)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Variation de latence (± secondes)")
+    parser.add_argument("--host-latency", action="append", metavar="HÔTE=SECONDES",
+                        help="Latence propre à un hôte (répétable)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Proportion de réponses en erreur")
+    parser.add_argument("--seed", type=int, help="Graine du tirage latence / erreurs")
+    args = parser.parse_args(argv)
+
+    config = StubConfig(args.latency, args.jitter, args.error_rate,
+                        host_latency=parse_host_latency(args.host_latency), seed=args.seed)
+    server = StubServer(CassetteStore(args.cassettes), args.mode, config, args.host, args.port)
+    print(f"{args.mode} sur {server.url} ({len(server.cassettes)} cassette(s)) ; "
+          f"UPSTREAM_STUB_URL={server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+# predictor/weather.py
+"""
+Météo au coup d'envoi, avec une prévision par zone partagée entre les matchs.
+
+Les coordonnées sont arrondies à une maille de GRID_STEP degrés : tous les
+matchs d'un même stade (ou d'une même ville) partagent la prévision
+meteoblue basic-1h de leur maille, récupérée au plus une fois par fenêtre de
+rafraîchissement (cache disque + mémoire, un seul appel en cours par maille).
+La valeur utilisée est lue à l'indice de l'heure du coup d'envoi.
+"""
+
+import threading
+import time
+from collections import namedtuple
+from datetime import date, datetime, time as dtime, timezone
+
+import numpy as np
+import requests
+
+from .api import get_response_cache
+from .cache import ENDPOINT_TTLS, endpoint_of
+from .client import HIGH, get_client
+from .config import get_secret
+from .metrics import record_cache, timed
+from .shared import SingleFlight
+from .weather_store import epoch_hour
+
+API_URL_WEATHER = 'https://my.meteoblue.com/packages/basic-1h'
+WEATHER_ENDPOINT = endpoint_of(API_URL_WEATHER)
+
+GRID_STEP = 0.1            # ~11 km : même prévision pour un stade et sa ville
+MATCH_WINDOW = (0, 1)      # heures prises en compte, relatives au coup d'envoi
+DEFAULT_KICKOFF = dtime(15, 0)  # heure supposée quand seule la date est connue
+FALLBACK_FACTOR = 0.8
+
+Forecast = namedtuple("Forecast", ["start_hour", "precipitation"])
+
+
+def grid_cell(lat, lon):
+    """Maille (lat, lon) arrondie à GRID_STEP degrés."""
+    return (round(round(lat / GRID_STEP) * GRID_STEP, 4), round(round(lon / GRID_STEP) * GRID_STEP, 4))
+
+
+def kickoff_hour(match_date):
+    """Heure (epoch / 3600, UTC) d'un datetime, d'un timestamp ou d'une date."""
+    if isinstance(match_date, (int, float)):
+        return int(match_date) // 3600
+    if isinstance(match_date, datetime):
+        moment = match_date if match_date.tzinfo else match_date.replace(tzinfo=timezone.utc)
+    elif isinstance(match_date, date):
+        moment = datetime.combine(match_date, DEFAULT_KICKOFF, tzinfo=timezone.utc)
+    else:
+        raise TypeError(f"date de match non reconnue : {match_date!r}")
+    return int(moment.timestamp()) // 3600
+
+
+def parse_forecast(payload):
+    """Réponse basic-1h -> Forecast (heures locales converties en UTC)."""
+    data = payload.get('data_1h') or {}
+    times = data.get('time') or []
+    if not times:
+        return None
+    offset = int(round((payload.get('metadata') or {}).get('utc_timeoffset', 0)))
+    precipitation = np.asarray(
+        [np.nan if v is None else v for v in data.get('precipitation', [])], dtype=np.float32
+    )
+    return Forecast(epoch_hour(times[0], offset), precipitation)
+
+
+def window_rain(forecast, hour, window=MATCH_WINDOW):
+    """Précipitations cumulées (mm) sur la fenêtre du match, ou None hors prévision."""
+    start = hour - forecast.start_hour + window[0]
+    stop = hour - forecast.start_hour + window[1] + 1
+    if start < 0 or stop > len(forecast.precipitation):
+        return None
+    values = forecast.precipitation[start:stop]
+    return float(np.nansum(values)) if len(values) else None
+
+
+class ForecastCache:
+    """Prévisions par maille, partagées par le processus."""
+
+    def __init__(self, ttl=ENDPOINT_TTLS.get(WEATHER_ENDPOINT)):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._forecasts = {}
+        self._flights = SingleFlight()
+
+    def _download(self, cell, priority):
+        params = {'lat': cell[0], 'lon': cell[1]}
+
+        def fetch():
+            try:
+                resp = get_client("meteoblue").get(
+                    API_URL_WEATHER,
+                    params=dict(params, apikey=get_secret("WEATHER_API_KEY"), format='json'),
+                    priority=priority,
+                )
+            except requests.exceptions.RequestException:
+                return None
+            return resp.json() if resp.status_code == 200 else None
+
+        payload = get_response_cache().get_or_fetch(WEATHER_ENDPOINT, params, fetch)
+        return parse_forecast(payload) if payload is not None else None
+
+    def _fresh(self, cell):
+        with self._lock:
+            entry = self._forecasts.get(cell)
+            if entry and time.time() - entry[0] < self.ttl:
+                return entry[1]
+        return None
+
+    def _load(self, cell, priority):
+        forecast = self._download(cell, priority)
+        if forecast is not None:
+            with self._lock:
+                self._forecasts[cell] = (time.time(), forecast)
+        return forecast
+
+    def get(self, lat, lon, priority=HIGH):
+        """Prévision de la maille contenant (lat, lon), ou None si indisponible."""
+        cell = grid_cell(lat, lon)
+        forecast = self._fresh(cell)
+        record_cache("forecast", "cell", forecast is not None)
+        if forecast is not None:
+            return forecast
+        return self._flights.do(cell, lambda: self._load(cell, priority), check=lambda: self._fresh(cell))
+
+
+_forecasts = None
+_forecasts_lock = threading.Lock()
+
+
+def get_forecasts():
+    global _forecasts
+    if _forecasts is None:
+        with _forecasts_lock:
+            if _forecasts is None:
+                _forecasts = ForecastCache()
+    return _forecasts
+
+
+@timed("get_weather_factor")
+def get_weather_factor(lat, lon, match_date, priority=HIGH):
+    """
+    Facteur météo au coup d'envoi : 1.0 par temps sec, -0.1 par mm de pluie
+    sur la fenêtre du match. `match_date` est le coup d'envoi (datetime ou
+    timestamp) ; une simple date suppose un coup d'envoi à 15h UTC.
+    """
+    if lat is None or lon is None:
+        return FALLBACK_FACTOR
+    forecast = get_forecasts().get(lat, lon, priority)
+    if forecast is None:
+        return FALLBACK_FACTOR
+    rain = window_rain(forecast, kickoff_hour(match_date))
+    if rain is None:
+        return FALLBACK_FACTOR
+    return max(0, 1 - rain * 0.1)
@@ -0,0 +1,191 @@
+# predictor/weather_store.py
+"""
+Séries météo horaires (meteoblue basic-1h) au format colonne.
+
+Au lieu d'une cellule CSV contenant une liste Python sérialisée par variable,
+chaque variable est une matrice float32 (matchs x heures) au format .npy,
+ouverte en np.memmap. Les lignes sont triées par fixture.id et
+`start_hour.npy` donne l'heure (epoch / 3600, UTC) de la première colonne
+(les heures meteoblue sont locales : elles sont décalées de utc_timeoffset,
+comme dans weather.parse_forecast) :
+la fenêtre autour du coup d'envoi de milliers de matchs se lit en une seule
+indexation vectorisée, sans parser ni charger le reste du fichier.
+
+Usage :
+    python -m predictor.weather_store convert weather_data.csv --matches match_data.csv
+"""
+
+import argparse
+import ast
+import json
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import pytz
+
+DEFAULT_WEATHER_DIR = os.getenv("WEATHER_DATASET_DIR", os.path.join("data", "weather"))
+
+# Variables numériques conservées (rainspot, code texte, est ignoré)
+VARIABLES = (
+    "temperature", "felttemperature", "precipitation", "precipitation_probability",
+    "convective_precipitation", "snowfraction", "windspeed", "winddirection",
+    "relativehumidity", "sealevelpressure", "pictocode", "isdaylight", "uvindex",
+)
+TIME_FORMAT = "%Y-%m-%d %H:%M"
+
+
+def epoch_hour(text, utc_offset=0):
+    """'AAAA-MM-JJ HH:MM' (heure locale, décalage `utc_offset` heures) -> heure depuis epoch (UTC)."""
+    moment = datetime.strptime(text, TIME_FORMAT).replace(tzinfo=timezone.utc)
+    return int(moment.timestamp()) // 3600 - int(round(utc_offset or 0))
+
+
+# Noms de pays API-Football absents de pytz.country_names
+COUNTRY_ALIASES = {"England": "GB", "Scotland": "GB", "Wales": "GB", "Northern-Ireland": "GB", "USA": "US"}
+_COUNTRY_CODES = {name: code for code, name in pytz.country_names.items()}
+
+
+def country_utc_offset(country, local_time):
+    """
+    Décalage UTC (heures) du pays à cette heure locale, pour les séries sans
+    utc_timeoffset ; 0 si le pays est inconnu ou couvre plusieurs fuseaux.
+    """
+    code = COUNTRY_ALIASES.get(country) or _COUNTRY_CODES.get(country)
+    zones = pytz.country_timezones.get(code, []) if code else []
+    if len(zones) != 1:
+        return 0
+    moment = datetime.strptime(local_time, TIME_FORMAT)
+    return pytz.timezone(zones[0]).utcoffset(moment, is_dst=False).total_seconds() / 3600
+
+
+def build_arrays(records):
+    """
+    records : [(fixture_id, {'time': [...], variable: [...], 'utc_timeoffset': h}), ...]
+    Retourne (fixture_ids, start_hour, {variable: matrice float32 NaN-complétée}).
+    """
+    records = sorted(records, key=lambda r: r[0])
+    hours = max((len(series.get("time", [])) for _, series in records), default=0)
+    fixture_ids = np.array([r[0] for r in records], dtype=np.int64)
+    start_hour = np.array(
+        [
+            epoch_hour(series["time"][0], series.get("utc_timeoffset")) if series.get("time") else -1
+            for _, series in records
+        ],
+        dtype=np.int64,
+    )
+    matrices = {}
+    for variable in VARIABLES:
+        matrix = np.full((len(records), hours), np.nan, dtype=np.float32)
+        for i, (_, series) in enumerate(records):
+            values = series.get(variable)
+            if values:
+                matrix[i, :len(values)] = np.asarray(values, dtype=np.float32)
+        matrices[variable] = matrix
+    return fixture_ids, start_hour, matrices
+
+
+def save(root, fixture_ids, start_hour, matrices):
+    os.makedirs(root, exist_ok=True)
+    np.save(os.path.join(root, "fixture_ids.npy"), fixture_ids)
+    np.save(os.path.join(root, "start_hour.npy"), start_hour)
+    for variable, matrix in matrices.items():
+        np.save(os.path.join(root, f"{variable}.npy"), matrix)
+    with open(os.path.join(root, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"variables": list(matrices), "hours": int(matrix.shape[1]) if matrices else 0}, f)
+
+
+def convert_csv(csv_path, root=DEFAULT_WEATHER_DIR, matches_csv=None):
+    """
+    Convertit l'ancien weather_data.csv (listes sérialisées) ; retourne le nombre de matchs.
+    Sans colonne utc_timeoffset, le décalage vient du pays de la compétition
+    (league.country de `matches_csv`, export json_normalize des matchs).
+    """
+    frame = pd.read_csv(csv_path)
+    countries = {}
+    if matches_csv:
+        matches = pd.read_csv(matches_csv, usecols=["fixture.id", "league.country"])
+        countries = dict(zip(matches["fixture.id"].astype(int), matches["league.country"]))
+    records = []
+    for _, row in frame.iterrows():
+        series = {
+            column: ast.literal_eval(row[column])
+            for column in ("time",) + VARIABLES
+            if column in row and isinstance(row[column], str)
+        }
+        fixture_id = int(row["fixture.id"])
+        if "utc_timeoffset" in row and pd.notna(row["utc_timeoffset"]):
+            series["utc_timeoffset"] = float(row["utc_timeoffset"])
+        elif series.get("time") and fixture_id in countries:
+            series["utc_timeoffset"] = country_utc_offset(countries[fixture_id], series["time"][0])
+        records.append((fixture_id, series))
+    save(root, *build_arrays(records))
+    return len(records)
+
+
+class WeatherStore:
+    """Lecture projetée en mémoire des séries horaires par match."""
+
+    def __init__(self, root=DEFAULT_WEATHER_DIR):
+        self.root = root
+        self.fixture_ids = np.load(os.path.join(root, "fixture_ids.npy"), mmap_mode="r")
+        self.start_hour = np.load(os.path.join(root, "start_hour.npy"), mmap_mode="r")
+        with open(os.path.join(root, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.variables = tuple(meta["variables"])
+        self.hours = meta["hours"]
+        self._matrices = {}
+
+    def matrix(self, variable):
+        """Matrice (matchs x heures) d'une variable, ouverte à la demande."""
+        if variable not in self._matrices:
+            self._matrices[variable] = np.load(
+                os.path.join(self.root, f"{variable}.npy"), mmap_mode="r"
+            )
+        return self._matrices[variable]
+
+    def rows(self, fixture_ids):
+        """Indice de ligne de chaque match (-1 si absent)."""
+        ids = np.asarray(fixture_ids, dtype=np.int64)
+        table = np.asarray(self.fixture_ids)
+        if not len(table):
+            return np.full(ids.shape, -1)
+        pos = np.minimum(np.searchsorted(table, ids), len(table) - 1)
+        return np.where(table[pos] == ids, pos, -1)
+
+    def window(self, fixture_ids, kickoff_timestamps, variables=("precipitation",), before=0, after=2):
+        """
+        Valeurs horaires de `before` heures avant à `after` heures après le coup
+        d'envoi, pour chaque match : {variable: tableau (n x fenêtre)}, NaN hors série.
+        """
+        rows = self.rows(fixture_ids)
+        kickoff_hour = np.asarray(kickoff_timestamps, dtype=np.int64) // 3600
+        start = np.asarray(self.start_hour)[np.maximum(rows, 0)]
+        offsets = np.arange(-before, after + 1)
+        cols = (kickoff_hour - start)[:, None] + offsets[None, :]
+        valid = (rows[:, None] >= 0) & (cols >= 0) & (cols < self.hours)
+        safe_rows = np.broadcast_to(np.maximum(rows, 0)[:, None], cols.shape)
+        safe_cols = np.clip(cols, 0, max(self.hours - 1, 0))
+        result = {}
+        for variable in variables:
+            values = self.matrix(variable)[safe_rows, safe_cols].astype(np.float32)
+            result[variable] = np.where(valid, values, np.nan)
+        return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Séries météo horaires au format colonne.")
+    parser.add_argument("--root", default=DEFAULT_WEATHER_DIR, help="Répertoire de sortie")
+    sub = parser.add_subparsers(dest="command", required=True)
+    conv = sub.add_parser("convert", help="Convertit un weather_data.csv à listes sérialisées")
+    conv.add_argument("csv_path")
+    conv.add_argument("--matches", help="Matchs (json_normalize) pour le décalage UTC par pays")
+    args = parser.parse_args(argv)
+
+    count = convert_csv(args.csv_path, args.root, args.matches)
+    print(f"{count} match(s) converti(s) dans {args.root}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# predictor/weights.py
+"""
+Pondérations calibrées (fichier versionné produit par predictor.calibrate).
+
+Le fichier est lu une fois par processus, au premier appel ; sans fichier,
+les pondérations par défaut de predictor.model s'appliquent. Format :
+    {"version": "...", "model_version": 1, "created_at": "...",
+     "matches": 1234, "global": {...}, "leagues": {"61": {...}, ...}}
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+
+from .model import DEFAULT_WEIGHTS, MODEL_VERSION
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WEIGHTS_PATH = os.getenv("MODEL_WEIGHTS_PATH", os.path.join("data", "weights.json"))
+
+
+class WeightsFile:
+    """Pondérations globales et par ligue d'un fichier de calibration."""
+
+    def __init__(self, payload=None):
+        payload = payload or {}
+        self.version = payload.get("version")
+        self.global_weights = dict(DEFAULT_WEIGHTS, **payload.get("global", {}))
+        self.leagues = {
+            int(league_id): dict(self.global_weights, **weights)
+            for league_id, weights in payload.get("leagues", {}).items()
+        }
+        self.payload = payload
+
+    @classmethod
+    def load(cls, path=DEFAULT_WEIGHTS_PATH):
+        """Fichier de pondérations, ou pondérations par défaut s'il est absent ou incompatible."""
+        try:
+            with open(path, encoding="utf-8") as f:
+                payload = json.load(f)
+        except FileNotFoundError:
+            return cls()
+        except (OSError, ValueError) as e:
+            logger.warning("Fichier de pondérations illisible (%s) : %s", path, e)
+            return cls()
+        if payload.get("model_version") != MODEL_VERSION:
+            logger.warning("Pondérations calibrées pour le modèle v%s ignorées (modèle v%s).",
+                           payload.get("model_version"), MODEL_VERSION)
+            return cls()
+        return cls(payload)
+
+    def save(self, path=DEFAULT_WEIGHTS_PATH):
+        """Écrit le fichier de façon atomique (fichier temporaire + rename)."""
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self.payload, f, indent=2, sort_keys=True)
+        os.replace(tmp, path)
+
+    def for_league(self, league_id=None):
+        """Pondérations de la ligue (calibrées pour elle si disponibles, sinon globales)."""
+        return self.leagues.get(league_id, self.global_weights)
+
+
+_weights = None
+_weights_lock = threading.Lock()
+
+
+def get_weights_file():
+    """Pondérations du processus (lues au premier appel)."""
+    global _weights
+    if _weights is None:
+        with _weights_lock:
+            if _weights is None:
+                _weights = WeightsFile.load()
+    return _weights
+
+
+def set_weights_file(weights_file):
+    """Remplace les pondérations du processus (None : relire le fichier au prochain appel)."""
+    global _weights
+    _weights = weights_file
+
+
+def weights_for(league_id=None):
+    """Pondérations à appliquer aux matchs d'une ligue."""
+    return get_weights_file().for_league(league_id)
@@ -1,10 +1,12 @@
 # supabase_config.py
 
-from supabase import create_client, Client
-import os
+# Le client Supabase est désormais créé à la première utilisation par
+# predictor.auth.get_supabase() : importer ce module n'ouvre plus de connexion.
+from predictor.auth import get_supabase
 
-# Initialiser Supabase client
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY")
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
+def __getattr__(name):
+    # Compatibilité : `from supabase_config import supabase`
+    if name == "supabase":
+        return get_supabase()
+    raise AttributeError(name)